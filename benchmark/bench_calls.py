@@ -0,0 +1,109 @@
+"""
+Benchmark of the time spent by the connector to make a call, without the time of the server
+
+Run it from the root of the repository:
+
+    python -m benchmark.bench_calls --calls 5000
+
+The mock runs in its own process without latency, so the CPU time of this process is the one of the connector (and of
+requests). The scenarios are:
+
+- build: only the url, the query string and the headers of a page of the jobs are built, without calling the mock
+- get-job: get_jobs(jobId) of a job at a time, like a loop that polls some jobs
+- pages: iter_jobs() with pages of 10 jobs, like a watcher that reads the last jobs
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import argparse
+import json
+import multiprocessing
+import time
+
+import nbupy
+from nbupy.nbumock import NbuMockServer
+
+SCENARIOS = ('build', 'get-job', 'pages')
+FILTER = "state eq 'DONE' and jobType eq 'BACKUP' and startTime ge 2026-01-01T00:00:00.000Z"
+
+
+def _serve(queue, options):
+    mock = NbuMockServer(**options)
+    queue.put(mock.start())
+    while True:
+        time.sleep(3600)
+
+
+def _build(nbu, calls):
+    query = {'page[limit]': '10', 'filter': FILTER, 'sort': '-startTime'}
+    for offset in range(calls):
+        query['page[offset]'] = offset * 10
+        nbu._api_url(nbu._paginated_url('admin/jobs/', query=query))
+        nbu._api_headers()
+    return calls
+
+
+def _get_job(nbu, calls):
+    for call in range(calls):
+        nbu.get_jobs(call % 1000 + 1)
+    return calls
+
+
+def _pages(nbu, calls):
+    for _ in nbu.iter_jobs(filters=FILTER, page_limit=10):
+        pass
+    return calls
+
+
+def run_scenario(url, scenario, calls):
+    """ returns the CPU and the wall microseconds per call of the scenario, that makes calls calls """
+    function = {'build': _build, 'get-job': _get_job, 'pages': _pages}[scenario]
+    with nbupy.NbuApiConnector(url, 'user', 'password', False) as nbu:
+        function(nbu, min(calls, 10))
+        cpu, wall = time.process_time(), time.perf_counter()
+        count = function(nbu, calls)
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return {'scenario': scenario, 'calls': count, 'cpu_us_per_call': cpu / count * 1e6,
+            'wall_us_per_call': wall / count * 1e6}
+
+
+def run(scenarios, calls, repeat=1):
+    """ runs the scenarios against a mock with a page of 10 jobs for every call, returns the best result of each """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    server = context.Process(target=_serve, args=(queue, {'jobs': calls * 10}), daemon=True)
+    server.start()
+    try:
+        url = queue.get(timeout=60)
+        return [min((run_scenario(url, scenario, calls) for _ in range(repeat)), key=lambda r: r['cpu_us_per_call'])
+                for scenario in scenarios]
+    finally:
+        server.terminate()
+        server.join()
+
+
+def _format(results):
+    lines = ['{:<10} {:>8} {:>14} {:>15}'.format('scenario', 'calls', 'CPU us/call', 'wall us/call')]
+    for result in results:
+        lines.append('{:<10} {:>8} {:>14.1f} {:>15.1f}'.format(result['scenario'], result['calls'],
+                                                             result['cpu_us_per_call'], result['wall_us_per_call']))
+    return '\n'.join(lines)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the time spent by the connector for every call')
+    parser.add_argument('--calls', type=int, default=5000, help='calls of every scenario')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every scenario, the fastest is reported')
+    parser.add_argument('--json', help='file where the results are saved, to compare them with later runs')
+    args = parser.parse_args(arguments)
+    results = run(args.scenarios, args.calls, args.repeat)
+    print(_format(results), flush=True)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
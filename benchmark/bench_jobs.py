@@ -0,0 +1,142 @@
+"""
+Benchmark of the full listing of the jobs against the local mock of the API of Veritas Netbackup
+
+Run it from the root of the repository:
+
+    python -m benchmark.bench_jobs --sizes 1000 100000 1000000
+
+The mock runs in its own process. Every scenario runs in a new process too, so its peak memory is measured from the
+resident memory of the process and it's not affected by the previous scenarios.
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import nbupy
+from nbupy.nbumock import NbuMockServer
+
+SIZES = (1000, 100000, 1000000)
+SCENARIOS = {
+    'sequential': {'method': 'iter_jobs', 'page_limit': 1000},
+    'sequential-small-pages': {'method': 'iter_jobs', 'page_limit': 100},
+    'adaptive': {'method': 'iter_jobs', 'page_limit': 'auto'},
+    'streamed': {'method': 'iter_jobs', 'page_limit': 1000, 'connector': {'stream': True}},
+    'parallel': {'method': 'iter_jobs', 'page_limit': 1000, 'max_workers': 8},
+    'get-all': {'method': 'get_jobs', 'page_limit': 1000, 'max_workers': 8},
+    'get-all-typed': {'method': 'get_jobs', 'page_limit': 1000, 'max_workers': 8, 'connector': {'typed': True}},
+}
+
+
+def _serve(queue, options):
+    mock = NbuMockServer(**options)
+    queue.put(mock.start())
+    while True:
+        time.sleep(3600)
+
+
+def _max_rss():
+    """ the peak resident memory of the process in bytes """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _run_scenario(queue, url, scenario):
+    options = dict(SCENARIOS[scenario])
+    method = options.pop('method')
+    connector_options = options.pop('connector', {})
+    metrics = nbupy.NbuMetricsCollector()
+    tracemalloc = None
+    if resource is None:
+        import tracemalloc
+        tracemalloc.start()
+    baseline = _max_rss() if resource is not None else 0
+    start = time.perf_counter()
+    with nbupy.NbuApiConnector(url, 'user', 'password', False, observers=[metrics], **connector_options) as nbu:
+        jobs = getattr(nbu, method)(**options)
+        count = len(jobs['data']) if method == 'get_jobs' else sum(1 for _ in jobs)
+    elapsed = time.perf_counter() - start
+    peak = _max_rss() - baseline if tracemalloc is None else tracemalloc.get_traced_memory()[1]
+    pages = metrics.snapshot().get('GET admin/jobs', {})
+    queue.put({
+        'scenario': scenario,
+        'jobs': count,
+        'seconds': elapsed,
+        'jobs_per_second': count / elapsed if elapsed else None,
+        'requests': sum(metric['requests'] for metric in metrics.snapshot().values()),
+        'pages': pages.get('requests', 0),
+        'bytes': pages.get('bytes', 0),
+        'peak_memory_bytes': peak,
+    })
+
+
+def run(size, scenarios, latency=0.0, item_latency=0.0, repeat=1, compression=False):
+    """ runs the scenarios against a mock with size jobs, returns the best result of every scenario """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    server = context.Process(target=_serve, args=(queue, {'jobs': size, 'latency': latency,
+                                                          'item_latency': item_latency,
+                                                          'compression': compression}), daemon=True)
+    server.start()
+    try:
+        url = queue.get(timeout=60)
+        results = []
+        for scenario in scenarios:
+            best = None
+            for _ in range(repeat):
+                process = context.Process(target=_run_scenario, args=(queue, url, scenario))
+                process.start()
+                result = queue.get()
+                process.join()
+                if best is None or result['seconds'] < best['seconds']:
+                    best = result
+            best['size'] = size
+            results.append(best)
+        return results
+    finally:
+        server.terminate()
+        server.join()
+
+
+def _format(results):
+    lines = ['{:>8} {:<24} {:>9} {:>12} {:>9} {:>12} {:>11}'.format('size', 'scenario', 'seconds', 'jobs/s',
+                                                                   'requests', 'MB received', 'peak MB')]
+    for result in results:
+        lines.append('{:>8} {:<24} {:>9.2f} {:>12.0f} {:>9} {:>12.1f} {:>11.1f}'.format(
+            result['size'], result['scenario'], result['seconds'], result['jobs_per_second'] or 0,
+            result['requests'], result['bytes'] / 2 ** 20, result['peak_memory_bytes'] / 2 ** 20))
+    return '\n'.join(lines)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the full listing of the jobs against a local mock')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='numbers of jobs of the mock')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every call to the mock waits')
+    parser.add_argument('--item-latency', type=float, default=0.0, help='seconds added for every job of a page')
+    parser.add_argument('--compression', action='store_true', help='the mock gzips the responses')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every scenario, the fastest is reported')
+    parser.add_argument('--json', help='file where the results are saved, to compare them with later runs')
+    args = parser.parse_args(arguments)
+    results = []
+    for size in args.sizes:
+        size_results = run(size, args.scenarios, args.latency, args.item_latency, args.repeat, args.compression)
+        print(_format(size_results), flush=True)
+        results.extend(size_results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,25 @@
 import logging
 from .nbupy import NbuApiConnector
-from .nbuauth import NbuAuthorizationApi
+from .nbuauth import NbuAuthorizationApi, AdaptivePageLimit, RetryPolicy
+from .nbumetrics import NbuMetricsCollector, RequestEvent
+from .nbumodels import Job, Policy, DiskPool, StorageUnit
+from .nbuquery import Field, Filter, NbuQuery
 from .nbuadmin import NbuAdministratorApi
 from .nbuconf import NbuConfigurationApi
 from .nbustorage import NbuStorageApi
+from .nbuasync import NbuAsyncApiConnector
+from .nbutoken import NbuTokenCache
+from .nbucache import NbuResponseCache
+from .nbubulk import BulkResult, BulkResults
+from .nbucursor import NbuCursor, NbuPager
+from .nbuthrottle import NbuThrottle
+from .nbufleet import FleetError, NbuFleet
+from .nbuexport import NbuExporter
+from .nbumirror import NbuJobMirror
+from .nbuwatch import NbuJobWatcher
+from .nbusnapshot import NbuJobSnapshot
+from .nbureconcile import NbuPlan, NbuReconciler
+from .nbuinventory import Capacity, StorageInventory
 
 __version__ = '2.1.1'
 
@@ -6,23 +6,58 @@ by Sorint https://sorint.it
 License GPLv3
 """
 
-from . import nbuauth
+from . import nbuauth, nbubulk, nbusnapshot, nbuwatch
 
 
 class NbuAdministratorApi(nbuauth.NbuAuthorizationApi):
     """ Here are implemented the methods for the administrator API of netbackup """
 
-    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='', timeout=0):
-        super().__init__(url, user, password, verify, domain_name, domain_type, version)
+    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='',
+                 timeout=nbuauth.DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(url, user, password, verify, domain_name, domain_type, version, timeout, **kwargs)
 
     # NETBACKUP ADMINISTRATOR API
 
-    def get_jobs(self, jobId='', filters='', sort='-startTime'):
+    def get_jobs(self, jobId='', filters='', sort='-startTime', max_workers=None, page_limit=None):
         """
-        If jobId is present, returns only that job, else returns all
+        If jobId is present, returns only that job, else returns all.
+        With max_workers the pages are requested in parallel, page_limit overrides the page size of the connector
         """
-        return self._paginated_get_request(url='admin/jobs/', element_id=jobId, filters=filters, sort=sort)
+        return self._paginated_get_request(url='admin/jobs/', element_id=jobId, filters=filters, sort=sort,
+                                           max_workers=max_workers, page_limit=page_limit)
+
+    def iter_jobs(self, filters='', sort='-startTime', max_workers=None, page_limit=None, cursor=None,
+                  checkpoint=None):
+        """
+        Returns an iterator over all the jobs, the pages are requested while iterating.
+        The iteration can be resumed from the cursor of a previous one, or from the checkpoint file
+        """
+        return self._paginated_iter(url='admin/jobs/', filters=filters, sort=sort, max_workers=max_workers,
+                                    page_limit=page_limit, cursor=cursor, checkpoint=checkpoint)
+
+    def iter_jobs_snapshot(self, start, end=None, filters='', max_workers=nbusnapshot.DEFAULT_WORKERS, **kwargs):
+        """
+        Returns an iterator over the jobs started between start and end (now by default), sorted by startTime. The
+        jobs are requested in time windows, in parallel, and no job is lost or repeated if the jobs change meanwhile.
+        kwargs are the options of NbuJobSnapshot, like the window size
+        """
+        return nbusnapshot.NbuJobSnapshot(self, start, end, filters=filters, max_workers=max_workers, **kwargs)
 
     def delete_job(self, jobId, reason=''):
         headers = {'X-NetBackup-Audit-Reason': reason}
         return self._delete_api_call('admin/jobs/{}'.format(jobId), headers=headers)
+
+    def delete_jobs(self, jobIds, reason='', max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        """
+        Deletes all the jobs with at most max_workers concurrent calls (and rate_limit calls per second),
+        returns a BulkResults with the result of every job
+        """
+        return self._run_bulk(lambda jobId: self.delete_job(jobId, reason), jobIds, max_workers, rate_limit)
+
+    def wait_for_jobs(self, jobIds, timeout=None, interval=nbuwatch.DEFAULT_INTERVAL, on_change=None, on_done=None):
+        """
+        Waits until all the jobs end, polling them with a single call to admin/jobs (see NbuJobWatcher).
+        Returns the ended jobs by jobId, raises TimeoutError if they don't end in timeout seconds
+        """
+        watcher = nbuwatch.NbuJobWatcher(self, jobIds, interval=interval, on_change=on_change, on_done=on_done)
+        return watcher.wait(timeout)
@@ -0,0 +1,427 @@
+"""
+Module to use the API of Veritas Netbackup with asyncio
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import ssl
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from . import nbubulk, nbuauth, nbuinventory, nbumetrics, nbumodels, nbupy, nbustream, nbuwatch
+
+DEFAULT_CONNECTION_LIMIT = 100
+
+
+class NbuAsyncApiConnector(nbupy.NbuApiConnector):
+    """
+        Connector with the same methods of NbuApiConnector that runs on asyncio: the methods that call the api return
+        a coroutine and the iter_* methods return an asynchronous iterator.
+        The urls, the headers and the pagination are handled by the methods inherited from NbuAuthorizationApi, here
+        are implemented only the calls, that share the connection pool of a single aiohttp.ClientSession
+    """
+
+    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='',
+                 timeout=nbuauth.DEFAULT_TIMEOUT, connection_limit=DEFAULT_CONNECTION_LIMIT, **kwargs):
+        if aiohttp is None:
+            raise ImportError('aiohttp is needed to use NbuAsyncApiConnector, install it with "pip install nbupy[async]"')
+        self.connection_limit = connection_limit
+        super().__init__(url, user, password, verify, domain_name, domain_type, version, timeout, **kwargs)
+
+    def __enter__(self):
+        raise TypeError('NbuAsyncApiConnector must be used with "async with"')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if self.token_cache is None:
+                await self.logout()
+        finally:
+            await self.close()
+
+    # the aiohttp session has to be created inside the event loop, see _get_session()
+    _session = None
+    _token_refresh = None
+
+    def _create_adapter(self):
+        return None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=None if self.compression else {'Accept-Encoding': 'identity'},
+                connector=aiohttp.TCPConnector(limit=self.connection_limit, force_close=not self.keep_alive,
+                                               ssl=self._ssl()),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _ssl(self):
+        """ translates the verify argument, that has the meaning it has in requests, to the ssl argument of aiohttp """
+        if self._verify is False:
+            return False
+        if isinstance(self._verify, str):
+            return ssl.create_default_context(cafile=self._verify)
+        return True
+
+    async def close(self):
+        """ closes the connection pool, it's called when exiting from "async with" """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _throttled_call(self, method, url, stream=False, **kwargs):
+        """ makes a single call, after waiting for the throttle of the connector if it has one. Returns the response
+            and its body, with stream the body of a successful response is not read (it's None) and the response must
+            be released by the caller
+        """
+        if self.throttle is not None:
+            await self.throttle.acquire_async(method)
+        start = time.monotonic()
+        response = None
+        try:
+            response = await self._get_session().request(method, url, **kwargs)
+            if stream and response.status < 400:
+                return response, None
+            try:
+                return response, await response.read()
+            finally:
+                response.release()
+        finally:
+            if self.throttle is not None:
+                if response is None:
+                    self.throttle.release(method, None, time.monotonic() - start)
+                else:
+                    self.throttle.release(method, response.status, time.monotonic() - start,
+                                          nbuauth.RetryPolicy.retry_after(response.headers))
+
+    async def _send_request(self, method, url, **kwargs):
+        """ makes the call, retrying it as described by the retry policy of the connector. Returns the response, its
+            body and the number of retries
+        """
+        attempt = 0
+        while True:
+            try:
+                response, body = await self._throttled_call(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not self.retry or not self.retry.can_retry(method, attempt):
+                    raise e
+                delay = self.retry.backoff(attempt)
+                logging.debug('call to [%s] failed: %s', url, e)
+            else:
+                if not self.retry or not self.retry.can_retry(method, attempt, response.status):
+                    return response, body, attempt
+                delay = self.retry.backoff(attempt, response.headers.get('Retry-After'))
+                logging.debug('call to [%s] failed with status %s', url, response.status)
+            logging.debug('retry %s of the call to [%s] in %.2f seconds', attempt + 1, url, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _perform_request(self, method, url, content=False, relogin=True, decode=False, **kwargs):
+        """ The body of the response is read before releasing the connection, so the json() and text() methods of the
+            returned response can be used. With content the body is returned instead of the response, with decode its
+            decoded json. The ClientResponseError raised for an HTTP error has the body of the response in body.
+            If the token has expired (HTTP 401) a new one is requested and the call is repeated, unless relogin is False.
+            With stream=True the body of a successful response is not read, the response must be released by the caller
+            and the RequestEvent reports its Content-Length.
+            The request_hooks are called before the call is sent and, when it ends, also if it fails, every observer of
+            the connector is called with a RequestEvent
+        """
+        logging.debug('call to [%s]', url)
+        if self.request_hooks:
+            self._run_request_hooks(method, url, kwargs.setdefault('headers', {}))
+        start = time.monotonic()
+        response, body, retries, elapsed, decode_time, error = None, None, 0, None, None, None
+        try:
+            response, body, retries = await self._send_request(method, url, **kwargs)
+            if response.status == 401 and relogin and self._can_relogin(kwargs.get('headers')):
+                logging.debug('unauthorized call to [%s], login again', url)
+                expired_token = kwargs['headers']['Authorization']
+                kwargs['headers'] = dict(kwargs['headers'], Authorization=await self._refresh_token(expired_token))
+                response, body, more_retries = await self._send_request(method, url, **kwargs)
+                retries += more_retries + 1
+            elapsed = time.monotonic() - start
+            if response.status >= 400:
+                text = await response.text()
+                error_info = text[:-1] if text.endswith('\n') else text
+                logging.debug('error info: "{}"'.format(error_info))
+                try:
+                    response.raise_for_status()
+                except aiohttp.ClientResponseError as e:
+                    # the response is already released, the body is kept for the bulk results and the callers
+                    e.body = text
+                    raise
+            if decode:
+                decode_start = time.monotonic()
+                decoded = nbumodels.loads(body) if self.typed else json.loads(body)
+                decode_time = time.monotonic() - decode_start
+                return decoded
+            return body if content else response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self.observers:
+                self._notify_observers(nbumetrics.RequestEvent(
+                    method=method, url=url, base_url=self._base_api_url,
+                    status=response.status if response is not None else None,
+                    bytes=len(body) if body is not None else self._response_size(response, stream=True),
+                    elapsed=elapsed if elapsed is not None else time.monotonic() - start,
+                    decode_time=decode_time, retries=retries, error=error,
+                ))
+
+    async def _api_call(self, method, uri, headers=None, parameters=None, content_header='Accept', decode=False):
+        """ Asynchronous version of NbuAuthorizationApi._api_call(), the other api calls of the connector are the
+            synchronous ones, that return its coroutine
+        """
+        try:
+            return await self._perform_request(method, self._api_url(uri),
+                                               headers=self._api_headers(headers, content_header=content_header),
+                                               json=parameters if parameters else None, decode=decode)
+        finally:
+            if method != 'GET':
+                self._invalidate_cache(uri)
+
+    async def _get_etag_api_call(self, uri, headers=None):
+        """ Asynchronous version of NbuAuthorizationApi._get_etag_api_call() """
+        response = await self._api_call('GET', uri, headers)
+        return await response.json(content_type=None), response.headers.get('ETag')
+
+    async def _cached_get_call(self, uri, headers):
+        """ Asynchronous version of NbuAuthorizationApi._cached_get_call() """
+        ttl = self.response_cache.ttl(uri) if self.response_cache is not None else None
+        if ttl is None:
+            return await self._perform_request('GET', self._api_url(uri), headers=headers, decode=True)
+        key = self.response_cache.key(uri, headers, self._api_prefix, self._user)
+        entry = self.response_cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.json()
+        if entry is not None and entry.etag:
+            headers = dict(headers, **{'If-None-Match': entry.etag})
+        response = await self._perform_request('GET', self._api_url(uri), headers=headers)
+        if response.status == 304 and entry is not None:
+            self.response_cache.refresh(key, ttl)
+            return entry.json()
+        text = await response.text()
+        self.response_cache.set(key, text, ttl, response.headers.get('ETag'))
+        return json.loads(text)
+
+    def _stream_get_call(self, uri, headers=None, key='data', envelope=None):
+        """ Asynchronous version of NbuAuthorizationApi._stream_get_call(), returns an asynchronous iterator over the
+            elements of key, parsed while the body is received. The call is made when the iteration starts
+        """
+        async def elements():
+            response = await self._perform_request('GET', self._api_url(uri), headers=self._api_headers(headers),
+                                                   stream=True)
+            async for element in self._stream_elements(response, key, envelope):
+                yield element
+
+        return elements()
+
+    async def _stream_elements(self, response, key='data', envelope=None):
+        """ yields the elements of key of a response that has not been read, see nbustream.aiter_elements() """
+        try:
+            chunks = response.content.iter_chunked(nbustream.DEFAULT_CHUNK_SIZE)
+            async for element in nbustream.aiter_elements(chunks, key, envelope):
+                yield nbumodels.from_element(element) if self.typed else element
+        finally:
+            response.release()
+
+    async def _generate_pages(self, url, filters='', sort='', headers=None, parameters=None, max_workers=None,
+                              page_limit=None, cursor=None):
+        """ Asynchronous version of NbuAuthorizationApi._generate_pages() """
+        query, page_limit = self._first_page_query(filters, sort, page_limit, url)
+        if cursor is not None and cursor.offset:
+            query['page[offset]'] = cursor.offset
+        while True:
+            start = time.monotonic()
+            if self.stream and not parameters:
+                resp = {}
+                response = await self._perform_request(
+                    'GET', self._api_url(self._paginated_url(url, query=query)), headers=self._api_headers(headers),
+                    stream=True)
+                page = self._stream_elements(response, envelope=resp)
+                elapsed = time.monotonic() - start
+                if cursor is not None:
+                    cursor.offset = int(query.get('page[offset]', 0))
+                yield page
+                # the pagination follows the elements, the ones that were not consumed are skipped to read it
+                async for _ in page:
+                    pass
+            else:
+                resp = await self._paginated_get_call(url=url, query=query, headers=headers, parameters=parameters)
+                elapsed = time.monotonic() - start
+                if cursor is not None:
+                    cursor.offset = int(query.get('page[offset]', 0))
+                yield self._page_elements(resp)
+            pagination = self._next_pagination(resp)
+            if not pagination:
+                return
+            if max_workers and max_workers > 1:
+                queries = self._remaining_page_queries(query, pagination)
+                async for page in self._generate_parallel_pages(url, queries, headers, parameters, max_workers,
+                                                                cursor):
+                    yield page
+                return
+            self._next_page_query(query, pagination, page_limit, elapsed)
+
+    async def _generate_parallel_pages(self, url, queries, headers=None, parameters=None, max_workers=2,
+                                       cursor=None):
+        """ Requests the pages of the given queries with at most max_workers concurrent calls.
+            The pages are yielded in the server order.
+        """
+        async def get_page(query):
+            return self._page_elements(
+                await self._paginated_get_call(url=url, query=query, headers=headers, parameters=parameters)
+            )
+
+        pending = collections.deque()
+        try:
+            for query in itertools.islice(queries, max_workers):
+                pending.append((query, asyncio.ensure_future(get_page(query))))
+            while pending:
+                page_query, task = pending.popleft()
+                page = await task
+                query = next(queries, None)
+                if query is not None:
+                    pending.append((query, asyncio.ensure_future(get_page(query))))
+                if cursor is not None:
+                    cursor.offset = int(page_query['page[offset]'])
+                yield page
+        finally:
+            tasks = [task for _, task in pending]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _typed_response(self, resp):
+        """ the inherited methods, like get_policies(), pass the coroutine of the call """
+        if asyncio.iscoroutine(resp):
+            async def typed_response():
+                return nbupy.NbuApiConnector._typed_response(self, await resp)
+            return typed_response()
+        return super()._typed_response(resp)
+
+    async def _paginated_get_request(self, url, element_id='', filters='', sort='', headers=None, parameters=None,
+                                     max_workers=None, page_limit=None):
+        if element_id:
+            return self._typed_response(await self._paginated_get_call(url=url, element_id=element_id,
+                                                                       headers=headers, parameters=parameters))
+        else:
+            return {
+                'data': [element async for page in self._generate_pages(url, filters, sort, headers, parameters,
+                                                                        max_workers, page_limit) for element in page]
+            }
+
+    async def _run_bulk(self, function, items, max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        """ Asynchronous version of NbuAuthorizationApi._run_bulk() """
+        semaphore = asyncio.Semaphore(max_workers)
+        limiter = nbubulk.RateLimiter(rate_limit) if rate_limit else None
+
+        async def call(item):
+            async with semaphore:
+                if limiter is not None:
+                    await asyncio.sleep(limiter.reserve())
+                try:
+                    return nbubulk.BulkResult.from_response(item, await function(item))
+                except Exception as e:
+                    return nbubulk.BulkResult.from_exception(item, e)
+
+        return nbubulk.BulkResults(await asyncio.gather(*[call(item) for item in items]))
+
+    # NETBACKUP AUTHENTICATION API
+
+    async def _request_token(self):
+        resp = await self._perform_request(
+            'POST',
+            self._api_url('login'),
+            headers=self._api_headers(authorized=False, content_header='content-type'),
+            json=self._login_parameters(),
+            relogin=False,
+            decode=True,
+        )
+        return resp['token'], resp['validity'] if 'validity' in resp else None
+
+    async def _cached_token(self, expired_token=None):
+        """ Asynchronous version of NbuAuthorizationApi._cached_token(). The cache is not kept locked during the login,
+            so that the event loop is not blocked waiting for other processes
+        """
+        token = self.token_cache.get(self._base_api_url, self._user)
+        if token is None or token == expired_token:
+            token, validity = await self._request_token()
+            self.token_cache.set(self._base_api_url, self._user, token, validity)
+        return token
+
+    async def _refresh_token(self, expired_token):
+        """ Asynchronous version of NbuAuthorizationApi._refresh_token(), the concurrent calls that got a 401 wait for
+            a single login
+        """
+        if self._token_refresh is None:
+            self._token_refresh = asyncio.Lock()
+        async with self._token_refresh:
+            if self._token is not None and self._token != expired_token:
+                return self._token
+            if self.token_cache is None:
+                return self._set_token((await self._request_token())[0])
+            return self._set_token(await self._cached_token(expired_token))
+
+    async def login(self):
+        if self.token_cache is None:
+            self._set_token((await self._request_token())[0])
+        else:
+            self._set_token(await self._cached_token())
+
+    async def logout(self):
+        await self._perform_request('POST', self._api_url('logout'), headers=self._api_headers(), relogin=False)
+        if self.token_cache is not None:
+            self.token_cache.delete(self._base_api_url, self._user, self._token)
+        self._token = None
+
+    async def get_tokenkey(self):
+        h = {'Accept': 'text/vnd.netbackup+html;version={}'.format(self._version)}
+        return await self._perform_request('GET', self._api_url('tokenkey'), content=True, headers=h)
+
+    async def delete_user_sessions(self):
+        return await self._perform_request('DELETE', self._api_url('user-sessions'), content=True,
+                                           headers={'Authorization': '{}'.format(self._token)})
+
+    async def get_storage_inventory(self, ttl=None, max_workers=None):
+        """ Asynchronous version of NbuStorageApi.get_storage_inventory(), the calls are limited by the connection
+            pool instead of max_workers
+        """
+        inventory = self._storage_inventory
+        if ttl is not None and inventory is not None and inventory.age < ttl:
+            return inventory
+
+        async def disk_volumes():
+            servers = (await self.get_storage_servers())['data']
+            volumes = await asyncio.gather(*[self.get_disk_volumes(server['id']) for server in servers])
+            return servers, {server['id']: resp['data'] for server, resp in zip(servers, volumes)}
+
+        (servers, volumes), disk_pools, storage_units = await asyncio.gather(
+            disk_volumes(), self.get_disk_pools(), self.get_storage_units())
+        inventory = nbuinventory.StorageInventory(servers, disk_pools['data'], storage_units['data'], volumes)
+        self._storage_inventory = inventory
+        return inventory
+
+    async def wait_for_jobs(self, jobIds, timeout=None, interval=nbuwatch.DEFAULT_INTERVAL, on_change=None,
+                            on_done=None):
+        """ Asynchronous version of NbuAdministratorApi.wait_for_jobs(), the callbacks can be coroutine functions """
+        watcher = nbuwatch.NbuJobWatcher(self, jobIds, interval=interval, on_change=on_change, on_done=on_done)
+        return await watcher.await_all(timeout)
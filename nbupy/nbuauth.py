@@ -5,215 +5,748 @@ by Sorint https://sorint.it
 
 License GPLv3
 """
+import collections
+import concurrent.futures
+import itertools
+import email.utils
+import functools
+import json
 import logging
+import random
+import re
+import threading
+import time
 
 import requests
-from requests.compat import urljoin
+from requests.compat import quote, urljoin
+
+from . import nbubulk, nbucache, nbucursor, nbumetrics, nbumodels, nbuquery, nbustream, nbutoken
 
 DEFAULT_PAGE_LIMIT = '20'
+ADAPTIVE_PAGE_LIMIT = 'auto'
+MAX_PAGE_LIMIT = 1000
+DEFAULT_PAGE_TARGET_TIME = 2.0
 DEFAULT_API_VERSION = '3.0'
 SUPPORTED_API_VERSIONS = ['3.0']
 DEFAULT_TIMEOUT = 20
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+REPLACED_TOKENS = 8
+MEDIA_TYPE = 'application/vnd.netbackup+json;version={}'
+# the uris that are appended to the base url as they are: relative paths without empty or dot segments and a query
+_FIRST_SEGMENT = r"[\w\-~%!$&'()*+,;=@][\w\-.~%!$&'()*+,;=@]*"
+_SEGMENT = r"[\w\-.~%!$&'()*+,;=@:]+"
+_RELATIVE_PATH = re.compile(_FIRST_SEGMENT + '(/' + _SEGMENT + r')*/?(\?[^#\s\x00-\x1f\x7f]+)?')
+
+
+@functools.lru_cache(maxsize=1024)
+def _quoted_parameter(name, value):
+    """ a parameter of a query string, the paginated requests quote the same filters and limits for every page """
+    return quote('{}={}'.format(name, value), safe='=&')
+
+
+class AdaptivePageLimit(object):
+    """
+        Page size of the paginated requests that is adapted to the response times of the server.
+        The size is doubled, up to maximum, while a page is returned in less than half of target_time seconds and it is
+        halved, down to minimum, when a page takes more than target_time seconds.
+        If the server returns less elements than requested the limit reported by the server is used as maximum.
+        Every traversal adapts its own copy(), so the traversals of a connector shared by many threads don't change
+        each other's size
+    """
+
+    def __init__(self, limit=DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT, minimum=1, target_time=DEFAULT_PAGE_TARGET_TIME):
+        self.limit = int(limit)
+        self.maximum = int(maximum)
+        self.minimum = int(minimum)
+        self.target_time = target_time
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return str(self.limit)
+
+    def copy(self):
+        return AdaptivePageLimit(self.limit, self.maximum, self.minimum, self.target_time)
+
+    def update(self, elapsed, pagination=None, requested=None):
+        """ Adapts the limit to the time elapsed to get the last page, that was requested with the limit requested
+            (the current one by default), returns the new limit
+        """
+        with self._lock:
+            return self._update(elapsed, pagination, self.limit if requested is None else int(requested))
+
+    def _update(self, elapsed, pagination, requested):
+        if pagination and 'limit' in pagination and pagination['limit'] < requested:
+            self.maximum = max(pagination['limit'], self.minimum)
+        if elapsed > self.target_time:
+            self.limit = max(self.limit // 2, self.minimum)
+        elif elapsed < self.target_time / 2:
+            self.limit = self.limit * 2
+        self.limit = min(self.limit, self.maximum)
+        return self.limit
+
+
+class RetryPolicy(object):
+    """
+        How the calls that fail with a connection error or with one of the given statuses are retried.
+        Only the calls with one of the given (idempotent) methods are retried, at most retries times, waiting
+        backoff_factor * 2 ^ attempt seconds, up to max_backoff, reduced by a random fraction of up to jitter.
+        If the response has a Retry-After header the time it requests is waited instead.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff_factor=0.5, max_backoff=30, jitter=0.5,
+                 statuses=DEFAULT_RETRY_STATUSES, methods=('GET',), respect_retry_after=True):
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses
+        self.methods = [m.upper() for m in methods]
+        self.respect_retry_after = respect_retry_after
+
+    def can_retry(self, method, attempt, status=None):
+        """ status is None when the call failed without a response """
+        if attempt >= self.retries or method.upper() not in self.methods:
+            return False
+        return status is None or status in self.statuses
+
+    def backoff(self, attempt, retry_after=None):
+        """ returns the seconds to wait before the retry number attempt + 1 """
+        if retry_after and self.respect_retry_after:
+            seconds = self._parse_retry_after(retry_after)
+            if seconds is not None:
+                return seconds
+        delay = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+        return delay * (1 - self.jitter * random.random())
+
+    @classmethod
+    def retry_after(cls, headers):
+        """ returns the seconds requested by the Retry-After header, None if there is not one """
+        value = headers.get('Retry-After')
+        return cls._parse_retry_after(value) if value else None
+
+    @staticmethod
+    def _parse_retry_after(retry_after):
+        """ the Retry-After header contains the seconds to wait or an HTTP date """
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+        try:
+            return max(email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
 
 
 class NbuAuthorizationApi(object):
     """
         Here are implemented the methods to communicate with the api and the authorization methods.
         This class is inherited by other classes in this package
+
+        The connectors are thread-safe: a logged in connector can be shared by many threads. Every thread makes its
+        calls with its own session, and all the sessions share the connection pool of the connector. When many calls
+        get a 401 because the token has expired only the first one logs in again, the others wait for it and are
+        repeated with the new token. login() replaces the token atomically without breaking the calls in flight,
+        instead logout() ends the session on the server, so it must be called when the other threads are done
+
+        Every call passes from _perform_request(), where the request_hooks, callables hook(method, url, headers), are
+        called before it's sent and can change its headers, and where the observers get its RequestEvent at the end
     """
 
-    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='', timeout=DEFAULT_TIMEOUT):
+    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='', timeout=DEFAULT_TIMEOUT,
+                 page_limit=DEFAULT_PAGE_LIMIT, token_cache=None, relogin=True, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False, keep_alive=True, retry=None, response_cache=None,
+                 observers=None, typed=False, throttle=None, compression=True, stream=False, request_hooks=None):
         self._base_api_url = url
+        self._api_prefix = urljoin(url, '.')
         self._user = user
         self._password = password
         self._verify = verify
         self._domain_type = domain_type
         self._domain_name = domain_name
         self._version = version if version and version in SUPPORTED_API_VERSIONS else DEFAULT_API_VERSION
+        self._media_type = MEDIA_TYPE.format(self._version)
+        self._settings = None
         self._token = None
-        self._session = requests.Session()
+        self._token_lock = threading.Lock()
+        self._replaced_tokens = collections.deque(maxlen=REPLACED_TOKENS)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.compression = compression
+        self.stream = stream
+        self._local = threading.local()
+        self._adapter = self._create_adapter()
         self.timeout = timeout
+        self.page_limit = AdaptivePageLimit() if page_limit == ADAPTIVE_PAGE_LIMIT else page_limit
+        self.token_cache = nbutoken.NbuTokenCache(token_cache) if isinstance(token_cache, str) else token_cache
+        self.relogin = relogin
+        self.retry = RetryPolicy() if retry is True else RetryPolicy(retry) if isinstance(retry, int) else retry
+        self.response_cache = nbucache.NbuResponseCache() if response_cache is True else response_cache
+        self.observers = list(observers) if observers else []
+        self.request_hooks = list(request_hooks) if request_hooks else []
+        self.typed = typed
+        self.throttle = throttle
 
     def __enter__(self):
         self.login()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.logout()
-        pass
+        # with a token cache the token is left valid, to be used by the next connectors
+        if self.token_cache is None:
+            self.logout()
+
+    def _create_adapter(self):
+        """ Creates the connection pool for pool_connections hosts and pool_maxsize connections per host.
+            If pool_block is True the calls wait for a free connection instead of opening one that won't be reused
+        """
+        return requests.adapters.HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                             pool_block=self.pool_block)
+
+    def _create_session(self):
+        """ Creates a session that uses the connection pool of the connector """
+        session = requests.Session()
+        session.mount('https://', self._adapter)
+        session.mount('http://', self._adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        if not self.compression:
+            session.headers['Accept-Encoding'] = 'identity'
+        return session
+
+    @property
+    def _session(self):
+        """ the session of the calling thread, a requests.Session must not be shared between threads """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._create_session()
+        return session
 
-    def _perform_request(self, method, url, *args, **kwargs):
-        logging.debug('call to [{}]'.format(url))
-        response = method(url=url, timeout=self.timeout, *args, **kwargs)
+    def close(self):
+        """ closes the connections of the pool, the connector can still be used and opens new ones """
+        self._adapter.close()
+
+    def _api_url(self, uri):
+        """ returns the absolute url of the api uri: the relative paths, that are all the uris of the api, are appended
+            to the base url resolved at the creation, the others are joined to it
+        """
+        if _RELATIVE_PATH.fullmatch(uri) and '/.' not in uri.partition('?')[0]:
+            return self._api_prefix + uri
+        return urljoin(self._base_api_url, uri)
+
+    def _api_headers(self, headers=None, authorized=True, content_header='Accept'):
+        """ returns the headers of an api call: the version header, the authorization token and the given headers """
+        h = {content_header: self._media_type}
+        if authorized:
+            h['Authorization'] = str(self._token)
+        if headers:
+            h.update(headers)
+        return h
+
+    def _login_parameters(self):
+        return {
+            'userName': self._user,
+            'password': self._password,
+            'domainType': '',
+            'domainName': ''
+        }
+
+    def _can_relogin(self, headers):
+        """ A call that got a 401 can be repeated after a new login if it was made with the token of the connector, or
+            with one of its last tokens when another thread has already replaced it
+        """
+        if not (self.relogin and self._password and headers):
+            return False
+        token = headers.get('Authorization')
+        return token == self._token or token in self._replaced_tokens
+
+    def _set_token(self, token):
+        """ replaces the token of the connector, remembering the old one """
+        if self._token is not None and self._token != token:
+            self._replaced_tokens.append(self._token)
+        self._token = token
+        return token
+
+    def _send_settings(self):
+        """ The proxies and the certificates of the environment, that requests reads for every call, are resolved once
+            for the base url: all the calls go to its host
+        """
+        settings = self._settings
+        if settings is None:
+            settings = self._settings = self._session.merge_environment_settings(self._api_prefix, {}, None,
+                                                                                 self._verify, None)
+            settings.pop('stream', None)
+        return settings
+
+    def _send(self, method, url, headers=None, json=None, stream=False):
+        """ makes a single call: the request is prepared by the session of the thread and sent with the settings of the
+            connector
+        """
+        session = self._session
+        request = session.prepare_request(requests.Request(method, url, headers=headers, json=json))
+        return session.send(request, timeout=self.timeout, stream=stream, **self._send_settings())
+
+    def _throttled_call(self, method, url, **kwargs):
+        """ makes a single call, after waiting for the throttle of the connector if it has one """
+        if self.throttle is None:
+            return self._send(method, url, **kwargs)
+        self.throttle.acquire(method)
+        start = time.monotonic()
+        response = None
         try:
-            response.raise_for_status()
+            response = self._send(method, url, **kwargs)
+            return response
+        finally:
+            if response is None:
+                self.throttle.release(method, None, time.monotonic() - start)
+            else:
+                self.throttle.release(method, response.status_code, time.monotonic() - start,
+                                      RetryPolicy.retry_after(response.headers))
+
+    def _send_request(self, method, url, **kwargs):
+        """ makes the call, retrying it as described by the retry policy of the connector. Returns the response and the
+            number of retries
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self._throttled_call(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not self.retry or not self.retry.can_retry(method, attempt):
+                    raise e
+                delay = self.retry.backoff(attempt)
+                logging.debug('call to [%s] failed: %s', url, e)
+            else:
+                if not self.retry or not self.retry.can_retry(method, attempt, response.status_code):
+                    return response, attempt
+                delay = self.retry.backoff(attempt, response.headers.get('Retry-After'))
+                response.close()
+                logging.debug('call to [%s] failed with status %s', url, response.status_code)
+            logging.debug('retry %s of the call to [%s] in %.2f seconds', attempt + 1, url, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def _notify_observers(self, event):
+        for observer in self.observers:
+            try:
+                observer(event)
+            except Exception:
+                logging.exception('observer {!r} failed'.format(observer))
+
+    def _run_request_hooks(self, method, url, headers):
+        """ every call of the connectors passes from here before it's sent, the hooks can change its headers """
+        for hook in self.request_hooks:
+            hook(method, url, headers)
+
+    def _perform_request(self, method, url, relogin=True, decode=False, **kwargs):
+        """ Makes the call with the HTTP method, kwargs are the headers, the json body and stream.
+            If the token has expired (HTTP 401) a new one is requested and the call is repeated, unless relogin is False.
+            With decode the decoded json of the response is returned instead of the response, with stream=True the body
+            is not read, the RequestEvent reports its Content-Length.
+            When the call ends, also if it fails, every observer of the connector is called with a RequestEvent
+        """
+        logging.debug('call to [%s]', url)
+        if self.request_hooks:
+            self._run_request_hooks(method, url, kwargs.setdefault('headers', {}))
+        start = time.monotonic()
+        response, retries, elapsed, decode_time, error = None, 0, None, None, None
+        try:
+            response, retries = self._send_request(method, url, **kwargs)
+            if response.status_code == 401 and relogin and self._can_relogin(kwargs.get('headers')):
+                logging.debug('unauthorized call to [%s], login again', url)
+                expired_token = kwargs['headers']['Authorization']
+                response.close()
+                kwargs['headers'] = dict(kwargs['headers'], Authorization=self._refresh_token(expired_token))
+                response, more_retries = self._send_request(method, url, **kwargs)
+                retries += more_retries + 1
+            elapsed = time.monotonic() - start
+            try:
+                response.raise_for_status()
+            except Exception as e:
+                error_info = response.text[:-1] if response.text.endswith('\n') else response.text
+                logging.debug('error info: "{}"'.format(error_info))
+                raise e
+            if decode:
+                decode_start = time.monotonic()
+                decoded = nbumodels.loads(response.content) if self.typed else response.json()
+                decode_time = time.monotonic() - decode_start
+                return decoded
+            return response
         except Exception as e:
-            error_info = '' if not response.text else (response.text if response.text[-1] != '\n' else response.text[:-1])
-            logging.debug('error info: "{}"'.format(error_info))
-            raise e
-        return response
+            error = e
+            raise
+        finally:
+            if self.observers:
+                self._notify_observers(nbumetrics.RequestEvent(
+                    method=method, url=url, base_url=self._base_api_url,
+                    status=response.status_code if response is not None else None,
+                    bytes=self._response_size(response, kwargs.get('stream')),
+                    elapsed=elapsed if elapsed is not None else time.monotonic() - start,
+                    decode_time=decode_time, retries=retries, error=error,
+                ))
+
+    @staticmethod
+    def _response_size(response, stream=False):
+        if response is None:
+            return 0
+        if stream:
+            return int(response.headers.get('Content-Length') or 0)
+        return len(response.content)
+
+    def _api_call(self, method, uri, headers=None, parameters=None, content_header='Accept', decode=False):
+        """ The calls to the api, but the cached GET ones, pass from here: the headers are built, parameters is the
+            json body, if any. The calls that are not GET invalidate the cached responses of the uri
+        """
+        try:
+            return self._perform_request(method, self._api_url(uri),
+                                         headers=self._api_headers(headers, content_header=content_header),
+                                         json=parameters if parameters else None, decode=decode)
+        finally:
+            if method != 'GET':
+                self._invalidate_cache(uri)
+
+    def _stream_get_call(self, uri, headers=None, key='data', envelope=None):
+        """ Makes the GET call without reading the response and returns an iterator over the elements of key, that are
+            parsed while the body is received, see nbustream.iter_elements(). The other members of the response are
+            stored in envelope. The response cache is not used
+        """
+        response = self._perform_request('GET', self._api_url(uri), headers=self._api_headers(headers), stream=True)
+
+        def elements():
+            with response:
+                chunks = response.iter_content(nbustream.DEFAULT_CHUNK_SIZE)
+                for element in nbustream.iter_elements(chunks, key, envelope):
+                    yield nbumodels.from_element(element) if self.typed else element
+
+        return elements()
 
     def _get_api_call(self, uri, headers=None, parameters=None):
-        """ hide _perform_request to the GET api calls """
-        h = {
-            'Accept': 'application/vnd.netbackup+json;version={}'.format(self._version),
-            'Authorization': '{}'.format(self._token)
-        }
-        if headers:
-            for header, value in headers.items():
-                h[header] = value
+        """ the GET calls with a body are not cached """
         if parameters:
-            return self._perform_request(
-                method=self._session.get,
-                url=urljoin(self._base_api_url, uri),
-                verify=self._verify,
-                headers=h,
-                json=parameters
-            ).json()
-        else:
-            return self._perform_request(
-                method=self._session.get,
-                url=urljoin(self._base_api_url, uri),
-                verify=self._verify,
-                headers=h,
-            ).json()
+            return self._api_call('GET', uri, headers, parameters, decode=True)
+        return self._cached_get_call(uri, self._api_headers(headers))
 
     def _get_unauthorized_api_call(self, uri, headers=None):
-        """ hide _perform_request to the GET api calls """
-        h = {'Accept': 'application/vnd.netbackup+json;version={}'.format(self._version)}
-        if headers:
-            for header, value in headers.items():
-                h[header] = value
-        return self._perform_request(
-            method=self._session.get,
-            url=urljoin(self._base_api_url, uri),
-            verify=self._verify,
-            headers=h,
-        ).json()
+        return self._cached_get_call(uri, self._api_headers(headers, authorized=False))
+
+    def _get_etag_api_call(self, uri, headers=None):
+        """ makes the GET call without the response cache, returns the decoded json and the ETag of the response """
+        response = self._api_call('GET', uri, headers)
+        return response.json(), response.headers.get('ETag')
+
+    def _cached_get_call(self, uri, headers):
+        """ Makes the GET call and returns the decoded response. If the connector has a response cache and the uri has a
+            ttl the cached response is returned while it's fresh, and it's revalidated with its ETag when it's expired
+        """
+        ttl = self.response_cache.ttl(uri) if self.response_cache is not None else None
+        if ttl is None:
+            return self._perform_request('GET', self._api_url(uri), headers=headers, decode=True)
+        key = self.response_cache.key(uri, headers, self._api_prefix, self._user)
+        entry = self.response_cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.json()
+        if entry is not None and entry.etag:
+            headers = dict(headers, **{'If-None-Match': entry.etag})
+        response = self._perform_request('GET', self._api_url(uri), headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.response_cache.refresh(key, ttl)
+            return entry.json()
+        self.response_cache.set(key, response.text, ttl, response.headers.get('ETag'))
+        return json.loads(response.text)
+
+    def _invalidate_cache(self, uri):
+        if self.response_cache is not None:
+            self.response_cache.invalidate(uri, self._api_prefix)
 
     def _post_api_call(self, uri, headers=None, parameters=None):
-        """ hide _perform_request to the simple POST api calls """
-        h = {
-            'Accept': 'application/vnd.netbackup+json;version={}'.format(self._version),
-            'Authorization': '{}'.format(self._token)
-        }
-        if headers:
-            for header, value in headers.items():
-                h[header] = value
-        if parameters:
-            return self._perform_request(
-                method=self._session.post,
-                url=urljoin(self._base_api_url, uri),
-                verify=self._verify,
-                headers=h,
-                json=parameters
-            )
-        else:
-            return self._perform_request(
-                method=self._session.post,
-                url=urljoin(self._base_api_url, uri),
-                verify=self._verify,
-                headers=h
-            )
+        return self._api_call('POST', uri, headers, parameters)
 
     def _delete_api_call(self, uri, headers=None, parameters=None):
-        """ hide _perform_request to the simple DELETE api calls """
-        h = {
-            'content-type': 'application/vnd.netbackup+json;version={}'.format(self._version),
-            'Authorization': '{}'.format(self._token)
-        }
-        if headers:
-            for header, value in headers.items():
-                h[header] = value
-        if parameters:
-            return self._perform_request(
-                method=self._session.delete,
-                url=urljoin(self._base_api_url, uri),
-                verify=self._verify,
-                headers=h,
-                json=parameters
+        return self._api_call('DELETE', uri, headers, parameters, content_header='content-type')
+
+    def _put_api_call(self, uri, headers=None, parameters=None):
+        return self._api_call('PUT', uri, headers, parameters)
+
+    def _patch_api_call(self, uri, headers=None, parameters=None):
+        return self._api_call('PATCH', uri, headers, parameters)
+
+    @staticmethod
+    def _paginated_url(url, element_id='', query=None):
+        """ builds the url of a paginated request with its query string, whose parameters are quoted once """
+        url = '{}/{}'.format(url, element_id) if element_id else url
+        if query:
+            url = url[:-1] if url[-1] == '/' else url
+            url += '?' + '&'.join([_quoted_parameter(q, v) for q, v in query.items()])
+        return url
+
+    def _paginated_get_call(self, url, element_id='', query=None, headers=None, parameters=None):
+        """ builds the query string of a paginated request and makes the GET call """
+        return self._get_api_call(self._paginated_url(url, element_id, query), headers, parameters)
+
+    def _first_page_query(self, filters='', sort='', page_limit=None, url=None):
+        """ returns the query of the first page of a paginated request and the page limit to use for the next ones.
+            page_limit is the number of elements per page, if None the one of the connector is used. With an
+            AdaptivePageLimit (or 'auto') the page size is adapted after every page to the response time of the server.
+            filters and sort can be built with nbuquery, their fields are validated against the ones of url
+        """
+        filters, sort = nbuquery.compile_query(filters, sort, url)
+        page_limit = self.page_limit if page_limit is None else page_limit
+        if page_limit == ADAPTIVE_PAGE_LIMIT:
+            page_limit = AdaptivePageLimit()
+        elif isinstance(page_limit, AdaptivePageLimit):
+            page_limit = page_limit.copy()
+        query = {'page[limit]': str(page_limit)}
+        if filters: query['filter'] = filters
+        if sort: query['sort'] = sort
+        return query, page_limit
+
+    def _page_elements(self, resp):
+        """ returns the elements of a page, as records if the connector is typed """
+        elements = resp['data'] if 'data' in resp else []
+        return [nbumodels.from_element(element) for element in elements] if self.typed else elements
+
+    def _typed_response(self, resp):
+        """ replaces the element, or the list of elements, in the data of the response with records if the connector
+            is typed
+        """
+        if not self.typed or not isinstance(resp, dict) or 'data' not in resp:
+            return resp
+        data = resp['data']
+        resp['data'] = self._page_elements(resp) if isinstance(data, list) else nbumodels.from_element(data)
+        return resp
+
+    @staticmethod
+    def _next_pagination(resp):
+        """ returns the pagination info of the response if there are more pages to request, else None """
+        if 'links' not in resp or 'next' not in resp['links']:
+            return None
+        pagination = resp['meta']['pagination']
+        if not pagination['pages'] or pagination['page'] + 1 >= pagination['pages']:
+            return None
+        return pagination
+
+    @staticmethod
+    def _next_page_query(query, pagination, page_limit, elapsed):
+        """ updates the query to request the page after the one described by pagination, that took elapsed seconds """
+        query['page[offset]'] = pagination['next']
+        if isinstance(page_limit, AdaptivePageLimit):
+            query['page[limit]'] = str(page_limit.update(elapsed, pagination, query['page[limit]']))
+        return query
+
+    @staticmethod
+    def _remaining_page_queries(query, pagination):
+        """ Returns an iterator over the queries of all the pages after the one described by pagination.
+            The number of pages reported by the server is used to compute all the page[offset] values.
+        """
+        limit = pagination['limit'] if 'limit' in pagination else int(query['page[limit]'])
+        for offset in range(pagination['next'], pagination['pages'] * limit, limit):
+            page_query = dict(query)
+            page_query['page[offset]'] = offset
+            yield page_query
+
+    def _generate_pages(self, url, filters='', sort='', headers=None, parameters=None, max_workers=None,
+                        page_limit=None, cursor=None):
+        """ Loops calling _paginated_get_call() and yields the list of elements of every page.
+            The next page is requested only when the previous one has been consumed. If the connector streams the
+            responses every page is yielded as an iterator over its elements, parsed while they are received.
+            With max_workers the pages after the first one are requested in parallel, see _generate_parallel_pages()
+            With a cursor the traversal starts from its offset, that is set to the one of every page before yielding it
+        """
+        query, page_limit = self._first_page_query(filters, sort, page_limit, url)
+        if cursor is not None and cursor.offset:
+            query['page[offset]'] = cursor.offset
+        while True:
+            start = time.monotonic()
+            if self.stream and not parameters:
+                resp = {}
+                page = self._stream_get_call(self._paginated_url(url, query=query), headers, envelope=resp)
+                elapsed = time.monotonic() - start
+                if cursor is not None:
+                    cursor.offset = int(query.get('page[offset]', 0))
+                yield page
+                # the pagination follows the elements, the ones that were not consumed are skipped to read it
+                collections.deque(page, maxlen=0)
+            else:
+                resp = self._paginated_get_call(url=url, query=query, headers=headers, parameters=parameters)
+                elapsed = time.monotonic() - start
+                if cursor is not None:
+                    cursor.offset = int(query.get('page[offset]', 0))
+                yield self._page_elements(resp)
+            pagination = self._next_pagination(resp)
+            if not pagination:
+                return
+            if max_workers and max_workers > 1:
+                queries = self._remaining_page_queries(query, pagination)
+                for page in self._generate_parallel_pages(url, queries, headers, parameters, max_workers, cursor):
+                    yield page
+                return
+            self._next_page_query(query, pagination, page_limit, elapsed)
+
+    def _generate_parallel_pages(self, url, queries, headers=None, parameters=None, max_workers=2, cursor=None):
+        """ Requests the pages of the given queries on a pool of max_workers threads.
+            The pages are yielded in the server order and at most 2 * max_workers pages are requested ahead of the one
+            being consumed, so the memory used is still bounded.
+        """
+        def get_page(query):
+            return self._page_elements(
+                self._paginated_get_call(url=url, query=query, headers=headers, parameters=parameters)
             )
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        pending = collections.deque()
+        try:
+            for query in itertools.islice(queries, 2 * max_workers):
+                pending.append((query, executor.submit(get_page, query)))
+            while pending:
+                page_query, future = pending.popleft()
+                page = future.result()
+                query = next(queries, None)
+                if query is not None:
+                    pending.append((query, executor.submit(get_page, query)))
+                if cursor is not None:
+                    cursor.offset = int(page_query['page[offset]'])
+                yield page
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _paginated_iter(self, url, filters='', sort='', headers=None, parameters=None, max_workers=None,
+                        page_limit=None, cursor=None, checkpoint=None):
+        """ Returns an NbuPager, an iterator over all the elements of a paginated collection. Only one page at a time
+            is kept in memory, whatever the size of the collection.
+            The traversal starts after the cursor, an NbuCursor of a previous traversal with the same url, filters and
+            sort, or after the one saved in the file checkpoint, where the cursor is saved at every page
+        """
+        filters, sort = nbuquery.compile_query(filters, sort, url)
+        if cursor is None and checkpoint:
+            cursor = nbucursor.NbuCursor.load(checkpoint)
+        if cursor is None:
+            cursor = nbucursor.NbuCursor(url, filters, sort)
+        elif not cursor.same_traversal(url, filters, sort):
+            raise ValueError('{!r} is the cursor of another traversal, not of {} with filter "{}" and sort "{}"'.format(
+                cursor, url, filters, sort))
         else:
-            return self._perform_request(
-                method=self._session.delete,
-                url=urljoin(self._base_api_url, uri),
-                verify=self._verify,
-                headers=h
-            )
+            cursor = cursor.next_offset()
+        pages = None if cursor.done else self._generate_pages(url, filters, sort, headers, parameters, max_workers,
+                                                              page_limit, cursor)
+        return nbucursor.NbuPager(pages, cursor, checkpoint)
 
-    def _paginated_get_request(self, url, element_id='', filters='', sort='', headers=None, parameters=None):
+    def resume(self, cursor, max_workers=None, page_limit=None, checkpoint=None):
+        """ Returns an NbuPager that continues the traversal of the cursor, an NbuCursor or the path of the file where
+            it was saved
+        """
+        if isinstance(cursor, str):
+            path, cursor = cursor, nbucursor.NbuCursor.load(cursor)
+            if cursor is None:
+                raise ValueError('there is no cursor in {}'.format(path))
+        return self._paginated_iter(cursor.url, cursor.filter, cursor.sort, max_workers=max_workers,
+                                    page_limit=page_limit, cursor=cursor, checkpoint=checkpoint)
+
+    def _paginated_get_request(self, url, element_id='', filters='', sort='', headers=None, parameters=None,
+                               max_workers=None, page_limit=None):
         """ Some API GET calls support pagination: they return the requested values in pages and we need to request all
             the pages to get all the values.
             Here I try to handle this for all the methods that are using this type of call.
 
-            - get_call(): builds the query and makes the GET call
-            - generate_elements(): loops calling get_call() to retrieve all the elements
+            - _first_page_query(): builds the query of the first page
+            - _paginated_get_call(): builds the url with the query and makes the GET call
+            - _generate_pages(): loops calling _paginated_get_call() to retrieve all the pages
+            - _generate_parallel_pages(): retrieves the pages in parallel when max_workers is set
+            - _paginated_iter(): iterates over the elements of all the pages
 
-            The last part of the method is discriminating between a call to get a single element or to get all the
-            elements
+            The method is discriminating between a call to get a single element or to get all the elements, in the
+            second case the elements of the pages of _generate_pages() are collected in a single list.
+            If max_workers is set the pages are requested in parallel by max_workers threads, but the elements are
+            returned in the same order.
+            page_limit overrides the page size of the connector for this call
 
             So far it's possible to use it only for API calls that are structured as ../resource/type/resource_id where
             the resource_id is what here is called element_id
         """
-        def get_call(url, element_id='', query=None, headers=None, parameters=None):
-            url = '{}/{}'.format(url, element_id) if element_id else url
-            if query:
-                url = url[:-1] if url[-1] == '/' else url
-                url += '?'
-                url += requests.utils.quote('&'.join(['{}={}'.format(q, v) for q, v in query.items()]), safe='=&')
-            return self._get_api_call(url, headers, parameters)
-
-        def generate_elements(query, url, headers=None, parameters=None):
-            page_offset = ''
-            more = True
-            while more:
-                if page_offset: query['page[offset]'] = page_offset
-                resp = get_call(url=url, query=query, headers=headers, parameters=parameters)
-                if 'links' in resp:
-                    if 'next' in resp['links']:
-                        page_offset = resp['meta']['pagination']['next']
-                    if (resp['meta']['pagination']['page'] + 1 == resp['meta']['pagination']['pages']) or resp['meta']['pagination']['pages'] == 0:
-                        more = False
-                yield resp['data'] if 'data' in resp else []
-
         if element_id:
-            return get_call(url=url, element_id=element_id, headers=headers, parameters=parameters)
+            return self._typed_response(
+                self._paginated_get_call(url=url, element_id=element_id, headers=headers, parameters=parameters)
+            )
         else:
-            query = {'page[limit]': DEFAULT_PAGE_LIMIT}
-            if filters: query['filter'] = filters
-            if sort: query['sort'] = sort
-            elements = {'data': []}
-            for job_list in generate_elements(query, url, headers, parameters):
-                elements['data'] = elements['data'] + job_list
-            return elements
+            pages = self._generate_pages(url, filters, sort, headers, parameters, max_workers, page_limit)
+            return {'data': list(itertools.chain.from_iterable(pages))}
+
+    def _run_bulk(self, function, items, max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        """ Calls function for every item, with at most max_workers concurrent calls and, with rate_limit, starting at
+            most rate_limit calls per second. The failed calls don't stop the others: returns a BulkResults with the
+            result of every item, in the same order
+        """
+        limiter = nbubulk.RateLimiter(rate_limit) if rate_limit else None
+
+        def call(item):
+            if limiter is not None:
+                limiter.wait()
+            try:
+                return nbubulk.BulkResult.from_response(item, function(item))
+            except Exception as e:
+                return nbubulk.BulkResult.from_exception(item, e)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return nbubulk.BulkResults(executor.map(call, items))
 
     # NETBACKUP AUTHENTICATION API
 
-    def login(self):
+    def _request_token(self):
+        """ makes the login call, returns the token and its validity in seconds """
         resp = self._perform_request(
-            method=self._session.post,
-            url=urljoin(self._base_api_url, 'login'),
-            verify=self._verify,
-            headers={'content-type': 'application/vnd.netbackup+json;version={}'.format(self._version)},
-            json={
-                'userName': self._user,
-                'password': self._password,
-                'domainType': '',
-                'domainName': ''
-            },
+            method='POST',
+            url=self._api_url('login'),
+            headers=self._api_headers(authorized=False, content_header='content-type'),
+            json=self._login_parameters(),
+            relogin=False,
+            decode=True,
         )
-        self._token = resp.json()['token']
+        return resp['token'], resp['validity'] if 'validity' in resp else None
+
+    def _cached_token(self, expired_token=None):
+        """ Returns the token stored in the token cache. If there isn't one or it is the expired one a login is done and
+            the new token is stored. The cache is locked meanwhile, so concurrent processes do only one login
+        """
+        with self.token_cache.lock():
+            token = self.token_cache.get(self._base_api_url, self._user)
+            if token is None or token == expired_token:
+                token, validity = self._request_token()
+                self.token_cache.set(self._base_api_url, self._user, token, validity)
+        return token
+
+    def _refresh_token(self, expired_token):
+        """ Replaces the expired token with a new one and returns it. If another thread has already replaced it the
+            new token is returned without logging in again
+        """
+        with self._token_lock:
+            if self._token is not None and self._token != expired_token:
+                return self._token
+            if self.token_cache is None:
+                return self._set_token(self._request_token()[0])
+            return self._set_token(self._cached_token(expired_token))
+
+    def login(self):
+        """ With a token cache, a valid token stored by another connector is used instead of doing the login """
+        with self._token_lock:
+            if self.token_cache is None:
+                self._set_token(self._request_token()[0])
+            else:
+                self._set_token(self._cached_token())
 
     def logout(self):
         self._perform_request(
-            method=self._session.post,
-            url=urljoin(self._base_api_url, 'logout'),
-            verify=self._verify,
-            headers={
-                'Accept': 'application/vnd.netbackup+json;version={}'.format(self._version),
-                'Authorization': '{}'.format(self._token)
-            }
+            method='POST',
+            url=self._api_url('logout'),
+            headers=self._api_headers(),
+            relogin=False,
         )
+        if self.token_cache is not None:
+            self.token_cache.delete(self._base_api_url, self._user, self._token)
         self._token = None
 
     def set_api_key(self, api_key):
@@ -235,9 +768,8 @@ class NbuAuthorizationApi(object):
     def get_tokenkey(self):
         h = {'Accept': 'text/vnd.netbackup+html;version={}'.format(self._version)}
         return self._perform_request(
-            method=self._session.get,
-            url=urljoin(self._base_api_url, 'tokenkey'),
-            verify=self._verify,
+            method='GET',
+            url=self._api_url('tokenkey'),
             headers=h,
         ).content
 
@@ -246,8 +778,7 @@ class NbuAuthorizationApi(object):
 
     def delete_user_sessions(self):
         return self._perform_request(
-            method=self._session.delete,
-            url=urljoin(self._base_api_url, 'user-sessions'),
-            verify=self._verify,
+            method='DELETE',
+            url=self._api_url('user-sessions'),
             headers={'Authorization': '{}'.format(self._token)},
         ).content
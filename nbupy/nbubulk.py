@@ -0,0 +1,79 @@
+"""
+Module with the helpers of the bulk operations on the API of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import threading
+import time
+
+DEFAULT_BULK_WORKERS = 8
+
+
+class BulkResult(object):
+    """ Result of the call made for one item of a bulk operation """
+
+    def __init__(self, item, success, status_code=None, error=None, response=None):
+        self.item = item
+        self.success = success
+        self.status_code = status_code
+        self.error = error
+        self.response = response
+
+    def __bool__(self):
+        return self.success
+
+    def __repr__(self):
+        return '<BulkResult item={!r} success={} status_code={}>'.format(self.item, self.success, self.status_code)
+
+    @classmethod
+    def from_response(cls, item, response):
+        status_code = getattr(response, 'status_code', getattr(response, 'status', None))
+        return cls(item, True, status_code=status_code, response=response)
+
+    @classmethod
+    def from_exception(cls, item, exception):
+        """ for the HTTP errors the status code and the body of the response are kept, else the exception message """
+        response = getattr(exception, 'response', None)
+        if response is not None:
+            return cls(item, False, status_code=response.status_code, error=response.text, response=response)
+        body = getattr(exception, 'body', None)
+        if body is not None:
+            # the aiohttp errors of the asynchronous connector, that keep only the body of the response
+            return cls(item, False, status_code=getattr(exception, 'status', None), error=body)
+        return cls(item, False, status_code=getattr(exception, 'status', None), error=str(exception))
+
+
+class BulkResults(list):
+    """ List of the BulkResult of a bulk operation, in the same order of the items """
+
+    @property
+    def succeeded(self):
+        return [result for result in self if result.success]
+
+    @property
+    def failed(self):
+        return [result for result in self if not result.success]
+
+
+class RateLimiter(object):
+    """ Spaces the calls so that at most rate calls per second are started, it can be shared between threads """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """ reserves the next call and returns the seconds to wait before making it """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        return start - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,118 @@
+"""
+Module to cache the responses of the API of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import collections
+import json
+import threading
+import time
+
+DEFAULT_TTLS = {
+    'appdetails': 3600,
+    'config/policies': 300,
+    'storage/disk-pools': 300,
+    'storage/storage-units': 300,
+    'storage/storage-servers': 300,
+}
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class CacheEntry(object):
+    __slots__ = ('text', 'etag', 'expires')
+
+    def __init__(self, text, etag, expires):
+        self.text = text
+        self.etag = etag
+        self.expires = expires
+
+    def is_fresh(self):
+        return self.expires > time.time()
+
+    def json(self):
+        """ the response is decoded every time, so the callers can't modify the cached value """
+        return json.loads(self.text)
+
+
+class NbuResponseCache(object):
+    """
+        LRU cache of the responses of the GET calls, used by the connectors created with response_cache.
+
+        ttls maps the api uris to the seconds their responses are kept, the longest uri that is a prefix of the called
+        one is used, the responses of the uris that are not in ttls are not cached. The total size of the cached
+        responses is kept under max_size characters by discarding the least recently used ones.
+        When an expired response has an ETag it is revalidated with If-None-Match, and if the server answers 304 Not
+        Modified it's kept for another ttl.
+        The POST and DELETE calls of the connector invalidate the responses of the collection they modify.
+        A cache can be shared by many connectors: the responses are kept by master and user.
+    """
+
+    def __init__(self, ttls=None, max_size=DEFAULT_MAX_SIZE):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_size = max_size
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(uri):
+        return uri.lstrip('/')
+
+    def ttl(self, uri):
+        """ returns the seconds the responses of the uri are kept, None if they are not cached """
+        uri = self._normalize(uri)
+        matches = [prefix for prefix in self.ttls if uri.startswith(prefix)]
+        return self.ttls[max(matches, key=len)] if matches else None
+
+    def key(self, uri, headers=None, master='', user=''):
+        """ master is the base url of the api and user the one of the connector, the token is not part of the key,
+            so the responses are shared by the connectors of the same user
+        """
+        headers = tuple(sorted((h, v) for h, v in (headers or {}).items() if h != 'Authorization'))
+        return self._normalize(uri), headers, master, user
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, text, ttl, etag=None):
+        with self._lock:
+            self._discard(key)
+            if len(text) > self.max_size:
+                return
+            self._entries[key] = CacheEntry(text, etag, time.time() + ttl)
+            self.size += len(text)
+            while self.size > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def refresh(self, key, ttl):
+        """ keeps the entry for another ttl, after the server confirmed it's not modified """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = time.time() + ttl
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.text)
+
+    def invalidate(self, uri, master=None):
+        """ Discards the responses of the collection of the uri: for config/policies/name all the responses of
+            config/policies are discarded, for all the users of master, or of every master if it's None
+        """
+        collection = '/'.join(self._normalize(uri).split('/')[:2]).split('?')[0]
+        with self._lock:
+            for key in [key for key in self._entries
+                        if key[0].startswith(collection) and (master is None or key[2] == master)]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -6,20 +6,34 @@ by Sorint https://sorint.it
 License GPLv3
 """
 
-from . import nbuauth
+from . import nbuauth, nbubulk
 
 
 class NbuConfigurationApi(nbuauth.NbuAuthorizationApi):
     """ Here are implemented the methods for the configuration API of netbackup """
 
-    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='', timeout=0):
-        super().__init__(url, user, password, verify, domain_name, domain_type, version)
+    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='',
+                 timeout=nbuauth.DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(url, user, password, verify, domain_name, domain_type, version, timeout, **kwargs)
 
     # NETBACKUP CONFIGURATION API
 
     def get_policies(self, policyName=None):
         uri = 'config/policies/{}'.format(policyName) if policyName else 'config/policies/'
-        return self._get_api_call(uri)
+        return self._typed_response(self._get_api_call(uri))
+
+    def iter_policies(self):
+        """
+        Returns an iterator over all the policies, that are parsed while the response is received, so that they are
+        never all in memory
+        """
+        return self._stream_get_call('config/policies/')
+
+    def get_policy(self, policyName):
+        """
+        Returns the policy and its ETag, that can be passed to update_policy() to update it only if it has not changed
+        """
+        return self._get_etag_api_call('config/policies/{}'.format(policyName))
 
     def create_policy(self, policyRequest, reason='', generic='true'):
         return self._post_api_call(
@@ -27,10 +41,41 @@ class NbuConfigurationApi(nbuauth.NbuAuthorizationApi):
             {
                 'X-NetBackup-Audit-Reason': reason,
                 'X-NetBackup-Policy-Use-Generic-Schema': generic,
-                'Content-Type': 'application/vnd.netbackup+json;version={}'.format(self._version)
+                'Content-Type': self._media_type
             },
             parameters=policyRequest
         )
 
+    def update_policy(self, policyName, policyRequest, reason='', generic='true', etag=None):
+        """
+        Replaces the policy. With the etag returned by get_policy() the call fails with HTTP 412 if the policy has been
+        changed meanwhile
+        """
+        headers = {
+            'X-NetBackup-Audit-Reason': reason,
+            'X-NetBackup-Policy-Use-Generic-Schema': generic,
+            'Content-Type': self._media_type
+        }
+        if etag:
+            headers['If-Match'] = etag
+        return self._put_api_call('config/policies/{}'.format(policyName), headers, parameters=policyRequest)
+
     def delete_policy(self, policyName, reason=''):
-        return self._delete_api_call('config/policies/{}'.format(policyName))
+        return self._delete_api_call('config/policies/{}'.format(policyName), {'X-NetBackup-Audit-Reason': reason})
+
+    def create_policies(self, policyRequests, reason='', generic='true', max_workers=nbubulk.DEFAULT_BULK_WORKERS,
+                        rate_limit=None):
+        """
+        Creates all the policies with at most max_workers concurrent calls (and rate_limit calls per second),
+        returns a BulkResults with the result of every policy
+        """
+        return self._run_bulk(lambda policyRequest: self.create_policy(policyRequest, reason, generic), policyRequests,
+                              max_workers, rate_limit)
+
+    def delete_policies(self, policyNames, reason='', max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        """
+        Deletes all the policies with at most max_workers concurrent calls (and rate_limit calls per second),
+        returns a BulkResults with the result of every policy
+        """
+        return self._run_bulk(lambda policyName: self.delete_policy(policyName, reason), policyNames, max_workers,
+                              rate_limit)
@@ -0,0 +1,163 @@
+"""
+Module to resume the paginated traversals of the API of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import json
+import os
+
+CURSOR_VERSION = 1
+
+
+class NbuCursor(object):
+    """
+        Position of a paginated traversal: the url, filter and sort of its calls, the page[offset] of the current page
+        and the number of elements of that page already returned. done is True when all the pages have been returned.
+        It can be serialized with to_json() or save() and passed to the iter_* methods, or to resume(), to continue
+        the traversal with the next element.
+        The offsets are the ones of the server, so the traversal resumes correctly only if the elements before the
+        cursor have not changed: use a filter and a sort that keep them stable, like jobId le N sorted by jobId
+    """
+
+    def __init__(self, url, filter='', sort='', offset=0, position=0, done=False):
+        self.url = url
+        self.filter = filter
+        self.sort = sort
+        self.offset = offset
+        self.position = position
+        self.done = done
+
+    def __repr__(self):
+        return '<NbuCursor {} offset={} position={}{}>'.format(self.url, self.offset, self.position,
+                                                              ' done' if self.done else '')
+
+    def __eq__(self, other):
+        return isinstance(other, NbuCursor) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        return NbuCursor(self.url, self.filter, self.sort, self.offset, self.position, self.done)
+
+    def next_offset(self):
+        """ returns a cursor at the page[offset] of the next element, where the traversal is resumed """
+        return NbuCursor(self.url, self.filter, self.sort, self.offset + self.position, 0, self.done)
+
+    def same_traversal(self, url, filter, sort):
+        return (self.url.strip('/'), self.filter, self.sort) == (url.strip('/'), filter, sort)
+
+    def to_dict(self):
+        return {'version': CURSOR_VERSION, 'url': self.url, 'filter': self.filter, 'sort': self.sort,
+                'offset': self.offset, 'position': self.position, 'done': self.done}
+
+    @classmethod
+    def from_dict(cls, values):
+        if values.get('version') != CURSOR_VERSION:
+            raise ValueError('unsupported cursor version {}'.format(values.get('version')))
+        return cls(values['url'], values.get('filter', ''), values.get('sort', ''), values.get('offset', 0),
+                   values.get('position', 0), values.get('done', False))
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def save(self, path):
+        """ writes the cursor to path, replacing the previous one atomically """
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'w') as f:
+            f.write(self.to_json())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """ returns the cursor saved in path, None if there is not one """
+        try:
+            with open(path) as f:
+                return cls.from_json(f.read())
+        except FileNotFoundError:
+            return None
+
+
+class NbuPager(object):
+    """
+        Iterator over the elements of a paginated traversal, returned by the iter_* methods. cursor is the position of
+        the traversal after the elements already returned.
+        With checkpoint, the path of a file, the cursor is saved there every time a page is started, that is when all
+        the elements of the previous pages have been returned and the next one has been requested, and the file is
+        removed at the end of the traversal. If the file exists when the traversal starts it is resumed from there, so
+        after a failure at most the elements of a page are returned again.
+        The pager of an asynchronous connector is an asynchronous iterator.
+    """
+
+    def __init__(self, pages, cursor, checkpoint=None):
+        """ pages are the pages of the traversal (None if it's done) as yielded by _generate_pages() """
+        self._pages = pages
+        self._cursor = cursor
+        self.checkpoint = checkpoint
+        self._elements = None
+
+    def __repr__(self):
+        return '<NbuPager {!r}>'.format(self._cursor)
+
+    @property
+    def cursor(self):
+        """ a copy of the current position of the traversal """
+        return self._cursor.copy()
+
+    def _start_page(self):
+        """ called when a page is received, the offset of the cursor is already the one of the page """
+        self._cursor.position = 0
+        if self.checkpoint:
+            self._cursor.save(self.checkpoint)
+
+    def _finish(self):
+        self._cursor.done = True
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def _generate(self):
+        cursor = self._cursor
+        for page in self._pages or ():
+            self._start_page()
+            for element in page:
+                cursor.position += 1
+                yield element
+        self._finish()
+
+    async def _agenerate(self):
+        cursor = self._cursor
+        if self._pages is not None:
+            async for page in self._pages:
+                self._start_page()
+                if hasattr(page, '__aiter__'):
+                    # a page of a connector that streams the responses
+                    async for element in page:
+                        cursor.position += 1
+                        yield element
+                else:
+                    for element in page:
+                        cursor.position += 1
+                        yield element
+        self._finish()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._elements is None:
+            self._elements = self._generate()
+        return next(self._elements)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._elements is None:
+            self._elements = self._agenerate()
+        return await self._elements.__anext__()
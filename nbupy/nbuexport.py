@@ -0,0 +1,348 @@
+"""
+Module to export the jobs and the storage of Veritas Netbackup to columnar formats and files
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import array
+import csv
+import datetime
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from . import nbuauth, nbumodels, nbusnapshot
+
+DEFAULT_BATCH_SIZE = 10000
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _parse_timestamp(value):
+    """ returns the milliseconds since the epoch of a time of the api, like 2020-01-01T10:00:00.000Z """
+    if not value:
+        return None
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return (moment - EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def _format_timestamp(milliseconds):
+    return (EPOCH + datetime.timedelta(milliseconds=milliseconds)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _nullable(function):
+    return lambda value: None if value is None or value == '' else function(value)
+
+
+COERCIONS = {
+    'str': _nullable(str),
+    'int': _nullable(int),
+    'float': _nullable(float),
+    'bool': _nullable(bool),
+    'timestamp': _parse_timestamp,
+    'kilobytes': _nullable(lambda value: int(value) * 1024),
+}
+
+
+class Column(object):
+    """
+        Column of an export: name is its name, path the keys of the value in the element of the api (by default the
+        attribute with the same name) and type how the value is coerced:
+        'str', 'int', 'float', 'bool', 'timestamp' (the times of the api, exported as UTC datetimes) or 'kilobytes'
+        (a size in KB, exported as an int number of bytes)
+    """
+
+    def __init__(self, name, path=None, type='str'):
+        if type not in COERCIONS:
+            raise ValueError('unknown column type {}, use one of {}'.format(type, ', '.join(COERCIONS)))
+        self.name = name
+        self.path = tuple(path) if path else ('attributes', name)
+        self.type = type
+        self._coerce = COERCIONS[type]
+
+    def __repr__(self):
+        return '<Column {} {}>'.format(self.name, self.type)
+
+    def value(self, element):
+        value = element
+        for key in self.path:
+            value = value.get(key) if isinstance(value, dict) else None
+        return self._coerce(value)
+
+
+JOB_COLUMNS = (
+    Column('jobId', type='int'),
+    Column('parentJobId', type='int'),
+    Column('jobType'),
+    Column('policyType'),
+    Column('policyName'),
+    Column('scheduleType'),
+    Column('scheduleName'),
+    Column('clientName'),
+    Column('state'),
+    Column('status', type='int'),
+    Column('startTime', type='timestamp'),
+    Column('endTime', type='timestamp'),
+    Column('lastUpdateTime', type='timestamp'),
+    Column('bytesTransferred', ('attributes', 'kilobytesTransferred'), 'kilobytes'),
+    Column('numberOfFiles', type='int'),
+    Column('percentComplete', type='int'),
+    Column('destinationStorageUnitName'),
+    Column('destinationMediaServerName'),
+)
+DISK_POOL_COLUMNS = (
+    Column('id', ('id',)),
+    Column('name'),
+    Column('sType'),
+    Column('storageCategory'),
+    Column('diskPoolState'),
+    Column('usableSizeBytes', type='int'),
+    Column('availableSpaceBytes', type='int'),
+    Column('usedCapacityBytes', type='int'),
+    Column('rawSizeBytes', type='int'),
+)
+STORAGE_UNIT_COLUMNS = (
+    Column('name'),
+    Column('storageType'),
+    Column('storageSubType'),
+    Column('storageServerType'),
+    Column('maxConcurrentJobs', type='int'),
+    Column('maxFragmentSizeMegabytes', type='int'),
+    Column('onDemandOnly', type='bool'),
+    Column('diskPool', ('relationships', 'diskPool', 'data', 'id')),
+)
+DATASETS = {
+    'jobs': ('admin/jobs/', JOB_COLUMNS, '-startTime'),
+    'disk-pools': ('storage/disk-pools', DISK_POOL_COLUMNS, ''),
+    'storage-units': ('storage/storage-units', STORAGE_UNIT_COLUMNS, ''),
+}
+
+
+def _require(module, name, extra):
+    if module is None:
+        raise ImportError('{} is needed for this export, install it with "pip install {}"'.format(name, extra))
+
+
+class NbuExporter(object):
+    """
+        Exports the elements of a paginated endpoint, 'jobs', 'disk-pools' or 'storage-units', as columns.
+
+        The pages are requested while exporting and converted to batches of batch_size rows, so the files (JSONL, CSV
+        and Parquet) are written with bounded memory, and the in memory formats (NumPy, pandas and Arrow) keep only the
+        columns, in typed arrays, and never the whole json.
+        columns are the names of the columns to export, from the default ones of the dataset, or Column objects to
+        export other values of the elements. filters, sort, max_workers and page_limit are passed to the paginated
+        calls as in get_jobs(). The connector must be logged in and must not be an asynchronous one:
+
+        >>> exporter = NbuExporter(nbu, 'jobs', columns=['jobId', 'policyName', 'startTime', 'bytesTransferred'],
+        ...                        filters="state eq 'DONE'", max_workers=4)
+        >>> exporter.to_parquet('jobs.parquet')
+
+        With start the jobs started between start and end (now by default) are read in time windows requested in
+        parallel by max_workers threads, see NbuJobSnapshot, and exported by startTime, whatever the sort
+    """
+
+    def __init__(self, connector, dataset='jobs', columns=None, filters='', sort=None, max_workers=None,
+                 page_limit=None, batch_size=DEFAULT_BATCH_SIZE, start=None, end=None):
+        if dataset not in DATASETS:
+            raise ValueError('unknown dataset {}, use one of {}'.format(dataset, ', '.join(DATASETS)))
+        if start is not None and dataset != 'jobs':
+            raise ValueError('only the jobs can be exported by start time')
+        self.connector = connector
+        self.url, default_columns, default_sort = DATASETS[dataset]
+        self.columns = self._columns(columns, default_columns)
+        self.filters = filters
+        self.sort = default_sort if sort is None else sort
+        self.max_workers = max_workers
+        self.page_limit = page_limit
+        self.batch_size = batch_size
+        self.start = start
+        self.end = end
+
+    @staticmethod
+    def _columns(columns, default_columns):
+        if columns is None:
+            return list(default_columns)
+        by_name = {column.name: column for column in default_columns}
+        projected = []
+        for column in columns:
+            if isinstance(column, Column):
+                projected.append(column)
+            elif column in by_name:
+                projected.append(by_name[column])
+            else:
+                raise ValueError('unknown column {}, use a Column to export it'.format(column))
+        return projected
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    def iter_rows(self):
+        """ yields a tuple with the coerced values of every element """
+        if self.start is not None:
+            pages = nbusnapshot.NbuJobSnapshot(self.connector, self.start, self.end, self.filters,
+                                               max_workers=self.max_workers or nbusnapshot.DEFAULT_WORKERS,
+                                               page_limit=self.page_limit or nbuauth.MAX_PAGE_LIMIT).iter_pages()
+        else:
+            pages = self.connector._generate_pages(self.url, self.filters, self.sort, max_workers=self.max_workers,
+                                                   page_limit=self.page_limit)
+        values = [column.value for column in self.columns]
+        for page in pages:
+            for element in page:
+                element = nbumodels.to_element(element)
+                yield tuple(value(element) for value in values)
+
+    def iter_batches(self):
+        """ yields lists of at most batch_size rows """
+        batch = []
+        for row in self.iter_rows():
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # FILES
+
+    def _text_row(self, row):
+        return [_format_timestamp(value) if column.type == 'timestamp' and value is not None else value
+                for column, value in zip(self.columns, row)]
+
+    def to_jsonl(self, path):
+        """ writes an object per line, returns the number of rows """
+        count = 0
+        names = self.names
+        with open(path, 'w') as f:
+            for batch in self.iter_batches():
+                f.writelines(json.dumps(dict(zip(names, self._text_row(row)))) + '\n' for row in batch)
+                count += len(batch)
+        return count
+
+    def to_csv(self, path, **kwargs):
+        """ writes the rows with a header, kwargs are passed to csv.writer, returns the number of rows """
+        count = 0
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f, **kwargs)
+            writer.writerow(self.names)
+            for batch in self.iter_batches():
+                writer.writerows(self._text_row(row) for row in batch)
+                count += len(batch)
+        return count
+
+    # COLUMNS
+
+    def _column_buffers(self):
+        """ Collects all the rows in a buffer for each column: typed arrays for the numbers and the times, with a
+            mask of the missing values, and lists for the other values, where the equal strings are shared.
+            Returns {name: (type, values, mask)}
+        """
+        buffers = []
+        for column in self.columns:
+            typecode = {'int': 'q', 'kilobytes': 'q', 'timestamp': 'q', 'float': 'd'}.get(column.type)
+            buffers.append((column, array.array(typecode) if typecode else [], bytearray() if typecode else None))
+        shared = {}
+        for batch in self.iter_batches():
+            for position, (column, values, mask) in enumerate(buffers):
+                if mask is None:
+                    values.extend(shared.setdefault(row[position], row[position]) for row in batch)
+                    continue
+                for row in batch:
+                    value = row[position]
+                    mask.append(value is None)
+                    values.append(0 if value is None else value)
+        return {column.name: (column.type, values, mask) for column, values, mask in buffers}
+
+    @staticmethod
+    def _numpy_column(column_type, values, mask):
+        if mask is None:
+            dtype = bool if column_type == 'bool' and None not in values else object
+            return numpy.array(values, dtype=dtype)
+        column = numpy.frombuffer(values, dtype=numpy.float64 if column_type == 'float' else numpy.int64)
+        missing = numpy.frombuffer(bytes(mask), dtype=bool)
+        if column_type == 'timestamp':
+            column = column.astype('datetime64[ms]')
+            column[missing] = numpy.datetime64('NaT')
+        elif missing.any():
+            column = column.astype(numpy.float64)
+            column[missing] = numpy.nan
+        return column
+
+    def to_numpy(self):
+        """ returns a dict with a NumPy array for every column. The ints with missing values are converted to floats
+            with NaN, the times to datetime64[ms] (UTC) with NaT
+        """
+        _require(numpy, 'numpy', 'numpy')
+        return {name: self._numpy_column(*buffer) for name, buffer in self._column_buffers().items()}
+
+    def to_pandas(self):
+        """ returns a DataFrame, the ints with missing values use the nullable Int64 type, the times are UTC """
+        _require(pandas, 'pandas', 'pandas')
+        columns = {}
+        for name, (column_type, values, mask) in self._column_buffers().items():
+            column = self._numpy_column(column_type, values, mask)
+            if column_type == 'timestamp':
+                column = pandas.Series(column).dt.tz_localize('UTC')
+            elif mask is not None and column_type != 'float' and any(mask):
+                column = pandas.array(numpy.frombuffer(values, dtype=numpy.int64), dtype='Int64')
+                column[numpy.frombuffer(bytes(mask), dtype=bool)] = pandas.NA
+            columns[name] = column
+        return pandas.DataFrame(columns, columns=self.names)
+
+    # ARROW
+
+    def arrow_schema(self):
+        _require(pyarrow, 'pyarrow', 'pyarrow')
+        types = {
+            'str': pyarrow.string(),
+            'int': pyarrow.int64(),
+            'kilobytes': pyarrow.int64(),
+            'float': pyarrow.float64(),
+            'bool': pyarrow.bool_(),
+            'timestamp': pyarrow.timestamp('ms', tz='UTC'),
+        }
+        return pyarrow.schema([(column.name, types[column.type]) for column in self.columns])
+
+    def iter_record_batches(self):
+        """ yields an Arrow RecordBatch for every batch of rows """
+        schema = self.arrow_schema()
+        for batch in self.iter_batches():
+            arrays = [pyarrow.array([row[position] for row in batch], type=field.type)
+                      for position, field in enumerate(schema)]
+            yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def to_arrow(self):
+        """ returns an Arrow Table """
+        schema = self.arrow_schema()
+        return pyarrow.Table.from_batches(list(self.iter_record_batches()), schema=schema)
+
+    def to_parquet(self, path, **kwargs):
+        """ writes a row group for every batch, kwargs are passed to pyarrow.parquet.ParquetWriter. Returns the number
+            of rows
+        """
+        schema = self.arrow_schema()
+        count = 0
+        with pyarrow.parquet.ParquetWriter(path, schema, **kwargs) as writer:
+            for record_batch in self.iter_record_batches():
+                writer.write_table(pyarrow.Table.from_batches([record_batch]))
+                count += record_batch.num_rows
+        return count
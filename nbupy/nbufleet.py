@@ -0,0 +1,143 @@
+"""
+Module to use the API of many masters of Veritas Netbackup at the same time
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import concurrent.futures
+import time
+
+from . import nbumodels
+
+
+class FleetResult(object):
+    """ Result of the call made on one master: the returned value, or the exception raised """
+
+    def __init__(self, master, success, value=None, error=None, elapsed=None):
+        self.master = master
+        self.success = success
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    def __bool__(self):
+        return self.success
+
+    def __repr__(self):
+        return '<FleetResult master={!r} success={} elapsed={}>'.format(self.master, self.success, self.elapsed)
+
+
+class FleetResults(dict):
+    """ The FleetResult of every master, by master name """
+
+    @property
+    def succeeded(self):
+        return {master: result.value for master, result in self.items() if result.success}
+
+    @property
+    def failed(self):
+        return {master: result.error for master, result in self.items() if not result.success}
+
+    def merged(self, key='data'):
+        """
+        Merges the lists in key of the values returned by the masters, like the data of get_jobs(). Every element is
+        copied adding the name of its master in 'master', the records of the typed connectors are converted back to
+        elements
+        """
+        elements = []
+        for master, value in self.succeeded.items():
+            elements.extend(dict(nbumodels.to_element(element), master=master)
+                            for element in (value.get(key, []) if value else []))
+        return {key: elements}
+
+
+class FleetError(Exception):
+    """ Raised when the login fails on some masters, results is the FleetResults of the login """
+
+    def __init__(self, results):
+        self.results = results
+        super().__init__('login failed on the masters: {}'.format(
+            ', '.join('{} ({})'.format(master, error) for master, error in results.failed.items())))
+
+
+class NbuFleet(object):
+    """
+        Group of connectors, one for every master, that makes the same call on all the masters at the same time.
+        connectors is a dict with the connectors by master name, or a list of connectors that are named by their url.
+        Any method of the connectors can be called on the fleet, it returns a FleetResults:
+
+        >>> with NbuFleet([NbuApiConnector(url, user, password, False) for url in urls]) as fleet:
+        ...     jobs = fleet.get_jobs(filters="state eq 'ACTIVE'").merged()
+
+        timeout is the seconds to wait for every master, or a dict with the seconds by master name. A master that
+        doesn't answer in time is reported as failed with a TimeoutError, and its call is left running in background.
+        If the login fails on some masters, the other ones are logged out and a FleetError is raised
+    """
+
+    def __init__(self, connectors, timeout=None):
+        if isinstance(connectors, dict):
+            self.connectors = dict(connectors)
+        else:
+            self.connectors = {connector._base_api_url: connector for connector in connectors}
+        self.timeout = timeout
+
+    def __enter__(self):
+        self._connect('__enter__', '__exit__', None, None, None)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.call('__exit__', exc_type, exc_val, exc_tb)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def fleet_method(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        fleet_method.__name__ = name
+        return fleet_method
+
+    def login(self, timeout=None):
+        """ logs in on all the masters, returns the FleetResults of the login """
+        return self._connect('login', 'logout', timeout=timeout)
+
+    def _connect(self, method, undo, *undo_args, timeout=None):
+        """ calls method on all the masters, if it fails on some of them calls undo on the others and raises """
+        results = self.call(method, timeout=timeout)
+        if results.failed:
+            connected = {master: self.connectors[master] for master in results.succeeded}
+            NbuFleet(connected, self.timeout).call(undo, *undo_args)
+            raise FleetError(results)
+        return results
+
+    def _master_timeout(self, master, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        return timeout.get(master) if isinstance(timeout, dict) else timeout
+
+    def call(self, method, *args, timeout=None, **kwargs):
+        """ calls the method with the given arguments on all the masters, returns a FleetResults """
+        def call_master(connector):
+            start = time.monotonic()
+            value = getattr(connector, method)(*args, **kwargs)
+            return value, time.monotonic() - start
+
+        start = time.monotonic()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(self.connectors), 1))
+        futures = {master: executor.submit(call_master, connector) for master, connector in self.connectors.items()}
+        results = FleetResults()
+        try:
+            for master, future in futures.items():
+                master_timeout = self._master_timeout(master, timeout)
+                remaining = None if master_timeout is None else max(start + master_timeout - time.monotonic(), 0)
+                try:
+                    value, elapsed = future.result(timeout=remaining)
+                    results[master] = FleetResult(master, True, value=value, elapsed=elapsed)
+                except concurrent.futures.TimeoutError:
+                    error = TimeoutError('{} did not answer in {} seconds'.format(master, master_timeout))
+                    results[master] = FleetResult(master, False, error=error, elapsed=time.monotonic() - start)
+                except Exception as e:
+                    results[master] = FleetResult(master, False, error=e, elapsed=time.monotonic() - start)
+        finally:
+            executor.shutdown(wait=False)
+        return results
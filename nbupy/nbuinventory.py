@@ -0,0 +1,145 @@
+"""
+Module with the inventory of the storage of Veritas Netbackup and its capacity
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import collections
+import time
+
+from . import nbumodels
+
+DEFAULT_WORKERS = 8
+
+
+def _attribute(element, name, default=None):
+    value = element.get('attributes', {}).get(name)
+    return default if value is None else value
+
+
+def _elements(values):
+    return [nbumodels.to_element(value) for value in values]
+
+
+def _related_ids(element, relationship):
+    """ the ids of the elements of a relationship, that can be one element or a list of them """
+    data = element.get('relationships', {}).get(relationship, {}).get('data')
+    if data is None:
+        return []
+    return [related['id'] for related in (data if isinstance(data, list) else [data]) if related]
+
+
+class Capacity(object):
+    """ total and free bytes of some storage """
+
+    __slots__ = ('total', 'free')
+
+    def __init__(self, total=0, free=0):
+        self.total = total
+        self.free = free
+
+    def __repr__(self):
+        return '<Capacity total={} free={}>'.format(self.total, self.free)
+
+    def __eq__(self, other):
+        return isinstance(other, Capacity) and (self.total, self.free) == (other.total, other.free)
+
+    def __add__(self, other):
+        return Capacity(self.total + other.total, self.free + other.free)
+
+    @property
+    def used(self):
+        return self.total - self.free
+
+    @property
+    def used_percent(self):
+        return 100.0 * self.used / self.total if self.total else 0.0
+
+    def to_dict(self):
+        return {'total': self.total, 'free': self.free, 'used': self.used}
+
+
+class StorageInventory(object):
+    """
+        The storage servers, disk pools, storage units and disk volumes of a master, as returned by the api (typed
+        records are converted back to elements), joined by id:
+
+        - servers, disk_pools and storage_units are dicts of the elements by id, disk_volumes the lists of the disk
+          volumes by storage server id
+        - pools_by_server, units_by_pool and volumes_by_pool are the ids (or the elements, for the volumes) of the
+          related elements; a volume is in the pool named by its diskPoolName
+        - server_capacity and pool_capacity are the Capacity by id. A pool has the usableSizeBytes and the
+          availableSpaceBytes it reports, or else the sum of its volumes, a server the sum of its disk volumes, or else
+          the sum of its pools
+
+        created is the time.monotonic() of the creation, age the seconds since then
+    """
+
+    def __init__(self, servers, disk_pools, storage_units, disk_volumes):
+        self.servers = collections.OrderedDict((server['id'], server) for server in _elements(servers))
+        self.disk_pools = collections.OrderedDict((pool['id'], pool) for pool in _elements(disk_pools))
+        self.storage_units = collections.OrderedDict((unit['id'], unit) for unit in _elements(storage_units))
+        self.disk_volumes = {server_id: _elements(volumes) for server_id, volumes in disk_volumes.items()}
+        self.created = time.monotonic()
+        self.pools_by_server = collections.defaultdict(list)
+        for pool_id, pool in self.disk_pools.items():
+            for server_id in _related_ids(pool, 'storageServers'):
+                self.pools_by_server[server_id].append(pool_id)
+        self.units_by_pool = collections.defaultdict(list)
+        for unit_id, unit in self.storage_units.items():
+            for pool_id in _related_ids(unit, 'diskPool'):
+                self.units_by_pool[pool_id].append(unit_id)
+        pools_by_name = {_attribute(pool, 'name'): pool_id for pool_id, pool in self.disk_pools.items()}
+        self.volumes_by_pool = collections.defaultdict(list)
+        for volumes in self.disk_volumes.values():
+            for volume in volumes:
+                pool_id = pools_by_name.get(_attribute(volume, 'diskPoolName'))
+                if pool_id is not None:
+                    self.volumes_by_pool[pool_id].append(volume)
+        self.pool_capacity = {pool_id: self._pool_capacity(pool_id, pool) for pool_id, pool in self.disk_pools.items()}
+        self.server_capacity = {server_id: self._server_capacity(server_id) for server_id in self.servers}
+
+    def __repr__(self):
+        return '<StorageInventory servers={} disk_pools={} storage_units={}>'.format(
+            len(self.servers), len(self.disk_pools), len(self.storage_units))
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created
+
+    @staticmethod
+    def _volumes_capacity(volumes):
+        return sum((Capacity(_attribute(volume, 'totalCapacityBytes', 0), _attribute(volume, 'freeCapacityBytes', 0))
+                    for volume in volumes), Capacity())
+
+    def _pool_capacity(self, pool_id, pool):
+        if _attribute(pool, 'usableSizeBytes') is not None:
+            return Capacity(_attribute(pool, 'usableSizeBytes'), _attribute(pool, 'availableSpaceBytes', 0))
+        return self._volumes_capacity(self.volumes_by_pool.get(pool_id, ()))
+
+    def _server_capacity(self, server_id):
+        volumes = self.disk_volumes.get(server_id)
+        if volumes:
+            return self._volumes_capacity(volumes)
+        return sum((self.pool_capacity[pool_id] for pool_id in self.pools_by_server.get(server_id, ())), Capacity())
+
+    @property
+    def total_capacity(self):
+        """ the capacity of all the disk pools """
+        return sum(self.pool_capacity.values(), Capacity())
+
+    def unit_capacity(self, storageUnitName):
+        """ the capacity of the disk pool of the storage unit, None if it has no disk pool """
+        pools = _related_ids(self.storage_units[storageUnitName], 'diskPool')
+        return self.pool_capacity.get(pools[0]) if pools else None
+
+    def report(self):
+        """ returns a row for every disk pool: its name, servers, storage units and capacity """
+        rows = []
+        for pool_id, pool in self.disk_pools.items():
+            row = {'pool': _attribute(pool, 'name', pool_id), 'servers': _related_ids(pool, 'storageServers'),
+                   'storageUnits': self.units_by_pool.get(pool_id, [])}
+            row.update(self.pool_capacity[pool_id].to_dict())
+            rows.append(row)
+        return rows
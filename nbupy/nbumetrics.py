@@ -0,0 +1,183 @@
+"""
+Module to observe the calls made to the API of Veritas Netbackup and collect their metrics
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import bisect
+import threading
+
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def endpoint_template(path):
+    """
+    Returns the endpoint of the path of an api call, with the ids replaced by {id}: the api paths are structured as
+    category/collection/id/collection/id, e.g. storage/storage-servers/{id}/disk-volumes
+    """
+    segments = [segment for segment in path.split('/') if segment]
+    return '/'.join('{id}' if i >= 2 and i % 2 == 0 else segment for i, segment in enumerate(segments))
+
+
+class RequestEvent(object):
+    """
+        Description of a call to the api, passed to the observers of the connector when the call ends.
+        elapsed is the wall time of the call including the retries, decode_time the time spent decoding the json of
+        the response (None if it was not decoded), page the index of the page of a paginated call (None if it's not),
+        error the exception raised by the call (None if it succeeded)
+    """
+
+    __slots__ = ('method', 'url', 'endpoint', 'status', 'bytes', 'elapsed', 'decode_time', 'page', 'offset', 'retries',
+                 'error')
+
+    def __init__(self, method, url, base_url='', status=None, bytes=0, elapsed=0.0, decode_time=None, retries=0,
+                 error=None):
+        parsed = urlparse(url)
+        base_path = urlparse(base_url).path
+        path = parsed.path[len(base_path):] if base_path and parsed.path.startswith(base_path) else parsed.path
+        query = parse_qs(parsed.query)
+        self.method = method.upper()
+        self.url = url
+        self.endpoint = endpoint_template(path)
+        self.status = status
+        self.bytes = bytes
+        self.elapsed = elapsed
+        self.decode_time = decode_time
+        limit = int(query['page[limit]'][0]) if 'page[limit]' in query else None
+        self.offset = int(query['page[offset]'][0]) if 'page[offset]' in query else (0 if limit else None)
+        self.page = self.offset // limit if limit else None
+        self.retries = retries
+        self.error = error
+
+    def __repr__(self):
+        return '<RequestEvent {} {} status={} elapsed={:.3f}>'.format(self.method, self.endpoint, self.status,
+                                                                      self.elapsed)
+
+
+class _EndpointMetrics(object):
+
+    def __init__(self, buckets):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.retries = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_min = None
+        self.latency_max = None
+        self.latency_buckets = [0] * (len(buckets) + 1)
+        self.decode_count = 0
+        self.decode_sum = 0.0
+
+
+class NbuMetricsCollector(object):
+    """
+        Observer that keeps in memory, for every method and endpoint, the counters of the calls, errors, statuses,
+        retries and received bytes and the histogram of the latencies. It can be passed to the observers of more
+        connectors, it's thread safe
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            metrics = self._metrics.get((event.method, event.endpoint))
+            if metrics is None:
+                metrics = self._metrics[(event.method, event.endpoint)] = _EndpointMetrics(self.buckets)
+            metrics.requests += 1
+            if event.error is not None:
+                metrics.errors += 1
+            status = event.status if event.status is not None else 'error'
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.retries += event.retries
+            metrics.bytes += event.bytes
+            metrics.latency_sum += event.elapsed
+            metrics.latency_min = event.elapsed if metrics.latency_min is None else min(metrics.latency_min,
+                                                                                         event.elapsed)
+            metrics.latency_max = event.elapsed if metrics.latency_max is None else max(metrics.latency_max,
+                                                                                         event.elapsed)
+            metrics.latency_buckets[bisect.bisect_left(self.buckets, event.elapsed)] += 1
+            if event.decode_time is not None:
+                metrics.decode_count += 1
+                metrics.decode_sum += event.decode_time
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    def snapshot(self):
+        """ returns the metrics as a dict by 'METHOD endpoint' """
+        snapshot = {}
+        with self._lock:
+            for (method, endpoint), metrics in sorted(self._metrics.items()):
+                cumulative = 0
+                buckets = {}
+                for le, count in zip(self.buckets + (float('inf'),), metrics.latency_buckets):
+                    cumulative += count
+                    buckets[le] = cumulative
+                snapshot['{} {}'.format(method, endpoint)] = {
+                    'requests': metrics.requests,
+                    'errors': metrics.errors,
+                    'statuses': dict(metrics.statuses),
+                    'retries': metrics.retries,
+                    'bytes': metrics.bytes,
+                    'latency': {
+                        'sum': metrics.latency_sum,
+                        'mean': metrics.latency_sum / metrics.requests,
+                        'min': metrics.latency_min,
+                        'max': metrics.latency_max,
+                        'buckets': buckets,
+                    },
+                    'decode_time': {
+                        'count': metrics.decode_count,
+                        'sum': metrics.decode_sum,
+                    },
+                }
+        return snapshot
+
+    def to_prometheus(self, prefix='nbupy'):
+        """ returns the metrics in the Prometheus text exposition format """
+        lines = [
+            '# HELP {}_requests_total Calls to the NetBackup api.'.format(prefix),
+            '# TYPE {}_requests_total counter'.format(prefix),
+        ]
+        snapshot = self.snapshot()
+        for name, metrics in snapshot.items():
+            method, endpoint = name.split(' ', 1)
+            for status, count in sorted(metrics['statuses'].items(), key=lambda item: str(item[0])):
+                lines.append('{}_requests_total{{method="{}",endpoint="{}",status="{}"}} {}'.format(
+                    prefix, method, endpoint, status, count))
+        for metric, key, help_text in (('retries_total', 'retries', 'Retries of the calls to the NetBackup api.'),
+                                       ('response_bytes_total', 'bytes', 'Bytes received from the NetBackup api.')):
+            lines.append('# HELP {}_{} {}'.format(prefix, metric, help_text))
+            lines.append('# TYPE {}_{} counter'.format(prefix, metric))
+            for name, metrics in snapshot.items():
+                method, endpoint = name.split(' ', 1)
+                lines.append('{}_{}{{method="{}",endpoint="{}"}} {}'.format(prefix, metric, method, endpoint,
+                                                                             metrics[key]))
+        lines.append('# HELP {}_request_duration_seconds Duration of the calls to the NetBackup api.'.format(prefix))
+        lines.append('# TYPE {}_request_duration_seconds histogram'.format(prefix))
+        for name, metrics in snapshot.items():
+            method, endpoint = name.split(' ', 1)
+            labels = 'method="{}",endpoint="{}"'.format(method, endpoint)
+            for le, count in metrics['latency']['buckets'].items():
+                le = '+Inf' if le == float('inf') else repr(float(le))
+                lines.append('{}_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(prefix, labels, le, count))
+            lines.append('{}_request_duration_seconds_sum{{{}}} {}'.format(prefix, labels, metrics['latency']['sum']))
+            lines.append('{}_request_duration_seconds_count{{{}}} {}'.format(prefix, labels, metrics['requests']))
+        lines.append('# HELP {}_decode_duration_seconds Time spent decoding the responses.'.format(prefix))
+        lines.append('# TYPE {}_decode_duration_seconds summary'.format(prefix))
+        for name, metrics in snapshot.items():
+            method, endpoint = name.split(' ', 1)
+            labels = 'method="{}",endpoint="{}"'.format(method, endpoint)
+            lines.append('{}_decode_duration_seconds_sum{{{}}} {}'.format(prefix, labels,
+                                                                          metrics['decode_time']['sum']))
+            lines.append('{}_decode_duration_seconds_count{{{}}} {}'.format(prefix, labels,
+                                                                            metrics['decode_time']['count']))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,176 @@
+"""
+Module to keep a local SQLite mirror of the jobs of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import datetime
+import itertools
+import json
+import sqlite3
+
+from . import nbumodels
+
+MIRROR_SORT = '-lastUpdateTime'
+BATCH_SIZE = 1000
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    state TEXT,
+    status INTEGER,
+    job_type TEXT,
+    policy_name TEXT,
+    schedule_name TEXT,
+    client_name TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    last_update_time TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE INDEX IF NOT EXISTS jobs_policy_name ON jobs (policy_name);
+CREATE INDEX IF NOT EXISTS jobs_client_name ON jobs (client_name);
+CREATE INDEX IF NOT EXISTS jobs_start_time ON jobs (start_time);
+CREATE INDEX IF NOT EXISTS jobs_last_update_time ON jobs (last_update_time);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+UPSERT = '''
+INSERT OR REPLACE INTO jobs (job_id, state, status, job_type, policy_name, schedule_name, client_name, start_time,
+                             end_time, last_update_time, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _time_literal(value):
+    """ the times can be given as datetime (naive ones are considered UTC) or as strings in the format of the api """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime(TIME_FORMAT)
+    return value
+
+
+class NbuJobMirror(object):
+    """
+        Local copy of the jobs of a master in a SQLite database.
+
+        The first sync() downloads all the jobs, the next ones only the jobs whose lastUpdateTime is not older than the
+        watermark stored by the previous sync, using a server side filter. The jobs are sorted by descending
+        lastUpdateTime, so the watermark is the lastUpdateTime of the first job returned: the jobs updated while the
+        sync is running are moved before the current page and they are downloaded by the next sync.
+        The jobs are upserted by jobId, the jobs deleted on the master are not deleted from the mirror.
+
+        The connector must implement NbuAdministratorApi and must be logged in when sync() is called. With a typed
+        connector only the fields of the Job records are stored.
+    """
+
+    def __init__(self, connector, path):
+        self.connector = connector
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    @property
+    def watermark(self):
+        """ lastUpdateTime of the most recent job of the last sync, None if the mirror has never been synced """
+        row = self._db.execute("SELECT value FROM sync_state WHERE name = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _row(job):
+        job = nbumodels.to_element(job)
+        attributes = job['attributes']
+        return (
+            attributes['jobId'],
+            attributes.get('state'),
+            attributes.get('status'),
+            attributes.get('jobType'),
+            attributes.get('policyName'),
+            attributes.get('scheduleName'),
+            attributes.get('clientName'),
+            attributes.get('startTime'),
+            attributes.get('endTime'),
+            attributes.get('lastUpdateTime'),
+            json.dumps(job),
+        )
+
+    def sync(self, full=False, max_workers=None, page_limit=None):
+        """
+        Downloads the jobs updated after the last sync, or all the jobs if full is True or the mirror is empty.
+        The jobs are committed every BATCH_SIZE jobs, the watermark only at the end, so a failed sync is repeated by the
+        next one. Returns the number of jobs downloaded
+        """
+        watermark = None if full else self.watermark
+        filters = 'lastUpdateTime ge {}'.format(watermark) if watermark else ''
+        jobs = self.connector.iter_jobs(filters=filters, sort=MIRROR_SORT, max_workers=max_workers,
+                                        page_limit=page_limit)
+        new_watermark = None
+        count = 0
+        while True:
+            batch = list(itertools.islice(jobs, BATCH_SIZE))
+            if not batch:
+                break
+            if new_watermark is None:
+                new_watermark = nbumodels.to_element(batch[0])['attributes'].get('lastUpdateTime')
+            with self._db:
+                self._db.executemany(UPSERT, [self._row(job) for job in batch])
+            count += len(batch)
+        if new_watermark:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES ('watermark', ?)",
+                                 (new_watermark,))
+        return count
+
+    def get_job(self, jobId):
+        """ returns the job as returned by the api, or None if it's not in the mirror """
+        row = self._db.execute('SELECT data FROM jobs WHERE job_id = ?', (int(jobId),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, state=None, policy_name=None, client_name=None, start_after=None, start_before=None,
+              updated_after=None, limit=None, sort='-startTime'):
+        """
+        Returns the jobs of the mirror, as returned by the api, that match all the given conditions.
+        The times are datetime or strings in the format of the api, sort is startTime, lastUpdateTime or jobId,
+        with a leading '-' for the descending order
+        """
+        where, arguments = [], []
+        for column, value in (('state', state), ('policy_name', policy_name), ('client_name', client_name)):
+            if value is not None:
+                where.append('{} = ?'.format(column))
+                arguments.append(value)
+        for condition, value in (('start_time >= ?', start_after), ('start_time < ?', start_before),
+                                 ('last_update_time >= ?', updated_after)):
+            if value is not None:
+                where.append(condition)
+                arguments.append(_time_literal(value))
+        columns = {'startTime': 'start_time', 'lastUpdateTime': 'last_update_time', 'jobId': 'job_id'}
+        sql = 'SELECT data FROM jobs'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY {} {}'.format(columns[sort.lstrip('-')], 'DESC' if sort.startswith('-') else 'ASC')
+        if limit:
+            sql += ' LIMIT ?'
+            arguments.append(int(limit))
+        return [json.loads(row[0]) for row in self._db.execute(sql, arguments)]
+
+    def count(self, state=None):
+        """ returns the number of jobs in the mirror, optionally only the ones in the given state """
+        if state is None:
+            return self._db.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+        return self._db.execute('SELECT COUNT(*) FROM jobs WHERE state = ?', (state,)).fetchone()[0]
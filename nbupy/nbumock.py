@@ -0,0 +1,751 @@
+"""
+Module with a local mock of the API of Veritas Netbackup, to test and benchmark the connectors without a master
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import argparse
+import calendar
+import collections
+import gzip
+import hashlib
+import json
+import math
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+from . import nbumetrics
+
+BASE_PATH = '/netbackup/'
+CONTENT_TYPE = 'application/vnd.netbackup+json;version=3.0'
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+DEFAULT_PAGE_LIMIT = 10
+DEFAULT_MAX_PAGE_LIMIT = 1000
+DEFAULT_TOKEN_VALIDITY = 86400
+DEFAULT_JOB_INTERVAL = 60
+DEFAULT_FIRST_START_TIME = 1767225600  # 2026-01-01T00:00:00Z
+TIME_SORTED_JOB_FIELDS = ('jobId', 'startTime', 'lastUpdateTime')
+_START_TIME_WINDOW = re.compile(r'^startTime ge (\S+) and startTime lt (\S+)$')
+
+_FILTER_TOKEN = re.compile(r"\s*(\(|\)|'(?:[^']|'')*'|[^\s()]+)")
+_FILTER_OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'ne': lambda a, b: a != b,
+    'gt': lambda a, b: a is not None and a > b,
+    'ge': lambda a, b: a is not None and a >= b,
+    'lt': lambda a, b: a is not None and a < b,
+    'le': lambda a, b: a is not None and a <= b,
+}
+
+
+class MockError(Exception):
+    """ Error answered by the mock with the given HTTP status and the error body of the api """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def format_time(timestamp):
+    return time.strftime(TIME_FORMAT, time.gmtime(timestamp))
+
+
+def parse_time(value):
+    """ returns the timestamp of a time of the api, like 2026-01-01T00:00:00.500Z """
+    seconds = calendar.timegm(time.strptime(value[:19], '%Y-%m-%dT%H:%M:%S'))
+    fraction = value[19:].rstrip('Z')
+    return seconds + float('0' + fraction) if fraction else seconds
+
+
+def _filter_value(token):
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    if token in ('true', 'false'):
+        return token == 'true'
+    if token == 'null':
+        return None
+    try:
+        return int(token)
+    except ValueError:
+        try:
+            return float(token)
+        except ValueError:
+            return token
+
+
+def compile_filter(expression):
+    """
+    Compiles the OData filter of the api, like "state eq 'ACTIVE' and (jobId gt 10 or jobType eq 'BACKUP')", to a
+    function that tells if the attributes of an element match it. The operators eq, ne, gt, ge, lt, le, the logical
+    operators and, or, not and the parentheses are supported, the times are compared as strings
+    """
+    tokens = _FILTER_TOKEN.findall(expression or '')
+    position = [0]
+
+    def peek():
+        return tokens[position[0]] if position[0] < len(tokens) else None
+
+    def take():
+        token = peek()
+        if token is None:
+            raise MockError(400, 'unexpected end of the filter "{}"'.format(expression))
+        position[0] += 1
+        return token
+
+    def parse_or():
+        terms = [parse_and()]
+        while peek() == 'or':
+            take()
+            terms.append(parse_and())
+        return terms[0] if len(terms) == 1 else lambda attributes: any(term(attributes) for term in terms)
+
+    def parse_and():
+        factors = [parse_not()]
+        while peek() == 'and':
+            take()
+            factors.append(parse_not())
+        return factors[0] if len(factors) == 1 else lambda attributes: all(factor(attributes) for factor in factors)
+
+    def parse_not():
+        if peek() == 'not':
+            take()
+            factor = parse_not()
+            return lambda attributes: not factor(attributes)
+        if peek() == '(':
+            take()
+            expression_function = parse_or()
+            if take() != ')':
+                raise MockError(400, 'missing ")" in the filter "{}"'.format(expression))
+            return expression_function
+        field, operator, value = take(), take(), _filter_value(take())
+        if operator not in _FILTER_OPERATORS:
+            raise MockError(400, 'unknown operator "{}" in the filter "{}"'.format(operator, expression))
+        compare = _FILTER_OPERATORS[operator]
+        return lambda attributes: compare(attributes.get(field), value)
+
+    if not tokens:
+        return lambda attributes: True
+    function = parse_or()
+    if peek() is not None:
+        raise MockError(400, 'unexpected "{}" in the filter "{}"'.format(peek(), expression))
+    return function
+
+
+class _Collection(object):
+    """ Elements of a collection of the api, kept in creation order by id """
+
+    def __init__(self, type_name, id_attribute='name'):
+        self.type_name = type_name
+        self.id_attribute = id_attribute
+        self.elements = collections.OrderedDict()
+
+    def add(self, attributes, element_id=None, relationships=None):
+        element_id = str(element_id if element_id is not None else attributes[self.id_attribute])
+        element = {'type': self.type_name, 'id': element_id, 'attributes': attributes}
+        if relationships:
+            element['relationships'] = relationships
+        self.elements[element_id] = element
+        return element
+
+    def get(self, element_id):
+        if element_id not in self.elements:
+            raise MockError(404, 'The {} {} does not exist.'.format(self.type_name, element_id))
+        return self.elements[element_id]
+
+    def create(self, body):
+        data = (body or {}).get('data') or {}
+        attributes = data.get('attributes') or {}
+        element_id = data.get('id') or attributes.get(self.id_attribute)
+        if not element_id:
+            raise MockError(400, 'The {} must have an id.'.format(self.type_name))
+        if str(element_id) in self.elements:
+            raise MockError(409, 'The {} {} already exists.'.format(self.type_name, element_id))
+        return self.add(attributes, element_id, data.get('relationships'))
+
+    def update(self, element_id, body):
+        element = self.get(element_id)
+        data = (body or {}).get('data') or {}
+        element['attributes'].update(data.get('attributes') or {})
+        if data.get('relationships'):
+            element['relationships'] = data['relationships']
+        return element
+
+    def delete(self, element_id):
+        self.get(element_id)
+        del self.elements[element_id]
+
+
+class NbuMockServer(object):
+    """
+        HTTP server that answers like a master of NetBackup to the calls made by the connectors of nbupy:
+        login, logout, the admin/jobs, config/policies and storage endpoints, with the pagination of the api (the
+        meta.pagination and links.next of every page).
+
+        The jobs are not stored: the job with index i is generated when requested, so the mock can serve millions of
+        jobs. jobs is their number, their jobId starts from 1 and their startTime grows with the jobId.
+        latency is the seconds every call waits before answering, item_latency the seconds added for every element of
+        a page. error_rate is the probability that a call fails with error_status (and Retry-After: retry_after if not
+        None), fail_next() makes the next calls fail. users maps the user names to their passwords, if None any user
+        is accepted. The tokens expire after token_validity seconds, expire_tokens() expires them all.
+        With compression the responses are gzipped for the clients that accept it.
+        requests counts the calls received by 'METHOD endpoint':
+
+        >>> with NbuMockServer(jobs=100000, latency=0.01) as mock:
+        ...     with NbuApiConnector(mock.url, 'user', 'password', False) as nbu:
+        ...         jobs = nbu.get_jobs(page_limit=1000)
+        ...     mock.requests['GET admin/jobs']
+        100
+    """
+
+    def __init__(self, jobs=1000, policies=10, storage_servers=2, disk_pools=4, storage_units=4, disk_volumes=2,
+                 host='127.0.0.1', port=0, latency=0.0, item_latency=0.0, error_rate=0.0, error_status=503,
+                 retry_after=None, max_page_limit=DEFAULT_MAX_PAGE_LIMIT, users=None,
+                 token_validity=DEFAULT_TOKEN_VALIDITY, job_interval=DEFAULT_JOB_INTERVAL, active_jobs=0, seed=0,
+                 compression=False):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.item_latency = item_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.max_page_limit = max_page_limit
+        self.compression = compression
+        self.users = users
+        self.token_validity = token_validity
+        self.job_interval = job_interval
+        self.active_jobs = active_jobs
+        self.requests = collections.Counter()
+        self.audit_reasons = []
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._tokens = {}
+        self._failures = collections.deque()
+        self._server = None
+        self._thread = None
+        self._job_count = jobs
+        self._job_overrides = {}
+        self._deleted_jobs = set()
+        self._jobs_version = 0
+        self._job_lists = collections.OrderedDict()
+        self._create_dataset(policies, storage_servers, disk_pools, storage_units, disk_volumes)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def url(self):
+        """ the url to pass to the connectors """
+        return 'http://{}:{}{}'.format(self.host, self.port, BASE_PATH)
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def start(self):
+        """ starts serving in a background thread, returns the url of the mock """
+        self._server = _MockHTTPServer((self.host, self.port), _MockRequestHandler)
+        self._server.mock = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='NbuMockServer', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        """ serves in the current thread until interrupted """
+        self._server = _MockHTTPServer((self.host, self.port), _MockRequestHandler)
+        self._server.mock = self
+        self.port = self._server.server_address[1]
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests.clear()
+            del self.audit_reasons[:]
+
+    def fail_next(self, count=1, status=503, retry_after=None):
+        """ makes the next count calls fail with status """
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def expire_tokens(self):
+        """ expires all the tokens, the next authorized calls are answered with 401 """
+        with self._lock:
+            self._tokens.clear()
+
+    # DATASET
+
+    def _create_dataset(self, policies, storage_servers, disk_pools, storage_units, disk_volumes):
+        self.policies = _Collection('policy', 'policyName')
+        for i in range(policies):
+            name = 'policy-{}'.format(i)
+            self.policies.add({'policy': {
+                'policyName': name,
+                'policyType': 'Standard',
+                'policyAttributes': {'active': True, 'storage': 'stu-{}'.format(i % max(storage_units, 1))},
+                'clients': [{'hostName': 'client-{}'.format(i)}],
+                'schedules': [{'scheduleName': 'daily', 'scheduleType': 'INCR', 'frequencySeconds': 86400}],
+            }}, name)
+        self.storage_servers = _Collection('storageServer')
+        self.disk_volumes = {}
+        for i in range(storage_servers):
+            server_id = 'PureDisk:media-{}'.format(i)
+            self.storage_servers.add({'name': 'media-{}'.format(i), 'sType': 'PureDisk', 'storageCategory': 'MSDP',
+                                      'mediaServerDetails': {'moverServers': [{'name': 'media-{}'.format(i)}]}},
+                                     server_id)
+            self.disk_volumes[server_id] = _Collection('diskVolume')
+            for j in range(disk_volumes):
+                self.disk_volumes[server_id].add({'name': 'volume-{}-{}'.format(i, j), 'diskVolumeState': 'UP',
+                                                  'totalCapacityBytes': 2 ** 40, 'freeCapacityBytes': 2 ** 39})
+        self.disk_pools = _Collection('diskPool')
+        servers = list(self.storage_servers.elements)
+        for i in range(disk_pools):
+            server_id = servers[i % len(servers)] if servers else ''
+            self.disk_pools.add({
+                'name': 'pool-{}'.format(i),
+                'sType': 'PureDisk',
+                'storageCategory': 'MSDP',
+                'diskPoolState': 'UP',
+                'maximumIoStreams': {'limitIoStreams': False},
+                'diskVolumes': [{'name': 'volume-{}'.format(i)}],
+                'usableSizeBytes': 2 ** 40,
+                'availableSpaceBytes': 2 ** 40 - (i + 1) * 2 ** 35,
+                'usedCapacityBytes': (i + 1) * 2 ** 35,
+                'rawSizeBytes': 2 ** 41,
+            }, '{}_{}'.format(server_id, i), {
+                'storageServers': {'data': [{'type': 'storageServer', 'id': server_id}] if server_id else []},
+            })
+        self.storage_units = _Collection('storageUnit')
+        pools = list(self.disk_pools.elements.values())
+        for i in range(storage_units):
+            pool = pools[i % len(pools)] if pools else None
+            self.storage_units.add({
+                'name': 'stu-{}'.format(i),
+                'storageType': 'DISK',
+                'storageSubType': 'PureDisk',
+                'storageServerType': 'PureDisk',
+                'maxConcurrentJobs': 10,
+                'maxFragmentSizeMegabytes': 51200,
+                'onDemandOnly': False,
+            }, None, {'diskPool': {'data': {'type': 'diskPool', 'id': pool['id']} if pool else None}})
+
+    def _generate_job(self, index):
+        """ the attributes of the job with the given index, they depend only on the index and the dataset options """
+        job_id = index + 1
+        start = DEFAULT_FIRST_START_TIME + index * self.job_interval
+        duration = (index * 37) % self.job_interval
+        active = index >= self._job_count - self.active_jobs
+        status = 0 if active or index % 23 else (1 if index % 2 else 58)
+        attributes = {
+            'jobId': job_id,
+            'parentJobId': job_id,
+            'jobType': 'BACKUP' if index % 10 else 'DBBACKUP',
+            'jobSubType': 'IMMEDIATE',
+            'policyType': 'STANDARD',
+            'policyName': 'policy-{}'.format(index % max(len(self.policies.elements), 1)),
+            'scheduleType': 'INCR' if index % 7 else 'FULL',
+            'scheduleName': 'daily',
+            'clientName': 'client-{}'.format(index % 500),
+            'controlHost': 'master',
+            'jobOwner': 'root',
+            'jobGroup': 'root',
+            'priority': 0,
+            'state': 'ACTIVE' if active else 'DONE',
+            'status': None if active else status,
+            'destinationStorageUnitName': 'stu-{}'.format(index % max(len(self.storage_units.elements), 1)),
+            'destinationMediaServerName': 'media-{}'.format(index % max(len(self.storage_servers.elements), 1)),
+            'numberOfFiles': (index * 7919) % 100000,
+            'kilobytesTransferred': (index * 104729) % 10000000,
+            'percentComplete': 50 if active else 100,
+            'elapsedTime': 'PT{}S'.format(duration),
+            'startTime': format_time(start),
+            'endTime': None if active else format_time(start + duration),
+            'lastUpdateTime': format_time(start + duration),
+        }
+        overrides = self._job_overrides.get(job_id)
+        if overrides:
+            attributes.update(overrides)
+        return {'type': 'job', 'id': str(job_id), 'attributes': attributes}
+
+    def _job_index(self, job_id):
+        try:
+            index = int(job_id) - 1
+        except ValueError:
+            index = -1
+        if index < 0 or index >= self._job_count or index + 1 in self._deleted_jobs:
+            raise MockError(404, 'The job {} does not exist.'.format(job_id))
+        return index
+
+    def get_job(self, job_id):
+        """ returns the job as answered by the api """
+        with self._lock:
+            return self._generate_job(self._job_index(job_id))
+
+    def update_job(self, job_id, **attributes):
+        """ changes the attributes of a job, its lastUpdateTime is set to now if not given """
+        with self._lock:
+            self._job_index(job_id)
+            attributes.setdefault('lastUpdateTime', format_time(time.time()))
+            self._job_overrides.setdefault(int(job_id), {}).update(attributes)
+            self._jobs_version += 1
+
+    def add_jobs(self, count=1, **attributes):
+        """ adds count jobs after the last one, with the given attributes, returns their jobIds """
+        with self._lock:
+            job_ids = list(range(self._job_count + 1, self._job_count + count + 1))
+            self._job_count += count
+            if attributes:
+                for job_id in job_ids:
+                    self._job_overrides[job_id] = dict(attributes)
+            self._jobs_version += 1
+            return job_ids
+
+    def delete_job(self, job_id):
+        with self._lock:
+            self._job_index(job_id)
+            self._deleted_jobs.add(int(job_id))
+            self._jobs_version += 1
+
+    def _job_list(self, filters, sort):
+        """
+        Returns (count, function returning the job with a position) for the jobs matching filters in the sort order.
+        Without filters, or with only a startTime window, and without changes the jobs sorted by a time sorted field
+        are generated by position, else the list of the matching indexes is computed and kept for the next pages
+        """
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        unchanged = not self._job_overrides and not self._deleted_jobs
+        if unchanged and (not field or field in TIME_SORTED_JOB_FIELDS):
+            window = self._start_time_window(filters)
+            if window is not None:
+                first, last = window
+                count = last - first
+                return count, lambda position: self._generate_job(first + (count - 1 - position if descending
+                                                                            else position))
+        key = (filters, sort, self._jobs_version, self._job_count)
+        indexes = self._job_lists.get(key)
+        if indexes is None:
+            match = compile_filter(filters)
+            indexes = [i for i in range(self._job_count) if i + 1 not in self._deleted_jobs
+                       and match(self._generate_job(i)['attributes'])]
+            if field and (field not in TIME_SORTED_JOB_FIELDS or self._job_overrides):
+                values = {i: self._generate_job(i)['attributes'].get(field) for i in indexes}
+                indexes.sort(key=lambda i: (values[i] is None, values[i]))
+            if descending:
+                indexes.reverse()
+            self._job_lists[key] = indexes
+            while len(self._job_lists) > 8:
+                self._job_lists.popitem(last=False)
+        return len(indexes), lambda position: self._generate_job(indexes[position])
+
+    def _start_time_window(self, filters):
+        """ returns the range of the indexes of the jobs matching filters if it's empty or a startTime window like
+            "startTime ge A and startTime lt B", None for the other filters
+        """
+        if not filters:
+            return 0, self._job_count
+        match = _START_TIME_WINDOW.match(filters)
+        if not match:
+            return None
+        try:
+            bounds = [parse_time(value) for value in match.groups()]
+        except ValueError:
+            return None
+        # the start time of the job with index i is DEFAULT_FIRST_START_TIME + i * job_interval
+        first, last = (min(max(int(math.ceil((bound - DEFAULT_FIRST_START_TIME) / self.job_interval)), 0),
+                           self._job_count) for bound in bounds)
+        return first, max(first, last)
+
+    @staticmethod
+    def _sorted_elements(elements, filters, sort):
+        match = compile_filter(filters)
+        elements = [element for element in elements if match(element['attributes'])]
+        field = (sort or '').lstrip('-')
+        if field:
+            elements.sort(key=lambda element: (element['attributes'].get(field) is None,
+                                               element['attributes'].get(field)),
+                          reverse=sort.startswith('-'))
+        return elements
+
+    # HTTP
+
+    def _page(self, path, query, count, element_at):
+        """ returns the body of the page requested by query, with the pagination of the api, and its elements """
+        limit = int(query.get('page[limit]', DEFAULT_PAGE_LIMIT))
+        limit = max(min(limit, self.max_page_limit), 1)
+        offset = max(int(query.get('page[offset]', 0)), 0)
+        data = [element_at(position) for position in range(offset, min(offset + limit, count))]
+        pages = int(math.ceil(count / float(limit)))
+        last = max(pages - 1, 0) * limit
+        pagination = {'page': offset // limit, 'pages': pages, 'offset': offset, 'limit': limit, 'count': count,
+                      'first': 0, 'last': last}
+
+        def link(page_offset):
+            page_query = dict(query, **{'page[offset]': str(page_offset), 'page[limit]': str(limit)})
+            href = '{}?{}'.format(self.url + path, '&'.join('{}={}'.format(k, quote(str(v), safe=''))
+                                                             for k, v in page_query.items()))
+            return {'href': href}
+
+        links = {'self': link(offset), 'first': link(0), 'last': link(last)}
+        if offset + limit < count:
+            pagination['next'] = offset + limit
+            links['next'] = link(offset + limit)
+        if offset > 0:
+            pagination['prev'] = max(offset - limit, 0)
+            links['prev'] = link(pagination['prev'])
+        return {'data': data, 'meta': {'pagination': pagination}, 'links': links}, len(data)
+
+    def _authorize(self, headers):
+        token = headers.get('Authorization')
+        with self._lock:
+            expires = self._tokens.get(token)
+            if expires is None or expires < time.time():
+                self._tokens.pop(token, None)
+                raise MockError(401, 'Authentication failed: the token is not valid or has expired.')
+
+    def _login(self, body):
+        body = body or {}
+        user, password = body.get('userName'), body.get('password')
+        if self.users is not None and self.users.get(user) != password:
+            raise MockError(401, 'Invalid user name or password.')
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens[token] = time.time() + self.token_validity
+        return 201, {'token': token, 'validity': self.token_validity}
+
+    def _injected_failure(self):
+        with self._lock:
+            if self._failures:
+                return self._failures.popleft()
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status, self.retry_after
+        return None
+
+    def handle(self, method, path, query, headers, body):
+        """ Answers a call, returns (status, body, headers, number of elements of the page).
+            path is relative to the base path of the api, query is a dict with the parameters of the query string
+        """
+        segments = [segment for segment in path.split('/') if segment]
+        with self._lock:
+            self.requests['{} {}'.format(method, nbumetrics.endpoint_template('/'.join(segments)))] += 1
+            if headers.get('X-NetBackup-Audit-Reason') is not None:
+                self.audit_reasons.append((method, '/'.join(segments), headers.get('X-NetBackup-Audit-Reason')))
+        failure = self._injected_failure()
+        if failure is not None:
+            status, retry_after = failure
+            extra_headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+            return status, {'errorCode': status, 'errorMessage': 'Injected failure.'}, extra_headers, 0
+        if segments == ['login'] and method == 'POST':
+            return self._login(body) + ({}, 0)
+        if segments in (['ping'], ['appdetails']):
+            value = int(time.time() * 1000) if segments == ['ping'] else {'apiVersion': '3.0', 'nbuVersion': '8.2'}
+            return 200, value, {}, 0
+        self._authorize(headers)
+        if segments == ['logout'] and method == 'POST':
+            with self._lock:
+                self._tokens.pop(headers.get('Authorization'), None)
+            return 204, None, {}, 0
+        if segments == ['authorization-context']:
+            return 200, {'userName': 'user', 'domainName': '', 'domainType': '', 'authType': 'local'}, {}, 0
+        if segments == ['tokenkey']:
+            return 200, 'tokenkey', {}, 0
+        if segments == ['user-sessions']:
+            if method == 'DELETE':
+                with self._lock:
+                    self._tokens.clear()
+                return 204, None, {}, 0
+            return 200, {'data': []}, {}, 0
+        with self._lock:
+            if segments[:2] == ['admin', 'jobs']:
+                return self._handle_jobs(method, path, segments[2:], query)
+            if segments[:2] == ['config', 'policies']:
+                return self._handle_policies(method, segments[2:], headers, body)
+            if segments[:2] == ['storage', 'storage-servers'] and segments[3:4] == ['disk-volumes']:
+                volumes = self.disk_volumes.get(segments[2])
+                if volumes is None:
+                    raise MockError(404, 'The storage server {} does not exist.'.format(segments[2]))
+                return self._handle_collection(volumes, method, path, segments[4:], query, body)
+            collections_by_path = {'storage-servers': self.storage_servers, 'disk-pools': self.disk_pools,
+                                   'storage-units': self.storage_units}
+            if segments[:1] == ['storage'] and len(segments) > 1 and segments[1] in collections_by_path:
+                return self._handle_collection(collections_by_path[segments[1]], method, path, segments[2:], query,
+                                               body)
+        raise MockError(404, 'The endpoint {} {} does not exist.'.format(method, path))
+
+    def _handle_jobs(self, method, path, ids, query):
+        if ids and method == 'GET':
+            return 200, {'data': self._generate_job(self._job_index(ids[0]))}, {}, 1
+        if ids and method == 'DELETE':
+            self.delete_job(ids[0])
+            return 204, None, {}, 0
+        if method != 'GET':
+            raise MockError(405, 'Method not allowed.')
+        count, element_at = self._job_list(query.get('filter', ''), query.get('sort', ''))
+        page, size = self._page(path, query, count, element_at)
+        return 200, page, {}, size
+
+    def _handle_policies(self, method, ids, headers, body):
+        if not ids:
+            if method == 'GET':
+                return 200, {'data': [{'type': 'policy', 'id': policy['id'],
+                                       'attributes': {'policyType': policy['attributes']['policy']['policyType']}}
+                                      for policy in self.policies.elements.values()]}, {}, len(self.policies.elements)
+            if method == 'POST':
+                self.policies.create(body)
+                return 204, None, {}, 0
+            raise MockError(405, 'Method not allowed.')
+        if method == 'GET':
+            policy = self.policies.get(ids[0])
+            etag = self._etag(policy)
+            if headers.get('If-None-Match') == etag:
+                return 304, None, {'ETag': etag}, 0
+            return 200, {'data': policy}, {'ETag': etag}, 1
+        if method == 'PUT':
+            policy = self.policies.get(ids[0])
+            if headers.get('If-Match') and headers.get('If-Match') != self._etag(policy):
+                raise MockError(412, 'The policy {} has been modified.'.format(ids[0]))
+            self.policies.update(ids[0], body)
+            return 204, None, {}, 0
+        if method == 'DELETE':
+            self.policies.delete(ids[0])
+            return 204, None, {}, 0
+        raise MockError(405, 'Method not allowed.')
+
+    def _handle_collection(self, collection, method, path, ids, query, body):
+        if not ids:
+            if method == 'GET':
+                elements = self._sorted_elements(collection.elements.values(), query.get('filter', ''),
+                                                 query.get('sort', ''))
+                page, size = self._page(path, query, len(elements), elements.__getitem__)
+                return 200, page, {}, size
+            if method == 'POST':
+                return 201, {'data': collection.create(body)}, {}, 0
+            raise MockError(405, 'Method not allowed.')
+        if method == 'GET':
+            return 200, {'data': collection.get(ids[0])}, {}, 1
+        if method in ('PATCH', 'PUT'):
+            return 200, {'data': collection.update(ids[0], body)}, {}, 0
+        if method == 'DELETE':
+            collection.delete(ids[0])
+            return 204, None, {}, 0
+        raise MockError(405, 'Method not allowed.')
+
+    @staticmethod
+    def _etag(element):
+        return '"{}"'.format(hashlib.md5(json.dumps(element, sort_keys=True).encode()).hexdigest())
+
+
+class _MockHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written separately, with Nagle the body would wait for the delayed ack of the client
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        parsed = urlparse(self.path)
+        if not parsed.path.startswith(BASE_PATH):
+            return self._send(404, {'errorCode': 404, 'errorMessage': 'Not found.'})
+        query = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        try:
+            body = json.loads(raw_body) if raw_body else None
+            status, response, headers, elements = mock.handle(method, parsed.path[len(BASE_PATH):], query,
+                                                              self.headers, body)
+        except MockError as e:
+            status, response, headers, elements = e.status, {'errorCode': e.status, 'errorMessage': e.message}, {}, 0
+        except ValueError as e:
+            status, response, headers, elements = 400, {'errorCode': 400, 'errorMessage': str(e)}, {}, 0
+        delay = mock.latency + mock.item_latency * elements
+        if delay > 0:
+            time.sleep(delay)
+        self._send(status, response, headers)
+
+    def _send(self, status, body, headers=None):
+        content = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        if content and self.server.mock.compression and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if content:
+            self.wfile.write(content)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Local mock of the API of Veritas Netbackup')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--jobs', type=int, default=1000)
+    parser.add_argument('--policies', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every call waits before answering')
+    parser.add_argument('--item-latency', type=float, default=0.0, help='seconds added for every element of a page')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability that a call fails')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--max-page-limit', type=int, default=DEFAULT_MAX_PAGE_LIMIT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compression', action='store_true', help='gzip the responses')
+    args = parser.parse_args(arguments)
+    mock = NbuMockServer(jobs=args.jobs, policies=args.policies, host=args.host, port=args.port, latency=args.latency,
+                         item_latency=args.item_latency, error_rate=args.error_rate, error_status=args.error_status,
+                         max_page_limit=args.max_page_limit, seed=args.seed, compression=args.compression)
+    print('serving the mock NetBackup api on {}'.format(mock.url))
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
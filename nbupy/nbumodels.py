@@ -0,0 +1,248 @@
+"""
+Module with the compact records of the elements returned by the API of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import json
+import operator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(content):
+    """ decodes json with orjson when it's installed, else with the json module """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+# the shared values are at most MAX_SHARED_VALUES: when there are more the table is emptied, the values of the records
+# already decoded are kept by the records, so long running pollers don't keep every value ever decoded
+MAX_SHARED_VALUES = 4096
+_shared_values = {}
+
+
+def _share(value):
+    """ returns the shared copy of value """
+    try:
+        return _shared_values[value]
+    except KeyError:
+        if len(_shared_values) >= MAX_SHARED_VALUES:
+            _shared_values.clear()
+        return _shared_values.setdefault(value, value)
+
+
+class Record(tuple):
+    """
+        Base of the records, that keep only some fields of an element of the api in a tuple instead of the nested
+        dicts of the json: they take a fraction of the memory and, holding only strings and numbers, they are not
+        tracked by the garbage collector. The fields are read as attributes.
+        FIELDS maps every field to its path in the element, INTERNED are the fields with few distinct values (states,
+        types, names), whose values are shared by all the records instead of being copied in every one
+    """
+
+    __slots__ = ()
+    TYPE = None
+    FIELDS = {}
+    INTERNED = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._positions = {name: position for position, name in enumerate(cls.FIELDS, 1)}
+        cls._interned_positions = tuple(cls._positions[name] for name in cls.INTERNED)
+        for name, position in cls._positions.items():
+            setattr(cls, name, property(operator.itemgetter(position)))
+
+    def __new__(cls, id=None, **fields):
+        return tuple.__new__(cls, [id] + [fields.get(name) for name in cls.FIELDS])
+
+    @classmethod
+    def _make(cls, values):
+        return tuple.__new__(cls, values)
+
+    def __reduce__(self):
+        return self._make, (tuple(self),)
+
+    @property
+    def id(self):
+        return self[0]
+
+    @classmethod
+    def _values(cls, element):
+        """ returns the list of the id and of the fields of the element """
+        values = [element.get('id')]
+        for path in cls.FIELDS.values():
+            value = element
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value)
+        return values
+
+    @classmethod
+    def from_element(cls, element):
+        values = cls._values(element)
+        for position in cls._interned_positions:
+            values[position] = _share(values[position])
+        return tuple.__new__(cls, values)
+
+    def as_dict(self):
+        return dict(zip(('id',) + tuple(self.FIELDS), self))
+
+    def to_element(self):
+        """ returns the element of the api with only the fields of the record """
+        element = {'type': self.TYPE, 'id': self.id}
+        for (name, path), value in zip(self.FIELDS.items(), self[1:]):
+            if value is None:
+                continue
+            parent = element
+            for key in path[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[path[-1]] = value
+        return element
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        fields = ' '.join('{}={!r}'.format(name, value) for name, value in self.as_dict().items())
+        return '<{} {}>'.format(type(self).__name__, fields)
+
+
+class Job(Record):
+    """ Job of admin/jobs, its fields are the attributes of the job with the same name """
+
+    ATTRIBUTES = ('jobId', 'parentJobId', 'jobType', 'policyType', 'policyName', 'scheduleType', 'scheduleName',
+                  'clientName', 'state', 'destinationStorageUnitName', 'destinationMediaServerName', 'status',
+                  'startTime', 'endTime', 'lastUpdateTime', 'kilobytesTransferred', 'numberOfFiles', 'percentComplete')
+    __slots__ = ()
+    TYPE = 'job'
+    FIELDS = {name: ('attributes', name) for name in ATTRIBUTES}
+    INTERNED = frozenset(ATTRIBUTES[2:11])
+    _head = operator.itemgetter(*ATTRIBUTES[:2])
+    _shared = operator.itemgetter(*ATTRIBUTES[2:11])
+    _tail = operator.itemgetter(*ATTRIBUTES[11:])
+
+    @classmethod
+    def from_element(cls, element):
+        """ the api returns all the attributes of the jobs, so they are read with itemgetters that are much faster than
+            walking the paths, that are used only if some attributes are missing
+        """
+        try:
+            attributes = element['attributes']
+            return tuple.__new__(cls, (element['id'], *cls._head(attributes), *map(_share, cls._shared(attributes)),
+                                       *cls._tail(attributes)))
+        except (KeyError, TypeError):
+            return super().from_element(element)
+
+
+class Policy(Record):
+    """ Policy of config/policies, the clients and schedules are the tuples of their names """
+
+    FIELDS = {
+        'policyName': ('attributes', 'policy', 'policyName'),
+        'policyType': ('attributes', 'policy', 'policyType'),
+        'active': ('attributes', 'policy', 'policyAttributes', 'active'),
+        'storage': ('attributes', 'policy', 'policyAttributes', 'storage'),
+        'clients': ('attributes', 'policy', 'clients'),
+        'schedules': ('attributes', 'policy', 'schedules'),
+    }
+    __slots__ = ()
+    TYPE = 'policy'
+    INTERNED = frozenset(('policyType', 'storage'))
+
+    @classmethod
+    def _values(cls, element):
+        """ the policies of the list of config/policies have only the id and the policyType """
+        values = super()._values(element)
+        positions = cls._positions
+        if values[positions['policyName']] is None:
+            values[positions['policyName']] = values[0]
+        if values[positions['policyType']] is None:
+            values[positions['policyType']] = (element.get('attributes') or {}).get('policyType')
+        values[positions['clients']] = tuple(client.get('hostName') for client in values[positions['clients']] or ())
+        values[positions['schedules']] = tuple(schedule.get('scheduleName')
+                                               for schedule in values[positions['schedules']] or ())
+        return values
+
+    def to_element(self):
+        return {'type': self.TYPE, 'id': self.id, 'attributes': {'policy': {
+            'policyName': self.policyName,
+            'policyType': self.policyType,
+            'policyAttributes': {'active': self.active, 'storage': self.storage},
+            'clients': [{'hostName': client} for client in self.clients or ()],
+            'schedules': [{'scheduleName': schedule} for schedule in self.schedules or ()],
+        }}}
+
+
+class DiskPool(Record):
+    """ Disk pool of storage/disk-pools, storageServers is the tuple of the ids of its storage servers """
+
+    FIELDS = {
+        'name': ('attributes', 'name'),
+        'sType': ('attributes', 'sType'),
+        'storageCategory': ('attributes', 'storageCategory'),
+        'diskPoolState': ('attributes', 'diskPoolState'),
+        'usableSizeBytes': ('attributes', 'usableSizeBytes'),
+        'availableSpaceBytes': ('attributes', 'availableSpaceBytes'),
+        'usedCapacityBytes': ('attributes', 'usedCapacityBytes'),
+        'rawSizeBytes': ('attributes', 'rawSizeBytes'),
+        'storageServers': ('relationships', 'storageServers', 'data'),
+    }
+    __slots__ = ()
+    TYPE = 'diskPool'
+    INTERNED = frozenset(('sType', 'storageCategory', 'diskPoolState'))
+
+    @classmethod
+    def _values(cls, element):
+        values = super()._values(element)
+        position = cls._positions['storageServers']
+        values[position] = tuple(server.get('id') for server in values[position] or ())
+        return values
+
+    def to_element(self):
+        element = super().to_element()
+        element['relationships'] = {'storageServers': {'data': [{'type': 'storageServer', 'id': server_id}
+                                                                 for server_id in self.storageServers or []]}}
+        return element
+
+
+class StorageUnit(Record):
+    """ Storage unit of storage/storage-units, diskPool is the id of its disk pool """
+
+    FIELDS = {
+        'name': ('attributes', 'name'),
+        'storageType': ('attributes', 'storageType'),
+        'storageSubType': ('attributes', 'storageSubType'),
+        'storageServerType': ('attributes', 'storageServerType'),
+        'maxConcurrentJobs': ('attributes', 'maxConcurrentJobs'),
+        'maxFragmentSizeMegabytes': ('attributes', 'maxFragmentSizeMegabytes'),
+        'onDemandOnly': ('attributes', 'onDemandOnly'),
+        'diskPool': ('relationships', 'diskPool', 'data', 'id'),
+    }
+    __slots__ = ()
+    TYPE = 'storageUnit'
+    INTERNED = frozenset(('storageType', 'storageSubType', 'storageServerType', 'diskPool'))
+
+
+RECORD_TYPES = {record_type.TYPE: record_type for record_type in (Job, Policy, DiskPool, StorageUnit)}
+
+
+def from_element(element):
+    """ returns the record of the element, or the element itself if there is no record for its type """
+    record_type = RECORD_TYPES.get(element.get('type')) if isinstance(element, dict) else None
+    return record_type.from_element(element) if record_type else element
+
+
+def to_element(element):
+    """ returns the element of the api of a record, the other values are returned as they are """
+    return element.to_element() if isinstance(element, Record) else element
@@ -0,0 +1,291 @@
+"""
+Module to build the filter and sort parameters of the paginated calls to the API of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import datetime
+
+JOB_FIELDS = frozenset((
+    'jobId', 'parentJobId', 'jobType', 'jobSubType', 'policyType', 'policyName', 'scheduleType', 'scheduleName',
+    'clientName', 'controlHost', 'jobOwner', 'jobGroup', 'priority', 'state', 'status', 'retentionLevel',
+    'destinationStorageUnitName', 'destinationMediaServerName', 'dataMovement', 'streamNumber', 'copyNumber',
+    'numberOfFiles', 'kilobytesTransferred', 'kilobytesToTransfer', 'percentComplete', 'elapsedTime', 'startTime',
+    'endTime', 'lastUpdateTime', 'activeProcessId', 'mainProcessId', 'restartable', 'suspendable', 'resumable',
+    'cancellable', 'transportType', 'jobQueueReason', 'initiatorId', 'dumpHost', 'instanceDatabaseName',
+    'offHostType', 'currentOperation', 'dedupRatio', 'workloadDisplayName', 'assetId', 'assetDisplayableName',
+))
+DISK_POOL_FIELDS = frozenset((
+    'name', 'sType', 'storageCategory', 'diskPoolState', 'usableSizeBytes', 'availableSpaceBytes',
+    'usedCapacityBytes', 'rawSizeBytes', 'highWaterMark', 'lowWaterMark', 'diskVolumeCount',
+))
+STORAGE_UNIT_FIELDS = frozenset((
+    'name', 'storageType', 'storageSubType', 'storageServerType', 'maxConcurrentJobs', 'maxFragmentSizeMegabytes',
+    'onDemandOnly', 'useAnyAvailableMediaServer', 'accelerator', 'instantAccessEnabled', 'isCloudSTU', 'wormCapable',
+))
+STORAGE_SERVER_FIELDS = frozenset(('name', 'sType', 'storageCategory', 'serverType', 'isMediaServer'))
+DISK_VOLUME_FIELDS = frozenset(('name', 'diskVolumeState', 'diskPoolName', 'totalCapacityBytes', 'freeCapacityBytes'))
+# the fields that can be filtered and sorted by the last segment of the url of the endpoint
+ENDPOINT_FIELDS = {
+    'jobs': JOB_FIELDS,
+    'disk-pools': DISK_POOL_FIELDS,
+    'storage-units': STORAGE_UNIT_FIELDS,
+    'storage-servers': STORAGE_SERVER_FIELDS,
+    'disk-volumes': DISK_VOLUME_FIELDS,
+}
+OPERATORS = ('eq', 'ne', 'gt', 'ge', 'lt', 'le')
+
+
+def format_value(value):
+    """ returns the literal of a value in a filter: the strings are quoted, the times are in UTC like
+        2020-01-01T10:00:00.000Z (a naive datetime is taken as UTC)
+    """
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime('%Y-%m-%dT%H:%M:%S.') + '{:03d}Z'.format(value.microsecond // 1000)
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%dT00:00:00.000Z')
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def endpoint_fields(url):
+    """ returns the fields of the endpoint of the url, None if they are not known """
+    return ENDPOINT_FIELDS.get(str(url).split('?')[0].strip('/').rsplit('/', 1)[-1])
+
+
+class Filter(object):
+    """
+        Filter of a paginated call, built from Fields and combined with & (and), | (or) and ~ (not):
+
+        >>> (Field('state') == 'DONE') & (Field('status') != 0)
+        <Filter state eq 'DONE' and status ne 0>
+
+        The python operators and, or and not can't be used, they raise a TypeError
+    """
+
+    def __init__(self, expression, fields, operator=None):
+        self.expression = expression
+        self.fields = frozenset(fields)
+        self.operator = operator
+
+    def __str__(self):
+        return self.expression
+
+    def __repr__(self):
+        return '<Filter {}>'.format(self.expression)
+
+    def __bool__(self):
+        raise TypeError('use &, | and ~ to combine the filters instead of and, or and not')
+
+    def _operand(self, operator):
+        """ the expression as operand of operator, in parentheses if it would be split by it """
+        if self.operator is not None and self.operator != operator:
+            return '({})'.format(self.expression)
+        return self.expression
+
+    def _combine(self, other, operator):
+        if not isinstance(other, Filter):
+            return NotImplemented
+        return Filter('{} {} {}'.format(self._operand(operator), operator, other._operand(operator)),
+                      self.fields | other.fields, operator)
+
+    def __and__(self, other):
+        return self._combine(other, 'and')
+
+    def __or__(self, other):
+        return self._combine(other, 'or')
+
+    def __invert__(self):
+        return Filter('not ({})'.format(self.expression), self.fields)
+
+    @classmethod
+    def all(cls, filters):
+        """ returns the and of the filters """
+        return cls._reduce(filters, '__and__')
+
+    @classmethod
+    def any(cls, filters):
+        """ returns the or of the filters """
+        return cls._reduce(filters, '__or__')
+
+    @staticmethod
+    def _reduce(filters, method):
+        filters = list(filters)
+        if not filters:
+            raise ValueError('no filters to combine')
+        result = filters[0]
+        for f in filters[1:]:
+            result = getattr(result, method)(f)
+        return result
+
+
+class Field(object):
+    """
+        Field of the elements of an endpoint. Comparing it with a value returns a Filter, asc() and desc() return its
+        sort keys. Two Fields are equal if they have the same name, so they can be used in sets, dicts and lists:
+
+        >>> Field('startTime') >= datetime.datetime(2020, 1, 1)
+        <Filter startTime ge 2020-01-01T00:00:00.000Z>
+        >>> Field('policyName').isin(['gold', 'silver'])
+        <Filter policyName eq 'gold' or policyName eq 'silver'>
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return '<Field {}>'.format(self.name)
+
+    def __str__(self):
+        return self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def compare(self, operator, value):
+        if operator not in OPERATORS:
+            raise ValueError('unknown operator {}, use one of {}'.format(operator, ', '.join(OPERATORS)))
+        return Filter('{} {} {}'.format(self.name, operator, format_value(value)), (self.name,))
+
+    def __eq__(self, value):
+        if isinstance(value, Field):
+            return self is value or self.name == value.name
+        return self.compare('eq', value)
+
+    def __ne__(self, value):
+        if isinstance(value, Field):
+            return not self == value
+        return self.compare('ne', value)
+
+    def __gt__(self, value):
+        return self.compare('gt', value)
+
+    def __ge__(self, value):
+        return self.compare('ge', value)
+
+    def __lt__(self, value):
+        return self.compare('lt', value)
+
+    def __le__(self, value):
+        return self.compare('le', value)
+
+    def isin(self, values):
+        """ the api has no in operator, the values are compared one by one """
+        values = list(values)
+        if not values:
+            raise ValueError('no values for the field {}'.format(self.name))
+        return Filter.any(self == value for value in values)
+
+    def between(self, low, high):
+        """ low <= field <= high """
+        return (self >= low) & (self <= high)
+
+    def asc(self):
+        return self.name
+
+    def desc(self):
+        return '-{}'.format(self.name)
+
+
+def _sort_keys(sort):
+    """ the sort keys of a string, a Field or a sequence of them """
+    if not sort:
+        return []
+    if isinstance(sort, (str, Field)):
+        sort = str(sort).split(',')
+    return [str(key).strip() for key in sort if str(key).strip()]
+
+
+def _check_fields(fields, names, endpoint):
+    unknown = sorted(set(names) - fields)
+    if unknown:
+        raise ValueError('unknown fields {} of {}, use some of {}'.format(', '.join(unknown), endpoint,
+                                                                          ', '.join(sorted(fields))))
+
+
+class NbuQuery(object):
+    """
+        Filter and sort of the paginated calls to an endpoint ('jobs', 'disk-pools', 'storage-units',
+        'storage-servers' or 'disk-volumes'), whose fields are validated. where() and order_by() return a new query,
+        so the queries can be composed. The keyword arguments of where() are compared for equality, or with isin()
+        when they are lists, tuples or sets:
+
+        >>> query = NbuQuery('jobs').where(Field('startTime') >= yesterday, state='DONE', status=[1, 58])
+        >>> query = query.order_by('-startTime')
+        >>> nbu.get_jobs(filters=query)
+
+        A query can be passed as the filters of a paginated call, its sort replaces the one of the call
+    """
+
+    def __init__(self, endpoint, filter=None, sort=None):
+        if endpoint not in ENDPOINT_FIELDS:
+            raise ValueError('unknown endpoint {}, use one of {}'.format(endpoint, ', '.join(ENDPOINT_FIELDS)))
+        self.endpoint = endpoint
+        self.fields = ENDPOINT_FIELDS[endpoint]
+        if filter is not None:
+            _check_fields(self.fields, filter.fields, endpoint)
+        self.sort_keys = _sort_keys(sort)
+        _check_fields(self.fields, [key.lstrip('-') for key in self.sort_keys], endpoint)
+        self.filter_expression = filter
+
+    def __repr__(self):
+        return '<NbuQuery {} filter={!r} sort={!r}>'.format(self.endpoint, self.filter, self.sort)
+
+    def where(self, *filters, **values):
+        """ returns a new query with the and of the filter of this one and of the given filters and values """
+        filters = list(filters)
+        for name, value in sorted(values.items()):
+            if isinstance(value, (list, tuple, set, frozenset)):
+                filters.append(Field(name).isin(sorted(value) if isinstance(value, (set, frozenset)) else value))
+            else:
+                filters.append(Field(name) == value)
+        if self.filter_expression is not None:
+            filters.insert(0, self.filter_expression)
+        return NbuQuery(self.endpoint, Filter.all(filters) if filters else None, self.sort_keys)
+
+    def order_by(self, *keys):
+        """ returns a new query sorted by the keys: field names, with a leading - for descending order, or Fields """
+        return NbuQuery(self.endpoint, self.filter_expression, [key for k in keys for key in _sort_keys(k)])
+
+    @property
+    def filter(self):
+        """ the filter parameter of the calls """
+        return str(self.filter_expression) if self.filter_expression is not None else ''
+
+    @property
+    def sort(self):
+        """ the sort parameter of the calls """
+        return ','.join(self.sort_keys)
+
+    def params(self):
+        """ the query parameters of the calls """
+        params = {}
+        if self.filter: params['filter'] = self.filter
+        if self.sort: params['sort'] = self.sort
+        return params
+
+
+def compile_query(filters, sort, url=None):
+    """ Returns the filter and sort parameters of a paginated call to url. filters can be a string, a Filter or an
+        NbuQuery, whose sort, if it has one, replaces sort. sort can be a string, a Field or a list of them.
+        The fields of the Filters and NbuQuerys are validated against the ones of the endpoint of url
+    """
+    if isinstance(filters, NbuQuery):
+        fields = endpoint_fields(url) if url else None
+        if fields is not None and fields is not filters.fields:
+            raise ValueError('the query of {} can not be used for {}'.format(filters.endpoint, url))
+        return filters.filter, filters.sort or ','.join(_sort_keys(sort))
+    if isinstance(filters, Filter):
+        fields = endpoint_fields(url) if url else None
+        if fields is not None:
+            _check_fields(fields, filters.fields, url)
+        filters = str(filters)
+    return filters or '', ','.join(_sort_keys(sort))
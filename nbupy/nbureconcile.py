@@ -0,0 +1,300 @@
+"""
+Module to reconcile the policies and the storage of Veritas Netbackup with a desired configuration
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import concurrent.futures
+import itertools
+import time
+
+from . import nbubulk
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+POLICY = 'policy'
+STORAGE_UNIT = 'storage unit'
+DISK_POOL = 'disk pool'
+# the order of the calls: a storage unit needs its disk pool and a policy its storage unit
+STAGES = (
+    (DISK_POOL, (CREATE, UPDATE)),
+    (STORAGE_UNIT, (CREATE, UPDATE)),
+    (POLICY, (CREATE, UPDATE)),
+    (POLICY, (DELETE,)),
+    (STORAGE_UNIT, (DELETE,)),
+    (DISK_POOL, (DELETE,)),
+)
+_SYMBOLS = {CREATE: '+', UPDATE: '~', DELETE: '-'}
+
+
+def _stage(change):
+    return next(i for i, (kind, actions) in enumerate(STAGES) if change.kind == kind and change.action in actions)
+
+
+def _element(body):
+    """ the element of a request body like the ones of create_policy(), or the element itself """
+    return body['data'] if 'data' in body else body
+
+
+def diff(desired, current, path=()):
+    """
+    Returns the differences (path, current value, desired value) between the values set in desired and the ones of
+    current. The dicts are compared key by key, so the keys that are only in current, like the ones set by the master,
+    are not differences, the other values are compared whole
+    """
+    if isinstance(desired, dict) and isinstance(current, dict):
+        differences = []
+        for key, value in desired.items():
+            differences.extend(diff(value, current.get(key), path + (key,)))
+        return differences
+    return [] if desired == current else [(path, current, desired)]
+
+
+def merge(current, desired):
+    """ returns current updated with the values set in desired, the dicts are merged key by key """
+    if not isinstance(current, dict) or not isinstance(desired, dict):
+        return desired
+    merged = dict(current)
+    for key, value in desired.items():
+        merged[key] = merge(current.get(key), value)
+    return merged
+
+
+class Change(object):
+    """
+        A call of a plan: action is 'create', 'update' or 'delete' and kind 'policy', 'storage unit' or 'disk pool'.
+        body is the body of the call, differences the (path, current value, desired value) of an update
+    """
+
+    __slots__ = ('kind', 'action', 'name', 'body', 'differences', 'element_id', 'etag')
+
+    def __init__(self, kind, action, name, body=None, differences=(), element_id=None, etag=None):
+        self.kind = kind
+        self.action = action
+        self.name = name
+        self.body = body
+        self.differences = list(differences)
+        self.element_id = element_id if element_id is not None else name
+        self.etag = etag
+
+    def __repr__(self):
+        return '<Change {} {} {}>'.format(self.action, self.kind, self.name)
+
+    def __str__(self):
+        lines = ['{} {} {}'.format(_SYMBOLS[self.action], self.kind, self.name)]
+        lines.extend('    {}: {!r} -> {!r}'.format('.'.join(map(str, path)), current, desired)
+                     for path, current, desired in self.differences)
+        return '\n'.join(lines)
+
+
+class NbuPlan(list):
+    """ The changes that reconcile a master, in the order they are applied. str() describes them like a dry run """
+
+    def changes(self, action):
+        return [change for change in self if change.action == action]
+
+    @property
+    def creates(self):
+        return self.changes(CREATE)
+
+    @property
+    def updates(self):
+        return self.changes(UPDATE)
+
+    @property
+    def deletes(self):
+        return self.changes(DELETE)
+
+    def summary(self):
+        return '{} to create, {} to update, {} to delete'.format(len(self.creates), len(self.updates),
+                                                                 len(self.deletes))
+
+    def __str__(self):
+        return '\n'.join([str(change) for change in self] + [self.summary()])
+
+
+class NbuReconciler(object):
+    """
+        Reconciles the policies, the storage units and the disk pools of a master with the desired ones, given as lists
+        of the bodies of create_policy(), create_storage_unit() and create_disk_pool(). plan() reads the current state
+        once and compares it with the desired one: the missing elements are created, the ones with different values
+        are updated, changing only those values, and the unchanged ones are left alone. With prune the elements that
+        are not desired are deleted too. The kinds that are None are not reconciled.
+        apply() makes the calls of the plan, max_workers at a time: the elements of a kind are independent, but the
+        disk pools are created before the storage units that use them, and those before the policies, and the
+        deletes are made in the opposite order. After a failed call the next stages are not applied.
+        The policies are matched by name and updated only if they haven't changed since the plan (If-Match), the
+        storage units by name and the disk pools by the name in their attributes:
+
+        >>> reconciler = NbuReconciler(nbu, policies=policies, storage_units=storage_units, prune=True)
+        >>> plan = reconciler.plan()
+        >>> print(plan)
+        ~ policy gold
+            attributes.policy.policyAttributes.active: True -> False
+        + storage unit stu-new
+        1 to create, 1 to update, 0 to delete
+        >>> results = reconciler.apply(plan)
+        >>> results.failed
+
+        The connector must not be asynchronous. The current state is always read as json, also when the connector is
+        typed, because the records don't have all the values of the elements.
+    """
+
+    def __init__(self, connector, policies=None, storage_units=None, disk_pools=None, prune=False, reason='',
+                 max_workers=nbubulk.DEFAULT_BULK_WORKERS):
+        self.connector = connector
+        self.policies = self._by_name(policies, self._policy_name)
+        self.storage_units = self._by_name(storage_units, self._storage_unit_name)
+        self.disk_pools = self._by_name(disk_pools, self._disk_pool_name)
+        self.prune = prune
+        self.reason = reason
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _policy_name(element):
+        return element.get('id') or element['attributes']['policy']['policyName']
+
+    @staticmethod
+    def _storage_unit_name(element):
+        return element.get('id') or element['attributes']['name']
+
+    @staticmethod
+    def _disk_pool_name(element):
+        name = element.get('attributes', {}).get('name')
+        if name is None:
+            raise ValueError('a disk pool needs attributes.name')
+        return name
+
+    @staticmethod
+    def _by_name(bodies, name):
+        if bodies is None:
+            return None
+        by_name = {}
+        for body in bodies:
+            element = _element(body)
+            key = name(element)
+            if key in by_name:
+                raise ValueError('the {} is desired twice'.format(key))
+            by_name[key] = {'data': element}
+        return by_name
+
+    # PLAN
+
+    def _current(self, url):
+        """ all the elements of a paginated collection as json, also when the connector is typed """
+        connector = self.connector
+        query, page_limit = connector._first_page_query(url=url)
+        elements = []
+        while True:
+            start = time.monotonic()
+            resp = connector._paginated_get_call(url, query=query)
+            elements.extend(resp.get('data', []))
+            pagination = connector._next_pagination(resp)
+            if not pagination:
+                return elements
+            query = connector._next_page_query(query, pagination, page_limit, time.monotonic() - start)
+
+    def plan(self):
+        """ reads the current state and returns the NbuPlan of the calls that reconcile it """
+        changes = []
+        if self.disk_pools is not None:
+            current = {self._disk_pool_name(element): element for element in self._current('storage/disk-pools')}
+            changes.extend(self._plan_storage(DISK_POOL, 'diskPool', self.disk_pools, current))
+        if self.storage_units is not None:
+            current = {self._storage_unit_name(element): element
+                       for element in self._current('storage/storage-units')}
+            changes.extend(self._plan_storage(STORAGE_UNIT, 'storageUnit', self.storage_units, current))
+        if self.policies is not None:
+            changes.extend(self._plan_policies())
+        return NbuPlan(sorted(changes, key=_stage))
+
+    def _plan_storage(self, kind, type_name, desired, current):
+        """ the storage elements are changed with PATCH, so an update has only the attributes that are different """
+        changes = []
+        for name, body in desired.items():
+            element = body['data']
+            if name not in current:
+                changes.append(Change(kind, CREATE, name, body))
+                continue
+            existing = current[name]
+            wanted = {section: element[section] for section in ('attributes', 'relationships') if section in element}
+            differences = diff(wanted, existing)
+            if not differences:
+                continue
+            sections = {path[0] for path, _, _ in differences}
+            patch = {'type': type_name, 'id': existing['id']}
+            if 'attributes' in sections:
+                keys = {path[1] for path, _, _ in differences if path[0] == 'attributes'}
+                patch['attributes'] = {key: merge(existing['attributes'].get(key), element['attributes'][key])
+                                       for key in sorted(keys)}
+            if 'relationships' in sections:
+                patch['relationships'] = element['relationships']
+            changes.append(Change(kind, UPDATE, name, {'data': patch}, differences, existing['id']))
+        if self.prune:
+            changes.extend(Change(kind, DELETE, name, element_id=existing['id'])
+                           for name, existing in current.items() if name not in desired)
+        return changes
+
+    def _plan_policies(self):
+        """ The list of the policies has only their names, so only the desired ones that exist are read, in parallel.
+            A policy is replaced with PUT, so an update has all the values of the current policy, updated with the
+            desired ones
+        """
+        names = [policy['id'] for policy in self.connector._get_api_call('config/policies/')['data']]
+        known = set(names)
+        existing = [name for name in self.policies if name in known]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            current = dict(zip(existing, executor.map(self.connector.get_policy, existing)))
+        changes = []
+        for name, body in self.policies.items():
+            if name not in current:
+                changes.append(Change(POLICY, CREATE, name, body))
+                continue
+            resp, etag = current[name]
+            attributes = resp['data'].get('attributes', {})
+            differences = diff(body['data'].get('attributes', {}), attributes, ('attributes',))
+            if differences:
+                policy = {'type': 'policy', 'id': name, 'attributes': merge(attributes, body['data']['attributes'])}
+                changes.append(Change(POLICY, UPDATE, name, {'data': policy}, differences, etag=etag))
+        if self.prune:
+            changes.extend(Change(POLICY, DELETE, name) for name in names if name not in self.policies)
+        return changes
+
+    # APPLY
+
+    def apply(self, plan=None):
+        """ makes the calls of the plan, by default a new one. Returns a BulkResults with the result of every change,
+            the changes not applied after a failure have a failed result
+        """
+        plan = self.plan() if plan is None else plan
+        results = nbubulk.BulkResults()
+        for _, stage in itertools.groupby(sorted(plan, key=_stage), key=_stage):
+            stage = list(stage)
+            if results.failed:
+                results.extend(nbubulk.BulkResult(change, False, error='not applied after a failed change')
+                               for change in stage)
+            else:
+                results.extend(self.connector._run_bulk(self._apply_change, stage, self.max_workers))
+        return results
+
+    def _apply_change(self, change):
+        connector = self.connector
+        if change.kind == POLICY:
+            if change.action == CREATE:
+                return connector.create_policy(change.body, self.reason)
+            if change.action == UPDATE:
+                return connector.update_policy(change.name, change.body, self.reason, etag=change.etag)
+            return connector.delete_policy(change.name, self.reason)
+        if change.kind == STORAGE_UNIT:
+            if change.action == CREATE:
+                return connector.create_storage_unit(change.body)
+            if change.action == UPDATE:
+                return connector.update_storage_unit(change.element_id, change.body)
+            return connector.delete_storage_unit(change.element_id)
+        if change.action == CREATE:
+            return connector.create_disk_pool(change.body)
+        if change.action == UPDATE:
+            return connector.update_disk_pool(change.element_id, change.body)
+        return connector.delete_disk_pool(change.element_id)
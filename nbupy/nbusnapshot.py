@@ -0,0 +1,267 @@
+"""
+Module to read a consistent snapshot of the jobs of Veritas Netbackup, split in time windows requested in parallel
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import itertools
+import math
+
+from . import nbuauth, nbumodels, nbuquery
+
+JOBS_URL = 'admin/jobs/'
+DEFAULT_WINDOW = datetime.timedelta(hours=1)
+DEFAULT_MIN_WINDOW = datetime.timedelta(seconds=1)
+DEFAULT_MAX_WINDOW = datetime.timedelta(days=31)
+DEFAULT_TARGET_JOBS = 5000
+DEFAULT_WORKERS = 4
+
+
+def _to_datetime(value):
+    """ returns the aware UTC datetime of a datetime (naive ones are UTC) or of a time of the api """
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def _job_id(job):
+    return job.id if isinstance(job, nbumodels.Record) else job.get('id')
+
+
+class Window(object):
+    """ Time window of a snapshot: the jobs with start <= startTime < end, count is their number """
+
+    __slots__ = ('start', 'end', 'count')
+
+    def __init__(self, start, end, count=None):
+        self.start = start
+        self.end = end
+        self.count = count
+
+    def __repr__(self):
+        return '<Window {} {} count={}>'.format(nbuquery.format_value(self.start), nbuquery.format_value(self.end),
+                                               self.count)
+
+
+class NbuJobSnapshot(object):
+    """
+        Reads the jobs started between start (included) and end (excluded, now by default) with a call for every
+        time window, filtered by startTime on the master. As the startTime of a job never changes, the jobs that start
+        or change during the reading don't move the jobs from a window to another, that is instead what happens to the
+        pages of a single call with offsets. The windows are requested in parallel by max_workers threads (the
+        connector is shared by them), every one with its own pages, and the jobs are yielded by startTime, without
+        the jobs repeated by the pagination of a window.
+
+        The first windows are as long as window, then their size is adapted to the density of the jobs already read
+        so that every window has about target_jobs jobs, between min_window and max_window. A window with more than
+        twice target_jobs jobs is split before reading its pages. filters are added to the filter of every window,
+        windows lists the windows read and duplicates counts the repeated jobs that were skipped:
+
+        >>> snapshot = NbuJobSnapshot(nbu, start=datetime.datetime(2024, 1, 1), max_workers=8)
+        >>> for job in snapshot:
+        ...     print(job['attributes']['jobId'])
+
+        With an NbuAsyncApiConnector the snapshot is read with "async for", the windows are then requested by at most
+        max_workers concurrent tasks:
+
+        >>> async for job in nbu.iter_jobs_snapshot(start=datetime.datetime(2024, 1, 1), max_workers=8):
+        ...     print(job['attributes']['jobId'])
+    """
+
+    def __init__(self, connector, start, end=None, filters='', window=DEFAULT_WINDOW, target_jobs=DEFAULT_TARGET_JOBS,
+                 min_window=DEFAULT_MIN_WINDOW, max_window=DEFAULT_MAX_WINDOW, max_workers=DEFAULT_WORKERS,
+                 page_limit=nbuauth.MAX_PAGE_LIMIT):
+        self.connector = connector
+        self.start = _to_datetime(start)
+        self.end = _to_datetime(end) if end is not None else datetime.datetime.now(datetime.timezone.utc)
+        self.filters = nbuquery.compile_query(filters, '', JOBS_URL)[0]
+        self.window = window
+        self.target_jobs = target_jobs
+        self.min_window = min_window
+        self.max_window = max_window
+        self.max_workers = max_workers
+        self.page_limit = page_limit
+        self.windows = []
+        self.splits = 0
+        self.duplicates = 0
+        self._jobs = 0
+        self._seconds = 0.0
+
+    def __repr__(self):
+        return '<NbuJobSnapshot {} {} windows={}>'.format(nbuquery.format_value(self.start),
+                                                         nbuquery.format_value(self.end), len(self.windows))
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.iter_pages())
+
+    async def __aiter__(self):
+        async for page in self.aiter_pages():
+            for job in page:
+                yield job
+
+    def get_jobs(self):
+        """ returns all the jobs, like get_jobs() of the connector but sorted by startTime """
+        return {'data': list(self)}
+
+    @property
+    def density(self):
+        """ the jobs per second of the windows read so far, None before the first one """
+        return self._jobs / self._seconds if self._seconds else None
+
+    def _window_size(self):
+        density = self.density
+        if not density:
+            return self.window
+        size = datetime.timedelta(seconds=self.target_jobs / density)
+        return max(min(size, self.max_window), self.min_window)
+
+    def _next_windows(self):
+        """ yields the windows from start to end, every one sized with the density known when it's requested """
+        start = self.start
+        while start < self.end:
+            end = min(start + self._window_size(), self.end)
+            yield start, end
+            start = end
+
+    def window_filter(self, start, end):
+        """ the filter of the calls of a window """
+        window = str((nbuquery.Field('startTime') >= start) & (nbuquery.Field('startTime') < end))
+        return '({}) and {}'.format(self.filters, window) if self.filters else window
+
+    def _first_query(self, start, end):
+        return self.connector._first_page_query(self.window_filter(start, end), 'startTime', self.page_limit)[0]
+
+    def _split(self, resp, start, end):
+        """ returns the number of jobs of the window of the first page resp and, if they are too many, its
+            sub-windows, else None
+        """
+        pagination = resp.get('meta', {}).get('pagination', {})
+        count = pagination.get('count', len(resp.get('data', [])))
+        if count > 2 * self.target_jobs and end - start >= 2 * self.min_window:
+            parts = min(int(math.ceil(count / self.target_jobs)), int((end - start) / self.min_window))
+            bounds = [start + (end - start) * i / parts for i in range(parts)] + [end]
+            return count, list(zip(bounds, bounds[1:]))
+        return count, None
+
+    def _fetch(self, start, end):
+        """ Requests the pages of a window. If the first page reports too many jobs returns (count, sub-windows,
+            None) without requesting the other pages, else (count, None, pages)
+        """
+        connector = self.connector
+        query = self._first_query(start, end)
+        resp = connector._paginated_get_call(JOBS_URL, query=query)
+        count, parts = self._split(resp, start, end)
+        if parts:
+            return count, parts, None
+        pages = [connector._page_elements(resp)]
+        pagination = connector._next_pagination(resp)
+        if pagination:
+            for page_query in connector._remaining_page_queries(query, pagination):
+                pages.append(connector._page_elements(connector._paginated_get_call(JOBS_URL, query=page_query)))
+        return count, None, pages
+
+    async def _fetch_async(self, start, end, semaphore):
+        """ Asynchronous version of _fetch(), a window is read only while holding the semaphore """
+        connector = self.connector
+        async with semaphore:
+            query = self._first_query(start, end)
+            resp = await connector._paginated_get_call(JOBS_URL, query=query)
+            count, parts = self._split(resp, start, end)
+            if parts:
+                return count, parts, None
+            pages = [connector._page_elements(resp)]
+            pagination = connector._next_pagination(resp)
+            if pagination:
+                for page_query in connector._remaining_page_queries(query, pagination):
+                    pages.append(connector._page_elements(
+                        await connector._paginated_get_call(JOBS_URL, query=page_query)))
+        return count, None, pages
+
+    def _read(self, start, end, count, pages, previous_ids):
+        """ Records a window that has been read, returns its pages without the repeated jobs and the ids of its jobs.
+            A job can be repeated only by the pagination of its window, or of the previous one at the boundary
+        """
+        self._jobs += count
+        self._seconds += (end - start).total_seconds()
+        self.windows.append(Window(start, end, count))
+        ids, unique_pages = set(), []
+        for page in pages:
+            unique = []
+            for job in page:
+                job_id = _job_id(job)
+                if job_id in ids or job_id in previous_ids:
+                    self.duplicates += 1
+                    continue
+                ids.add(job_id)
+                unique.append(job)
+            unique_pages.append(unique)
+        return unique_pages, ids
+
+    def iter_pages(self):
+        """ yields the lists of jobs of the pages of every window, the windows in order of time """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        windows = self._next_windows()
+        scheduled = collections.deque()
+
+        def schedule():
+            for start, end in itertools.islice(windows, max(2 * self.max_workers - len(scheduled), 0)):
+                scheduled.append(((start, end), executor.submit(self._fetch, start, end)))
+
+        ids = set()
+        try:
+            schedule()
+            while scheduled:
+                (start, end), future = scheduled.popleft()
+                count, parts, pages = future.result()
+                if parts:
+                    # the jobs of a split window are counted in the density when its parts are read
+                    self.splits += 1
+                    for part in reversed(parts):
+                        scheduled.appendleft((part, executor.submit(self._fetch, *part)))
+                    continue
+                pages, ids = self._read(start, end, count, pages, ids)
+                for page in pages:
+                    yield page
+                schedule()
+        finally:
+            for _, future in scheduled:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    async def aiter_pages(self):
+        """ Asynchronous version of iter_pages(), for an asynchronous connector """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        windows = self._next_windows()
+        scheduled = collections.deque()
+
+        def schedule():
+            for start, end in itertools.islice(windows, max(2 * self.max_workers - len(scheduled), 0)):
+                scheduled.append(((start, end), asyncio.ensure_future(self._fetch_async(start, end, semaphore))))
+
+        ids = set()
+        try:
+            schedule()
+            while scheduled:
+                (start, end), task = scheduled.popleft()
+                count, parts, pages = await task
+                if parts:
+                    self.splits += 1
+                    for part in reversed(parts):
+                        scheduled.appendleft((part, asyncio.ensure_future(self._fetch_async(*part, semaphore))))
+                    continue
+                pages, ids = self._read(start, end, count, pages, ids)
+                for page in pages:
+                    yield page
+                schedule()
+        finally:
+            tasks = [task for _, task in scheduled]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -5,46 +5,86 @@ by Sorint https://sorint.it
 
 License GPLv3
 """
+import concurrent.futures
 
-from . import nbuauth
+from . import nbuauth, nbubulk, nbuinventory
 
 
 class NbuStorageApi(nbuauth.NbuAuthorizationApi):
     """ Here are implemented the methods for the storage API of netbackup """
 
-    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='', timeout=0):
-        super().__init__(url, user, password, verify, domain_name, domain_type, version)
+    def __init__(self, url, user, password, verify, domain_name='', domain_type='', version='',
+                 timeout=nbuauth.DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(url, user, password, verify, domain_name, domain_type, version, timeout, **kwargs)
+        self._storage_inventory = None
+
+    def _invalidate_cache(self, uri):
+        """ the changes of the storage invalidate the cached inventory too """
+        if uri.lstrip('/').startswith('storage/'):
+            self._storage_inventory = None
+        super()._invalidate_cache(uri)
 
     # NETBACKUP STORAGE API
 
     def create_storage_server(self, storageServer):
         return self._post_api_call(
             'storage/storage-servers',
-            {'Content-Type': 'application/vnd.netbackup+json;version={}'.format(self._version)},
+            {'Content-Type': self._media_type},
             parameters=storageServer
         )
 
     def delete_storage_server(self, storageServer):
         return self._delete_api_call('storage/storage-servers/{}'.format(storageServer))
 
-    def get_disk_volumes(self, storageServerId):
+    def get_storage_servers(self, max_workers=None, page_limit=None, filters='', sort=''):
+        return self._paginated_get_request(url='storage/storage-servers', filters=filters, sort=sort,
+                                           max_workers=max_workers, page_limit=page_limit)
+
+    def get_disk_volumes(self, storageServerId, max_workers=None, page_limit=None):
         """
         Here storageServerId is mandatory, so the call will always be the paginated one
         """
-        return self._paginated_get_request(url='storage/storage-servers/{}/disk-volumes/'.format(storageServerId))
+        return self._paginated_get_request(url='storage/storage-servers/{}/disk-volumes/'.format(storageServerId),
+                                           max_workers=max_workers, page_limit=page_limit)
+
+    def iter_disk_volumes(self, storageServerId, max_workers=None, page_limit=None, cursor=None, checkpoint=None):
+        """
+        Returns an iterator over all the disk volumes of the storage server, the pages are requested while iterating
+        """
+        return self._paginated_iter(url='storage/storage-servers/{}/disk-volumes/'.format(storageServerId),
+                                    max_workers=max_workers, page_limit=page_limit, cursor=cursor,
+                                    checkpoint=checkpoint)
 
     def create_disk_pool(self, diskPool):
         return self._post_api_call(
             'storage/disk-pools',
-            {'Content-Type': 'application/vnd.netbackup+json;version={}'.format(self._version)},
+            {'Content-Type': self._media_type},
             parameters=diskPool
         )
 
-    def get_disk_pools(self, diskPoolId=''):
+    def get_disk_pools(self, diskPoolId='', max_workers=None, page_limit=None, filters='', sort=''):
         """
         If diskPoolId is present, returns only that disk pool, else returns all
         """
-        return self._paginated_get_request(url='storage/disk-pools', element_id=diskPoolId)
+        return self._paginated_get_request(url='storage/disk-pools', element_id=diskPoolId, filters=filters, sort=sort,
+                                           max_workers=max_workers, page_limit=page_limit)
+
+    def iter_disk_pools(self, max_workers=None, page_limit=None, filters='', sort='', cursor=None, checkpoint=None):
+        """
+        Returns an iterator over all the disk pools, the pages are requested while iterating
+        """
+        return self._paginated_iter(url='storage/disk-pools', filters=filters, sort=sort, max_workers=max_workers,
+                                    page_limit=page_limit, cursor=cursor, checkpoint=checkpoint)
+
+    def update_disk_pool(self, diskPoolId, diskPool):
+        """
+        Changes only the attributes in diskPool
+        """
+        return self._patch_api_call(
+            'storage/disk-pools/{}'.format(diskPoolId),
+            {'Content-Type': self._media_type},
+            parameters=diskPool
+        )
 
     def delete_disk_pool(self, diskPoolId):
         return self._delete_api_call('storage/disk-pools/{}'.format(diskPoolId))
@@ -52,16 +92,71 @@ class NbuStorageApi(nbuauth.NbuAuthorizationApi):
     def create_storage_unit(self, storageUnit):
         return self._post_api_call(
             'storage/storage-units',
-            {'Content-Type': 'application/vnd.netbackup+json;version={}'.format(self._version)},
+            {'Content-Type': self._media_type},
             parameters=storageUnit
         )
 
-    def get_storage_units(self, storageUnitName=''):
+    def get_storage_units(self, storageUnitName='', max_workers=None, page_limit=None, filters='', sort=''):
         """
         If storageUnitName is present, returns only that storage unit, else returns all
         """
-        return self._paginated_get_request(url='storage/storage-units', element_id=storageUnitName)
+        return self._paginated_get_request(url='storage/storage-units', element_id=storageUnitName, filters=filters,
+                                           sort=sort, max_workers=max_workers, page_limit=page_limit)
+
+    def iter_storage_units(self, max_workers=None, page_limit=None, filters='', sort='', cursor=None,
+                           checkpoint=None):
+        """
+        Returns an iterator over all the storage units, the pages are requested while iterating
+        """
+        return self._paginated_iter(url='storage/storage-units', filters=filters, sort=sort, max_workers=max_workers,
+                                    page_limit=page_limit, cursor=cursor, checkpoint=checkpoint)
+
+    def update_storage_unit(self, storageUnitName, storageUnit):
+        """
+        Changes only the attributes in storageUnit
+        """
+        return self._patch_api_call(
+            'storage/storage-units/{}'.format(storageUnitName),
+            {'Content-Type': self._media_type},
+            parameters=storageUnit
+        )
 
     def delete_storage_unit(self, storageUnitName):
         return self._delete_api_call('storage/storage-units/{}'.format(storageUnitName))
 
+    def get_storage_inventory(self, ttl=None, max_workers=nbuinventory.DEFAULT_WORKERS):
+        """
+        Returns a StorageInventory with the storage servers, the disk pools, the storage units and the disk volumes of
+        every storage server, joined by id, and their capacity. The calls are made in parallel by max_workers threads,
+        the ones of the disk volumes as soon as the storage servers are known.
+        With ttl the inventory is kept and returned again while it's younger than ttl seconds, the changes of the
+        storage made by the connector discard it
+        """
+        inventory = self._storage_inventory
+        if ttl is not None and inventory is not None and inventory.age < ttl:
+            return inventory
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            disk_pools = executor.submit(self.get_disk_pools)
+            storage_units = executor.submit(self.get_storage_units)
+            servers = self.get_storage_servers()['data']
+            disk_volumes = [(server['id'], executor.submit(self.get_disk_volumes, server['id'])) for server in servers]
+            inventory = nbuinventory.StorageInventory(
+                servers, disk_pools.result()['data'], storage_units.result()['data'],
+                {server_id: volumes.result()['data'] for server_id, volumes in disk_volumes})
+        self._storage_inventory = inventory
+        return inventory
+
+    # BULK OPERATIONS: every method makes at most max_workers concurrent calls (and rate_limit calls per second) and
+    # returns a BulkResults with the result of every item
+
+    def create_disk_pools(self, diskPools, max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        return self._run_bulk(self.create_disk_pool, diskPools, max_workers, rate_limit)
+
+    def delete_disk_pools(self, diskPoolIds, max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        return self._run_bulk(self.delete_disk_pool, diskPoolIds, max_workers, rate_limit)
+
+    def create_storage_units(self, storageUnits, max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        return self._run_bulk(self.create_storage_unit, storageUnits, max_workers, rate_limit)
+
+    def delete_storage_units(self, storageUnitNames, max_workers=nbubulk.DEFAULT_BULK_WORKERS, rate_limit=None):
+        return self._run_bulk(self.delete_storage_unit, storageUnitNames, max_workers, rate_limit)
@@ -0,0 +1,142 @@
+"""
+Module to parse the responses of the API of Veritas Netbackup while they are received
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import codecs
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+# yielded by the parser when it needs the next chunk of the body
+_MORE = object()
+
+
+class _Buffer(object):
+    """ Text received so far and not parsed yet. The parsing methods are generators that yield _MORE when the text
+        received is not enough, the chunks are passed to feed() by who reads the body, see iter_elements()
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.position = 0
+        self.eof = False
+
+    def feed(self, chunk):
+        """ appends a chunk of bytes (or of text), None at the end of the body, dropping the text already parsed """
+        self.text = self.text[self.position:]
+        self.position = 0
+        if chunk is None:
+            self.eof = True
+            self.text += self._decoder.decode(b'', final=True)
+        else:
+            self.text += self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    def peek(self):
+        """ skips the whitespace and returns the next character, None at the end of the body """
+        while True:
+            while self.position < len(self.text) and self.text[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if self.eof:
+                return None
+            yield _MORE
+
+    def expect(self, characters):
+        character = yield from self.peek()
+        if character is None or character not in characters:
+            raise ValueError('expected {} at position {} of the json, found {!r}'.format(
+                ' or '.join(repr(c) for c in characters), self.position, character))
+        self.position += 1
+        return character
+
+    def value(self):
+        """ Parses the next json value. A value that ends with the text received is parsed again with the next chunk,
+            because a number could continue in it
+        """
+        yield from self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.position)
+                if end < len(self.text) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            yield _MORE
+
+
+def _parse(buffer, key, envelope):
+    """ yields the elements of the array key, or _MORE when the buffer needs the next chunk """
+    yield from buffer.expect('{')
+    if (yield from buffer.peek()) == '}':
+        return
+    while True:
+        name = yield from buffer.value()
+        yield from buffer.expect(':')
+        if name == key and (yield from buffer.peek()) == '[':
+            buffer.position += 1
+            if (yield from buffer.peek()) == ']':
+                buffer.position += 1
+            else:
+                while True:
+                    yield (yield from buffer.value())
+                    if (yield from buffer.expect(',]')) == ']':
+                        break
+        elif name == key:
+            yield (yield from buffer.value())
+        elif envelope is not None:
+            envelope[name] = yield from buffer.value()
+        else:
+            yield from buffer.value()
+        if (yield from buffer.expect(',}')) == '}':
+            return
+
+
+def iter_elements(chunks, key='data', envelope=None):
+    """
+        Yields the elements of the array key of the json object received as chunks of bytes (or of text), while they are
+        parsed: only the element being parsed and a chunk are kept in memory, whatever the size of the response.
+        The other members of the object (meta, links...) are stored in the dict envelope, if given. If key is an object
+        instead of an array it is yielded as the only element.
+
+        >>> envelope = {}
+        >>> for job in iter_elements(response.iter_content(65536), envelope=envelope):
+        ...     print(job['id'])
+        >>> envelope['meta']['pagination']
+    """
+    chunks = iter(chunks)
+    buffer = _Buffer()
+    for element in _parse(buffer, key, envelope):
+        if element is _MORE:
+            buffer.feed(next(chunks, None))
+        else:
+            yield element
+
+
+async def aiter_elements(chunks, key='data', envelope=None):
+    """
+        Asynchronous version of iter_elements(), chunks is an asynchronous iterator, like the iter_chunked() of the
+        content of an aiohttp response:
+
+        >>> async for job in aiter_elements(response.content.iter_chunked(65536)):
+        ...     print(job['id'])
+    """
+    chunks = chunks.__aiter__()
+    buffer = _Buffer()
+    for element in _parse(buffer, key, envelope):
+        if element is _MORE:
+            try:
+                buffer.feed(await chunks.__anext__())
+            except StopAsyncIteration:
+                buffer.feed(None)
+        else:
+            yield element
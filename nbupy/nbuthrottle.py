@@ -0,0 +1,156 @@
+"""
+Module to limit the rate and the concurrency of the calls to the API of Veritas Netbackup
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import asyncio
+import threading
+import time
+
+READ = 'read'
+WRITE = 'write'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+DEFAULT_BACKOFF_STATUSES = (429, 503)
+DEFAULT_DECREASE = 0.5
+DEFAULT_INCREASE = 0.05
+DEFAULT_MIN_FACTOR = 0.05
+DEFAULT_COOLDOWN = 1.0
+POLL_INTERVAL = 0.01
+
+
+def budget_of(method):
+    """ returns READ for the methods that don't change anything on the server, else WRITE """
+    return READ if method.upper() in READ_METHODS else WRITE
+
+
+class TokenBucket(object):
+    """ Allows rate calls per second with bursts of up to burst calls, it can be shared between threads """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(self.rate, 1.0)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, factor=1.0):
+        """ takes a token and returns the seconds to wait before making the call, the rate is reduced by factor """
+        with self._lock:
+            now = time.monotonic()
+            rate = self.rate * factor
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / rate
+
+
+class _Budget(object):
+
+    def __init__(self, rate, burst, max_in_flight):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+
+class NbuThrottle(object):
+    """
+        Limits the calls of one or more connectors, also used by many threads, to read_rate calls per second for the
+        reads (GET) and write_rate for the other methods, with bursts of up to burst calls, and to at most
+        max_reads_in_flight and max_writes_in_flight concurrent calls. A limit that is None is not applied.
+
+        The limits are reduced when the server is overloaded: a response with one of the backoff_statuses (429, 503)
+        or, if latency_target is given, a call that takes more than latency_target seconds multiplies them by decrease
+        (at most once every cooldown seconds, down to min_factor of the given ones), while every fast successful call
+        raises them by increase, back to the given ones. A Retry-After header of a response with a backoff status stops
+        all the calls for the seconds it requests:
+
+        >>> throttle = NbuThrottle(read_rate=20, write_rate=2, max_reads_in_flight=8, latency_target=5)
+        >>> nbu1 = NbuApiConnector(url1, user, password, verify, throttle=throttle)
+        >>> nbu2 = NbuApiConnector(url2, user, password, verify, throttle=throttle)
+    """
+
+    def __init__(self, read_rate=None, write_rate=None, max_reads_in_flight=None, max_writes_in_flight=None,
+                 burst=None, latency_target=None, backoff_statuses=DEFAULT_BACKOFF_STATUSES, decrease=DEFAULT_DECREASE,
+                 increase=DEFAULT_INCREASE, min_factor=DEFAULT_MIN_FACTOR, cooldown=DEFAULT_COOLDOWN):
+        self._budgets = {
+            READ: _Budget(read_rate, burst, max_reads_in_flight),
+            WRITE: _Budget(write_rate, burst, max_writes_in_flight),
+        }
+        self.latency_target = latency_target
+        self.backoff_statuses = backoff_statuses
+        self.decrease = decrease
+        self.increase = increase
+        self.min_factor = min_factor
+        self.cooldown = cooldown
+        self.factor = 1.0
+        self._paused_until = 0.0
+        self._next_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def __repr__(self):
+        return '<NbuThrottle factor={:.2f} in_flight={}>'.format(self.factor, self.in_flight)
+
+    @property
+    def in_flight(self):
+        """ the number of the calls in flight by budget """
+        return {name: budget.in_flight for name, budget in self._budgets.items()}
+
+    def _limit(self, budget):
+        return max(int(budget.max_in_flight * self.factor), 1)
+
+    def _try_enter(self, budget):
+        """ takes a slot of the budget if there is one, called with the condition held """
+        if budget.max_in_flight is not None and budget.in_flight >= self._limit(budget):
+            return False
+        budget.in_flight += 1
+        return True
+
+    def _delay(self, budget):
+        """ the seconds to wait, after taking the slot, before the call can be made """
+        delay = self._paused_until - time.monotonic()
+        if budget.bucket is not None:
+            delay = max(delay, budget.bucket.reserve(self.factor))
+        return delay
+
+    def acquire(self, method):
+        """ waits until a call with the http method can be made, release() must be called when it ends """
+        budget = self._budgets[budget_of(method)]
+        with self._condition:
+            while not self._try_enter(budget):
+                self._condition.wait(POLL_INTERVAL)
+        delay = self._delay(budget)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, method):
+        """ Asynchronous version of acquire(), it doesn't block the event loop """
+        budget = self._budgets[budget_of(method)]
+        while True:
+            with self._condition:
+                if self._try_enter(budget):
+                    break
+            await asyncio.sleep(POLL_INTERVAL)
+        delay = self._delay(budget)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def release(self, method, status=None, elapsed=None, retry_after=None):
+        """ frees the slot of a call and adapts the limits to its status (None if it failed without a response), to
+            the seconds it took and to the seconds requested by the Retry-After header
+        """
+        budget = self._budgets[budget_of(method)]
+        with self._condition:
+            budget.in_flight -= 1
+            now = time.monotonic()
+            overloaded = status in self.backoff_statuses
+            if overloaded and retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if overloaded or (self.latency_target is not None and elapsed is not None and elapsed > self.latency_target):
+                if now >= self._next_decrease:
+                    self.factor = max(self.factor * self.decrease, self.min_factor)
+                    self._next_decrease = now + self.cooldown
+            elif status is not None and status < 400:
+                self.factor = min(self.factor + self.increase, 1.0)
+            self._condition.notify_all()
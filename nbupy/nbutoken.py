@@ -0,0 +1,119 @@
+"""
+Module to share the tokens of the API of Veritas Netbackup between processes
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+DEFAULT_TOKEN_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.nbupy', 'tokens.json')
+DEFAULT_TOKEN_VALIDITY = 86400
+TOKEN_EXPIRY_MARGIN = 60
+
+
+class NbuTokenCache(object):
+    """
+        File where the tokens are stored with their expiration time, by api url and user, so that all the processes
+        that use the same master with the same user share one token instead of doing a login each.
+        The file is locked while it's read or written, and lock() can be used to keep it locked for a whole login.
+    """
+
+    def __init__(self, path=DEFAULT_TOKEN_CACHE_PATH, expiry_margin=TOKEN_EXPIRY_MARGIN):
+        self.path = path
+        self.expiry_margin = expiry_margin
+        self._thread_lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @staticmethod
+    def _key(url, user):
+        return hashlib.sha256('{}\n{}'.format(url, user).encode('utf-8')).hexdigest()
+
+    @contextlib.contextmanager
+    def lock(self):
+        """ Locks the cache for the other processes and threads. It can be nested in the same thread """
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                os.makedirs(os.path.dirname(self.path) or '.', mode=0o700, exist_ok=True)
+                self._lock_file = open(self.path + '.lock', 'a+')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                elif msvcrt is not None:
+                    self._lock_file.seek(0)
+                    msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            self._lock_depth += 1
+            try:
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    elif msvcrt is not None:
+                        self._lock_file.seek(0)
+                        msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _write(self, tokens):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tokens')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tokens, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, url, user):
+        """ returns the token of the user for the api url, or None if there isn't one or it is about to expire """
+        with self.lock():
+            entry = self._read().get(self._key(url, user))
+        if entry and entry['expires'] - self.expiry_margin > time.time():
+            return entry['token']
+        return None
+
+    def set(self, url, user, token, validity=None):
+        """ stores the token of the user for the api url, validity is in seconds as returned by the login """
+        now = time.time()
+        with self.lock():
+            tokens = {key: entry for key, entry in self._read().items() if entry['expires'] > now}
+            tokens[self._key(url, user)] = {
+                'token': token,
+                'expires': now + (validity if validity else DEFAULT_TOKEN_VALIDITY)
+            }
+            self._write(tokens)
+
+    def delete(self, url, user, token=None):
+        """ removes the token of the user for the api url, if token is given only if it's the stored one """
+        key = self._key(url, user)
+        with self.lock():
+            tokens = self._read()
+            if key in tokens and (token is None or tokens[key]['token'] == token):
+                del tokens[key]
+                self._write(tokens)
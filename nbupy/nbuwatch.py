@@ -0,0 +1,208 @@
+"""
+Module to watch the jobs of Veritas Netbackup until they end
+
+by Sorint https://sorint.it
+
+License GPLv3
+"""
+import asyncio
+import time
+
+from . import nbuauth, nbumodels
+
+DEFAULT_INTERVAL = 5.0
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 60.0
+DEFAULT_BATCH_SIZE = 50
+DONE_STATE = 'DONE'
+
+
+def _attributes(job):
+    return nbumodels.to_element(job)['attributes']
+
+
+class JobChange(object):
+    """ Change of the state (or status) of a watched job: job is the job as returned by the connector, previous the
+        one of the previous poll (None the first time the job is seen)
+    """
+
+    def __init__(self, job, previous=None):
+        self.job = job
+        self.previous = previous
+        attributes = _attributes(job)
+        self.job_id = attributes.get('jobId')
+        self.state = attributes.get('state')
+        self.status = attributes.get('status')
+
+    @property
+    def done(self):
+        return self.state == DONE_STATE
+
+    def __repr__(self):
+        return '<JobChange jobId={} state={} status={}>'.format(self.job_id, self.state, self.status)
+
+
+class NbuJobWatcher(object):
+    """
+        Watches a set of jobs with a single filtered call to admin/jobs for every poll, instead of a call for every
+        job. When the ids of the jobs are close the call asks for the range of their ids, else for the ids
+        themselves (in calls of batch_size ids). After the first poll only the jobs updated after the last poll are
+        requested, with a filter on lastUpdateTime.
+
+        The interval between the polls is halved, down to min_interval, when a job changes and increased by half, up to
+        max_interval, when nothing changes. on_change is called with a JobChange when the state or the status of a job
+        changes, on_done when a job ends; the ended jobs are no more watched:
+
+        >>> watcher = NbuJobWatcher(nbu, job_ids, on_done=lambda change: print(change.job_id, change.status))
+        >>> jobs = watcher.wait(timeout=3600)
+
+        The connector can be an NbuAsyncApiConnector, in that case use apoll(), awatch() and await, and the callbacks
+        can be coroutine functions.
+    """
+
+    def __init__(self, connector, job_ids=(), interval=DEFAULT_INTERVAL, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, batch_size=DEFAULT_BATCH_SIZE, on_change=None, on_done=None,
+                 page_limit=nbuauth.MAX_PAGE_LIMIT):
+        self.connector = connector
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.batch_size = batch_size
+        self.on_change = on_change
+        self.on_done = on_done
+        self.page_limit = page_limit
+        self.jobs = {}
+        self.watched = set()
+        self.watermark = None
+        self.add(job_ids)
+
+    def add(self, job_ids):
+        """ starts watching the jobs, they are requested by the next poll also if they were not updated """
+        job_ids = {int(job_id) for job_id in job_ids} - self.watched
+        if job_ids:
+            self.watched |= job_ids
+            self.watermark = None
+
+    def remove(self, job_ids):
+        self.watched -= {int(job_id) for job_id in job_ids}
+
+    @property
+    def pending(self):
+        """ the ids of the watched jobs that have not ended yet """
+        return set(self.watched)
+
+    def filters(self):
+        """ returns the filters of the calls of the next poll """
+        if not self.watched:
+            return []
+        job_ids = sorted(self.watched)
+        if job_ids[-1] - job_ids[0] < 2 * max(len(job_ids), self.batch_size):
+            id_filters = ['jobId ge {} and jobId le {}'.format(job_ids[0], job_ids[-1])]
+        else:
+            id_filters = ['({})'.format(' or '.join('jobId eq {}'.format(job_id)
+                                                    for job_id in job_ids[i:i + self.batch_size]))
+                          for i in range(0, len(job_ids), self.batch_size)]
+        if self.watermark:
+            return ['lastUpdateTime ge {} and {}'.format(self.watermark, id_filter) for id_filter in id_filters]
+        return id_filters
+
+    def _update(self, jobs):
+        """ updates the state of the watched jobs with the ones returned by a poll, returns the JobChanges """
+        changes = []
+        watermark = self.watermark
+        for job in jobs:
+            attributes = _attributes(job)
+            job_id = attributes.get('jobId')
+            if job_id not in self.watched:
+                continue
+            last_update = attributes.get('lastUpdateTime')
+            if last_update and (watermark is None or last_update > watermark):
+                watermark = last_update
+            previous = self.jobs.get(job_id)
+            self.jobs[job_id] = job
+            if previous is not None:
+                previous_attributes = _attributes(previous)
+                if (previous_attributes.get('state'), previous_attributes.get('status')) == \
+                        (attributes.get('state'), attributes.get('status')):
+                    continue
+            changes.append(JobChange(job, previous))
+        self.watermark = watermark
+        for change in changes:
+            if change.done:
+                self.watched.discard(change.job_id)
+        if changes:
+            self.interval = max(self.interval / 2, self.min_interval)
+        else:
+            self.interval = min(self.interval * 1.5, self.max_interval)
+        return changes
+
+    def _callbacks(self, change):
+        callbacks = [self.on_change]
+        if change.done:
+            callbacks.append(self.on_done)
+        return [callback for callback in callbacks if callback is not None]
+
+    def _sleep_time(self, deadline):
+        if deadline is None:
+            return self.interval
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('the jobs {} did not end in time'.format(sorted(self.watched)))
+        return min(self.interval, remaining)
+
+    def poll(self):
+        """ requests the watched jobs updated after the last poll, calls the callbacks and returns the JobChanges """
+        jobs = []
+        for filters in self.filters():
+            jobs.extend(self.connector.iter_jobs(filters=filters, sort='jobId', page_limit=self.page_limit))
+        changes = self._update(jobs)
+        for change in changes:
+            for callback in self._callbacks(change):
+                callback(change)
+        return changes
+
+    def watch(self, timeout=None):
+        """ yields the JobChanges, polling until all the jobs end. Raises TimeoutError after timeout seconds """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for change in self.poll():
+                yield change
+            if not self.watched:
+                return
+            time.sleep(self._sleep_time(deadline))
+
+    def wait(self, timeout=None):
+        """ waits until all the jobs end, returns the ended jobs by jobId. Raises TimeoutError after timeout seconds """
+        for _ in self.watch(timeout):
+            pass
+        return dict(self.jobs)
+
+    async def apoll(self):
+        """ Asynchronous version of poll() """
+        jobs = []
+        for filters in self.filters():
+            jobs.extend([job async for job in self.connector.iter_jobs(filters=filters, sort='jobId',
+                                                                       page_limit=self.page_limit)])
+        changes = self._update(jobs)
+        for change in changes:
+            for callback in self._callbacks(change):
+                result = callback(change)
+                if asyncio.iscoroutine(result):
+                    await result
+        return changes
+
+    async def awatch(self, timeout=None):
+        """ Asynchronous version of watch() """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for change in await self.apoll():
+                yield change
+            if not self.watched:
+                return
+            await asyncio.sleep(self._sleep_time(deadline))
+
+    async def await_all(self, timeout=None):
+        """ Asynchronous version of wait() """
+        async for _ in self.awatch(timeout):
+            pass
+        return dict(self.jobs)
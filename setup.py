@@ -14,6 +14,7 @@ setuptools.setup(
     url="https://wecode.sorint.it/SorintSpain/nbupy",
     packages=setuptools.find_packages(),
     install_requires=['requests'],
+    extras_require={'async': ['aiohttp'], 'fast': ['orjson'], 'export': ['numpy', 'pandas', 'pyarrow']},
     classifiers=[
         "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 2.7",
@@ -34,11 +34,33 @@ class TestNbuAdministratorApi(unittest.TestCase):
     def test_get_jobs(self):
         self.assertIsNotNone(self.nbu.get_jobs())
 
+    def test_iter_jobs(self):
+        jobs = self.nbu.get_jobs()
+        self.assertEqual([job['id'] for job in self.nbu.iter_jobs()], [job['id'] for job in jobs['data']])
+
+    def test_get_jobs_parallel(self):
+        jobs = self.nbu.get_jobs()
+        parallel_jobs = self.nbu.get_jobs(max_workers=4)
+        self.assertEqual([job['id'] for job in parallel_jobs['data']], [job['id'] for job in jobs['data']])
+
+    def test_get_jobs_page_limit(self):
+        jobs = self.nbu.get_jobs()
+        for page_limit in (100, 'auto'):
+            limited_jobs = self.nbu.get_jobs(page_limit=page_limit)
+            self.assertEqual([job['id'] for job in limited_jobs['data']], [job['id'] for job in jobs['data']])
+
     def test_delete_jobs(self):
         jobs = self.nbu.get_jobs()
         # Checking response equals to 202
         self.assertRegex(str(self.nbu.delete_job(jobs['data'][0]['attributes']['jobId'])), r'202')
 
+    def test_delete_jobs_bulk(self):
+        jobs = self.nbu.get_jobs()
+        results = self.nbu.delete_jobs([jobs['data'][0]['attributes']['jobId'], -1], max_workers=2)
+        self.assertEqual(results[0].status_code, 202)
+        self.assertEqual(results.failed, [results[1]])
+        self.assertIsNotNone(results[1].error)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from nbupy import NbuAsyncApiConnector, NbuResponseCache, NbuThrottle, RetryPolicy, nbustream
+from nbupy.nbumock import NbuMockServer
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestNbuAsyncApiConnector(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.mock = NbuMockServer(jobs=250, active_jobs=3)
+        self.mock.start()
+        self.nbu = self.connector()
+        await self.nbu.login()
+
+    async def asyncTearDown(self):
+        await self.nbu.logout()
+        await self.nbu.close()
+        self.mock.stop()
+
+    def connector(self, **kwargs):
+        return NbuAsyncApiConnector(url=self.mock.url, user='user', password='password', verify=False,
+                                    retry=RetryPolicy(retries=3, backoff_factor=0.01), **kwargs)
+
+    async def test_login(self):
+        self.assertIsNotNone(self.nbu._token)
+        self.assertEqual(self.mock.requests['POST login'], 1)
+
+    async def test_get_jobs(self):
+        jobs = (await self.nbu.get_jobs(page_limit=40))['data']
+        self.assertEqual([job['attributes']['jobId'] for job in jobs], list(range(250, 0, -1)))
+        self.assertEqual(self.mock.requests['GET admin/jobs'], 7)
+        self.assertEqual((await self.nbu.get_jobs(10))['data']['id'], '10')
+
+    async def test_iter_jobs(self):
+        jobs = await self.nbu.get_jobs(page_limit=40, max_workers=4)
+        self.assertEqual([job['id'] async for job in self.nbu.iter_jobs(page_limit=40)],
+                         [job['id'] for job in jobs['data']])
+
+    async def test_relogin(self):
+        self.mock.expire_tokens()
+        jobs = await asyncio.gather(*[self.nbu.get_jobs(job_id) for job_id in range(1, 33)])
+        self.assertEqual([job['data']['id'] for job in jobs], [str(job_id) for job_id in range(1, 33)])
+        self.assertEqual(self.mock.requests['POST login'], 2)
+
+    async def test_retry(self):
+        self.mock.fail_next(2, status=503, retry_after=0)
+        self.assertEqual(len((await self.nbu.get_disk_pools())['data']), 4)
+        self.assertEqual(self.mock.requests['GET storage/disk-pools'], 3)
+        self.mock.fail_next(4, status=503, retry_after=0)
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await self.nbu.get_storage_units()
+
+    async def test_response_cache(self):
+        statuses = []
+        async with self.connector(response_cache=NbuResponseCache(ttls={'config/policies': 0})) as nbu:
+            nbu.observers.append(lambda event: statuses.append(event.status))
+            first = await nbu.get_policies('policy-1')
+            # the expired response is revalidated with its ETag
+            self.assertEqual(await nbu.get_policies('policy-1'), first)
+        self.assertEqual(statuses, [200, 304, 204])
+
+    async def test_throttle(self):
+        throttle = NbuThrottle(max_reads_in_flight=2)
+        seen = []
+        self.mock.latency = 0.01
+        async with self.connector(throttle=throttle) as nbu:
+            nbu.observers.append(lambda event: seen.append(throttle.in_flight['read']))
+            await asyncio.gather(*[nbu.get_jobs(job_id) for job_id in range(1, 17)])
+        # the 16 calls and the logout
+        self.assertEqual(len(seen), 17)
+        self.assertLessEqual(max(seen), 2)
+        self.assertEqual(throttle.in_flight, {'read': 0, 'write': 0})
+
+    async def test_stream(self):
+        self.mock.compression = True
+        events = []
+        async with self.connector(stream=True) as nbu:
+            nbu.observers.append(events.append)
+            jobs = nbu.iter_jobs(page_limit=100)
+            self.assertEqual((await jobs.__anext__())['attributes']['jobId'], 250)
+            self.assertEqual([job['attributes']['jobId'] async for job in jobs], list(range(249, 0, -1)))
+            self.assertEqual(self.mock.requests['GET admin/jobs'], 3)
+            self.assertEqual([policy['id'] async for policy in nbu.iter_policies()],
+                             [policy['id'] for policy in (await nbu.get_policies())['data']])
+        # the streamed pages are parsed while they are received, not decoded whole
+        self.assertEqual([event.decode_time for event in events[:4]], [None] * 4)
+
+    async def test_stream_elements(self):
+        body = b'{"data": [{"id": "1"}, {"id": "22"}], "meta": {"pagination": {"count": 2}}}'
+
+        async def chunks():
+            for start in range(0, len(body), 7):
+                yield body[start:start + 7]
+
+        envelope = {}
+        self.assertEqual([element['id'] async for element in nbustream.aiter_elements(chunks(), envelope=envelope)],
+                         ['1', '22'])
+        self.assertEqual(envelope['meta']['pagination']['count'], 2)
+
+    async def test_bulk(self):
+        results = await self.nbu.delete_policies(['policy-1', 'missing'], reason='cleanup')
+        self.assertEqual([result.status_code for result in results], [204, 404])
+        self.assertIn('The policy missing does not exist.', results[1].error)
+        self.assertEqual(len(self.mock.policies.elements), 9)
+
+    async def test_request_hooks(self):
+        calls = []
+
+        def hook(method, url, headers):
+            calls.append((method, url[len(self.mock.url):]))
+            headers['Authorization'] = 'replaced'
+
+        self.nbu.request_hooks.append(hook)
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await self.nbu.get_jobs(1)
+        self.nbu.request_hooks.remove(hook)
+        self.assertEqual((await self.nbu.get_jobs(1))['data']['id'], '1')
+        self.assertEqual(calls, [('GET', 'admin/jobs/1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
+import os
+import tempfile
 import unittest
 
-from nbupy import NbuAuthorizationApi
+from nbupy import NbuAuthorizationApi, NbuMetricsCollector, NbuTokenCache, RetryPolicy
 import test_configuration
 
 # Here you can overwrite the global configuration of the test
@@ -38,6 +40,40 @@ class TestNbuAuthorizationApi(unittest.TestCase):
         # TODO
         pass
 
+    def test_relogin(self):
+        self.nbu.set_api_key('expired token')
+        self.assertIsNotNone(self.nbu.get_authorization_context())
+        self.assertNotEqual(self.nbu._token, 'expired token')
+
+    def test_token_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            token_cache = NbuTokenCache(os.path.join(directory, 'tokens.json'))
+            with NbuAuthorizationApi(url=URL, user=USER, password=PASSWORD, verify=VERIFY, domain_name=DOMAIN_NAME,
+                                     domain_type=DOMAIN_TYPE, version=VERSION, token_cache=token_cache) as nbu:
+                token = nbu._token
+            self.assertEqual(token_cache.get(URL, USER), token)
+            with NbuAuthorizationApi(url=URL, user=USER, password=PASSWORD, verify=VERIFY, domain_name=DOMAIN_NAME,
+                                     domain_type=DOMAIN_TYPE, version=VERSION, token_cache=token_cache) as nbu:
+                self.assertEqual(nbu._token, token)
+                nbu.logout()
+            self.assertIsNone(token_cache.get(URL, USER))
+
+    def test_transport_settings(self):
+        with NbuAuthorizationApi(url=URL, user=USER, password=PASSWORD, verify=VERIFY, domain_name=DOMAIN_NAME,
+                                 domain_type=DOMAIN_TYPE, version=VERSION, pool_maxsize=32, pool_block=True,
+                                 keep_alive=False, retry=RetryPolicy(retries=5, backoff_factor=0.1)) as nbu:
+            self.assertIsNotNone(nbu.get_authorization_context())
+
+    def test_metrics(self):
+        metrics = NbuMetricsCollector()
+        with NbuAuthorizationApi(url=URL, user=USER, password=PASSWORD, verify=VERIFY, domain_name=DOMAIN_NAME,
+                                 domain_type=DOMAIN_TYPE, version=VERSION, observers=[metrics]) as nbu:
+            nbu.get_authorization_context()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['POST login']['requests'], 1)
+        self.assertEqual(snapshot['GET authorization-context']['statuses'], {200: 1})
+        self.assertIn('nbupy_request_duration_seconds_count', metrics.to_prometheus())
+
     def test_get_app_details(self):
         self.app_details = str(self.nbu.get_app_details())
         self.assertRegex(self.app_details, r'.*STARTED.*', msg=None)
@@ -0,0 +1,38 @@
+import unittest
+
+from nbupy import NbuApiConnector, NbuResponseCache
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.mocks = [NbuMockServer(jobs=0, policies=3), NbuMockServer(jobs=0, policies=5)]
+        for mock in self.mocks:
+            mock.start()
+            self.addCleanup(mock.stop)
+        self.cache = NbuResponseCache(ttls={'config/policies': 60})
+
+    def connector(self, mock, user='user'):
+        nbu = NbuApiConnector(url=mock.url, user=user, password='password', verify=False, response_cache=self.cache)
+        nbu.login()
+        self.addCleanup(nbu.logout)
+        return nbu
+
+    def test_shared(self):
+        first, second = self.connector(self.mocks[0]), self.connector(self.mocks[1])
+        other_user = self.connector(self.mocks[0], user='other')
+        for _ in range(2):
+            self.assertEqual(len(first.get_policies()['data']), 3)
+            self.assertEqual(len(second.get_policies()['data']), 5)
+            self.assertEqual(len(other_user.get_policies()['data']), 3)
+        self.assertEqual([mock.requests['GET config/policies'] for mock in self.mocks], [2, 1])
+        # the changes of a master invalidate its responses for all the users, but not the ones of the other masters
+        first.delete_policy('policy-0')
+        self.assertEqual(len(other_user.get_policies()['data']), 2)
+        self.assertEqual(len(second.get_policies()['data']), 5)
+        self.assertEqual([mock.requests['GET config/policies'] for mock in self.mocks], [3, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from nbupy import NbuConfigurationApi
+from nbupy import NbuConfigurationApi, NbuResponseCache
 import test_configuration
 
 # Here you can overwrite the global configuration of the test
@@ -39,6 +39,16 @@ class TestNbuConfigurationApi(unittest.TestCase):
         if len(policies['data']) > 0:
             self.assertIsNotNone(self.nbu.get_policies(str(policies['data'][0]['id'])))
 
+    def test_response_cache(self):
+        response_cache = NbuResponseCache(ttls={'config/policies': 60})
+        with NbuConfigurationApi(url=URL, user=USER, password=PASSWORD, verify=VERIFY, domain_name=DOMAIN_NAME,
+                                 domain_type=DOMAIN_TYPE, version=VERSION, response_cache=response_cache) as nbu:
+            policies = nbu.get_policies()
+            self.assertGreater(response_cache.size, 0)
+            self.assertEqual(nbu.get_policies(), policies)
+            response_cache.invalidate('config/policies/')
+            self.assertEqual(response_cache.size, 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,48 @@
+import itertools
+import os
+import tempfile
+import unittest
+
+from nbupy import NbuApiConnector, NbuCursor
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuCursor(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=500)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def job_ids(self, jobs):
+        return [job['attributes']['jobId'] for job in jobs]
+
+    def test_resume(self):
+        jobs = self.nbu.iter_jobs(filters='jobId le 400', sort='jobId', page_limit=50, max_workers=3)
+        first = self.job_ids(itertools.islice(jobs, 123))
+        cursor = NbuCursor.from_json(jobs.cursor.to_json())
+        self.assertEqual((cursor.offset, cursor.position), (100, 23))
+        rest = self.job_ids(self.nbu.resume(cursor, page_limit=30))
+        self.assertEqual(first + rest, list(range(1, 401)))
+        with self.assertRaises(ValueError):
+            self.nbu.iter_jobs(sort='-jobId', cursor=cursor)
+
+    def test_checkpoint(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoint = os.path.join(directory.name, 'jobs.cursor')
+        jobs = self.nbu.iter_jobs(sort='jobId', page_limit=100, checkpoint=checkpoint)
+        self.assertEqual(len(list(itertools.islice(jobs, 250))), 250)
+        self.assertEqual(NbuCursor.load(checkpoint).offset, 200)
+        rest = self.job_ids(self.nbu.iter_jobs(sort='jobId', page_limit=100, checkpoint=checkpoint))
+        self.assertEqual(rest, list(range(201, 501)))
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+if __name__ == '__main__':
+    unittest.main()
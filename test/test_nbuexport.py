@@ -0,0 +1,74 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nbupy import NbuApiConnector, NbuExporter
+from nbupy import nbuexport
+from nbupy.nbuexport import Column, numpy, pandas, pyarrow
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=120, active_jobs=2)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+        self.exporter = NbuExporter(self.nbu, 'jobs', columns=['jobId', 'status', 'startTime', 'bytesTransferred',
+                                                               Column('elapsed', ('attributes', 'elapsedTime'))],
+                                    page_limit=50, batch_size=40)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        self.nbu.logout()
+        self.mock.stop()
+
+    def test_to_jsonl(self):
+        path = os.path.join(self.directory.name, 'jobs.jsonl')
+        self.assertEqual(self.exporter.to_jsonl(path), 120)
+        with open(path) as f:
+            first = json.loads(f.readline())
+        self.assertEqual(first['jobId'], 120)
+        self.assertIsNone(first['status'])
+        self.assertTrue(first['startTime'].endswith('.000Z'))
+
+    def test_to_csv(self):
+        path = os.path.join(self.directory.name, 'jobs.csv')
+        self.assertEqual(self.exporter.to_csv(path), 120)
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['jobId', 'status', 'startTime', 'bytesTransferred', 'elapsed'])
+        self.assertEqual(len(rows), 121)
+
+    @unittest.skipIf(numpy is None or pandas is None, 'pandas is not installed')
+    def test_to_pandas(self):
+        jobs = self.exporter.to_pandas()
+        self.assertEqual(len(jobs), 120)
+        self.assertEqual(str(jobs['status'].dtype), 'Int64')
+        self.assertEqual(str(jobs['startTime'].dt.tz), 'UTC')
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_to_parquet(self):
+        path = os.path.join(self.directory.name, 'jobs.parquet')
+        self.assertEqual(self.exporter.to_parquet(path), 120)
+        self.assertEqual(pyarrow.parquet.read_table(path).num_rows, 120)
+
+    def test_missing_dependency(self):
+        path = os.path.join(self.directory.name, 'jobs.parquet')
+        with mock.patch.object(nbuexport, 'pyarrow', None):
+            with self.assertRaisesRegex(ImportError, 'pip install pyarrow'):
+                self.exporter.to_arrow()
+            with self.assertRaisesRegex(ImportError, 'pip install pyarrow'):
+                self.exporter.to_parquet(path)
+        with mock.patch.object(nbuexport, 'pandas', None):
+            with self.assertRaisesRegex(ImportError, 'pip install pandas'):
+                self.exporter.to_pandas()
+
+
+if __name__ == '__main__':
+    unittest.main()
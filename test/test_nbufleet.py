@@ -0,0 +1,72 @@
+import unittest
+
+import requests
+
+from nbupy import FleetError, Job, NbuApiConnector, NbuFleet
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuFleet(unittest.TestCase):
+
+    def setUp(self):
+        # two masters, one that fails and one that is too slow
+        self.mocks = {
+            'first': NbuMockServer(jobs=30),
+            'second': NbuMockServer(jobs=50),
+            'failing': NbuMockServer(jobs=10),
+            'slow': NbuMockServer(jobs=10),
+        }
+        for mock in self.mocks.values():
+            mock.start()
+            self.addCleanup(mock.stop)
+        self.fleet = NbuFleet({
+            master: NbuApiConnector(url=mock.url, user='user', password='password', verify=False,
+                                    typed=master == 'second')
+            for master, mock in self.mocks.items()
+        }, timeout={'slow': 0.3})
+        self.fleet.login()
+
+    def tearDown(self):
+        self.mocks['slow'].latency = 0
+        self.fleet.logout()
+
+    def test_get_jobs(self):
+        self.mocks['failing'].fail_next(1, status=500)
+        self.mocks['slow'].latency = 1
+        results = self.fleet.get_jobs(page_limit=100)
+        self.assertEqual(sorted(results.succeeded), ['first', 'second'])
+        self.assertIsInstance(results.failed['failing'], requests.HTTPError)
+        self.assertIsInstance(results.failed['slow'], TimeoutError)
+        self.assertIsInstance(results['second'].value['data'][0], Job)
+        jobs = results.merged()['data']
+        self.assertEqual(len(jobs), 80)
+        self.assertEqual(sum(1 for job in jobs if job['master'] == 'second'), 50)
+        self.assertEqual(jobs[-1]['attributes']['jobId'], 1)
+
+    def test_call(self):
+        results = self.fleet.call('get_jobs', filters='jobId le 3', sort='jobId')
+        self.assertEqual(len(results.succeeded), 4)
+        self.assertEqual([(job['master'], job['id']) for job in results.merged()['data']][:4],
+                         [('first', '1'), ('first', '2'), ('first', '3'), ('second', '1')])
+
+    def test_login_failure(self):
+        locked = NbuMockServer(jobs=10, users={'user': 'secret'})
+        locked.start()
+        self.addCleanup(locked.stop)
+        fleet = NbuFleet({
+            'first': NbuApiConnector(url=self.mocks['first'].url, user='user', password='password', verify=False),
+            'locked': NbuApiConnector(url=locked.url, user='user', password='password', verify=False),
+        })
+        with self.assertRaisesRegex(FleetError, 'locked') as context:
+            with fleet:
+                self.fail('the fleet must not be entered')
+        self.assertIsInstance(context.exception.results.failed['locked'], requests.HTTPError)
+        self.assertEqual(list(context.exception.results.failed), ['locked'])
+        with self.assertRaises(FleetError):
+            fleet.login()
+        # the masters that logged in are logged out
+        self.assertEqual(self.mocks['first'].requests['POST logout'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
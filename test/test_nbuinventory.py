@@ -0,0 +1,46 @@
+import unittest
+
+from nbupy import Capacity, NbuApiConnector
+from nbupy.nbumock import NbuMockServer
+
+TB = 2 ** 40
+
+
+class TestStorageInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=0, storage_servers=3, disk_pools=4, storage_units=6, disk_volumes=2,
+                                  latency=0.05)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def test_inventory(self):
+        self.mock.reset_counters()
+        inventory = self.nbu.get_storage_inventory()
+        self.assertEqual(self.mock.request_count, 6)
+        self.assertEqual((len(inventory.servers), len(inventory.disk_pools), len(inventory.storage_units)), (3, 4, 6))
+        self.assertEqual(inventory.pools_by_server['PureDisk:media-0'], ['PureDisk:media-0_0', 'PureDisk:media-0_3'])
+        self.assertEqual(inventory.units_by_pool['PureDisk:media-0_0'], ['stu-0', 'stu-4'])
+        self.assertEqual(inventory.server_capacity['PureDisk:media-1'], Capacity(2 * TB, TB))
+        self.assertEqual(inventory.pool_capacity['PureDisk:media-1_1'], Capacity(TB, TB - 2 * 2 ** 35))
+        self.assertEqual(inventory.unit_capacity('stu-5'), inventory.pool_capacity['PureDisk:media-1_1'])
+        self.assertEqual(inventory.total_capacity.used, (1 + 2 + 3 + 4) * 2 ** 35)
+        self.assertEqual([row['pool'] for row in inventory.report()], ['pool-0', 'pool-1', 'pool-2', 'pool-3'])
+
+    def test_ttl(self):
+        inventory = self.nbu.get_storage_inventory(ttl=60)
+        self.mock.reset_counters()
+        self.assertIs(self.nbu.get_storage_inventory(ttl=60), inventory)
+        self.assertEqual(self.mock.request_count, 0)
+        self.assertIsNot(self.nbu.get_storage_inventory(), inventory)
+        self.nbu.delete_storage_unit('stu-0')
+        self.assertNotIn('stu-0', self.nbu.get_storage_inventory(ttl=60).storage_units)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from nbupy import NbuAdministratorApi, NbuJobMirror
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuJobMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=300, active_jobs=2)
+        self.mock.start()
+        self.nbu = NbuAdministratorApi(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+        self.directory = tempfile.TemporaryDirectory()
+        self.mirror = NbuJobMirror(self.nbu, os.path.join(self.directory.name, 'jobs.db'))
+
+    def tearDown(self):
+        self.mirror.close()
+        self.directory.cleanup()
+        self.nbu.logout()
+        self.mock.stop()
+
+    def test_sync(self):
+        self.assertEqual(self.mirror.sync(page_limit=100), 300)
+        self.assertEqual(self.mirror.count(), 300)
+        self.assertEqual(self.mirror.count('ACTIVE'), 2)
+        # the next syncs download only the jobs updated since the watermark, that is included
+        self.mock.reset_counters()
+        self.assertEqual(self.mirror.sync(page_limit=100), 1)
+        self.assertEqual(self.mock.requests['GET admin/jobs'], 1)
+        self.mock.update_job(5, state='ACTIVE')
+        self.mock.add_jobs(2)
+        self.assertEqual(self.mirror.sync(page_limit=100), 4)
+        self.assertEqual(self.mirror.count(), 302)
+        self.assertEqual(self.mirror.get_job(5)['attributes']['state'], 'ACTIVE')
+        self.assertEqual(self.mirror.sync(page_limit=100), 1)
+
+    def test_query(self):
+        self.mirror.sync()
+        jobs = self.mirror.query(state='ACTIVE')
+        self.assertEqual([job['attributes']['jobId'] for job in jobs], [300, 299])
+        self.assertEqual(self.mirror.get_job(300), jobs[0])
+        jobs = self.mirror.query(start_before='2026-01-01T00:10:00.000Z', sort='jobId', limit=3)
+        self.assertEqual([job['attributes']['jobId'] for job in jobs], [1, 2, 3])
+        self.assertIsNone(self.mirror.get_job(1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import concurrent.futures
+import unittest
+
+import requests
+
+from nbupy import AdaptivePageLimit, NbuApiConnector, RetryPolicy
+from nbupy.nbumock import NbuMockServer, compile_filter
+
+
+class TestNbuMockServer(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=250, active_jobs=3)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False,
+                                   retry=RetryPolicy(retries=3, backoff_factor=0.01))
+        self.nbu.login()
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def test_pagination(self):
+        jobs = self.nbu.get_jobs(page_limit=40)['data']
+        self.assertEqual([job['attributes']['jobId'] for job in jobs], list(range(250, 0, -1)))
+        self.assertEqual(self.mock.requests['GET admin/jobs'], 7)
+
+    def test_parallel_pagination(self):
+        jobs = self.nbu.get_jobs(page_limit=40, max_workers=4)['data']
+        self.assertEqual([job['attributes']['jobId'] for job in jobs], list(range(250, 0, -1)))
+
+    def test_adaptive_page_limit(self):
+        server = NbuMockServer(jobs=5000, max_page_limit=500)
+        server.start()
+        self.addCleanup(server.stop)
+        with NbuApiConnector(url=server.url, user='user', password='password', verify=False, page_limit='auto') as nbu:
+            nbu.page_limit = AdaptivePageLimit(limit=20)
+            with concurrent.futures.ThreadPoolExecutor(6) as executor:
+                counts = list(executor.map(lambda _: sum(1 for _ in nbu.iter_jobs()), range(6)))
+            self.assertEqual(counts, [5000] * 6)
+            # the traversals adapt their own copies, the settings of the connector don't change
+            self.assertEqual((nbu.page_limit.limit, nbu.page_limit.maximum), (20, 1000))
+            server.reset_counters()
+            self.assertEqual(len(nbu.get_jobs()['data']), 5000)
+            # 20, 40, ..., 320, then the 500 enforced by the server
+            self.assertEqual(server.requests['GET admin/jobs'], 5 + 9)
+        # a page with the limit that was requested doesn't lower the maximum, also if the limit has grown meanwhile
+        limit = AdaptivePageLimit(limit=80)
+        self.assertEqual(limit.update(0, {'limit': 40}, requested=40), 160)
+        self.assertEqual(limit.update(0, {'limit': 100}, requested=160), 100)
+        self.assertEqual(limit.maximum, 100)
+
+    def test_filter(self):
+        jobs = self.nbu.get_jobs(filters="state eq 'ACTIVE' or jobId le 2", sort='jobId')['data']
+        self.assertEqual([job['attributes']['jobId'] for job in jobs], [1, 2, 248, 249, 250])
+        self.assertTrue(compile_filter("not (status eq 0) and jobId gt 1")({'status': 1, 'jobId': 2}))
+
+    def test_update_job(self):
+        self.mock.update_job(10, state='ACTIVE')
+        jobs = self.nbu.get_jobs(filters="state eq 'ACTIVE'", sort='-lastUpdateTime')['data']
+        self.assertEqual(jobs[0]['id'], '10')
+
+    def test_errors(self):
+        self.mock.fail_next(2, status=503, retry_after=0)
+        self.assertEqual(len(self.nbu.get_disk_pools()['data']), 4)
+        self.mock.expire_tokens()
+        self.assertEqual(len(self.nbu.get_storage_units()['data']), 4)
+        self.assertEqual(self.mock.requests['POST login'], 2)
+
+    def test_threads(self):
+        self.mock.expire_tokens()
+        with concurrent.futures.ThreadPoolExecutor(32) as executor:
+            jobs = list(executor.map(lambda job_id: self.nbu.get_jobs(job_id)['data'], range(1, 65)))
+        self.assertEqual([job['id'] for job in jobs], [str(job_id) for job_id in range(1, 65)])
+        self.assertEqual(self.mock.requests['POST login'], 2)
+
+    def test_policies(self):
+        policy = {'data': {'type': 'policy', 'id': 'new', 'attributes': {'policy': {'policyName': 'new'}}}}
+        self.nbu.create_policy(policy)
+        self.assertEqual(self.nbu.get_policies('new')['data']['id'], 'new')
+        self.assertEqual(len(self.nbu.delete_policies(['new', 'new'], reason='cleanup').failed), 1)
+        self.assertEqual(self.mock.audit_reasons, [('POST', 'config/policies', ''),
+                                                   ('DELETE', 'config/policies/new', 'cleanup'),
+                                                   ('DELETE', 'config/policies/new', 'cleanup')])
+
+    def test_stream(self):
+        self.mock.compression = True
+        with NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False, stream=True) as nbu:
+            jobs = nbu.iter_jobs(page_limit=100)
+            self.assertEqual(next(jobs)['attributes']['jobId'], 250)
+            self.assertEqual(sum(1 for _ in jobs), 249)
+            self.assertEqual(self.mock.requests['GET admin/jobs'], 3)
+            self.assertEqual([policy['id'] for policy in nbu.iter_policies()],
+                             [policy['id'] for policy in nbu.get_policies()['data']])
+
+    def test_request_hooks(self):
+        calls = []
+
+        def hook(method, url, headers):
+            calls.append((method, url[len(self.mock.url):]))
+            headers['Authorization'] = 'replaced'
+
+        self.nbu.request_hooks.append(hook)
+        with self.assertRaises(requests.HTTPError):
+            self.nbu.get_jobs(1)
+        self.nbu.request_hooks.remove(hook)
+        self.assertEqual(self.nbu.get_jobs(1)['data']['id'], '1')
+        self.assertEqual(calls, [('GET', 'admin/jobs/1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
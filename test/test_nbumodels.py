@@ -0,0 +1,40 @@
+import unittest
+from unittest import mock
+
+from nbupy import Job, NbuApiConnector, Policy, nbumodels
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuModels(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=250, active_jobs=3)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False, typed=True)
+        self.nbu.login()
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def test_typed(self):
+        jobs = self.nbu.get_jobs(page_limit=100)['data']
+        self.assertIsInstance(jobs[0], Job)
+        self.assertEqual([job.jobId for job in jobs], list(range(250, 0, -1)))
+        self.assertEqual(jobs[-1].to_element()['attributes']['state'], 'DONE')
+        policy = self.nbu.get_policies('policy-1')['data']
+        self.assertIsInstance(policy, Policy)
+        self.assertEqual(policy.clients, ('client-1',))
+
+    def test_shared_values(self):
+        with mock.patch.object(nbumodels, 'MAX_SHARED_VALUES', 20):
+            jobs = self.nbu.get_jobs(page_limit=100)['data']
+            self.assertLessEqual(len(nbumodels._shared_values), 20)
+        with NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False) as nbu:
+            elements = nbu.get_jobs()['data']
+        self.assertEqual(len({job.clientName for job in jobs}), len({job['attributes']['clientName']
+                                                                      for job in elements}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import datetime
+import unittest
+
+from nbupy import Field, NbuApiConnector, NbuQuery
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuQuery(unittest.TestCase):
+
+    def test_compile(self):
+        self.assertEqual(str((Field('state') == 'DONE') & ((Field('status') == 1) | ~(Field('policyName') == "it's"))),
+                         "state eq 'DONE' and (status eq 1 or not (policyName eq 'it''s'))")
+        moment = datetime.datetime(2026, 1, 1, 2, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+        self.assertEqual(str(Field('startTime') >= moment), 'startTime ge 2026-01-01T00:00:00.000Z')
+        query = NbuQuery('jobs').where(Field('jobId') > 10, status=[1, 58], restartable=True).order_by('-startTime')
+        self.assertEqual(query.params(), {'filter': 'jobId gt 10 and restartable eq true and '
+                                                    '(status eq 1 or status eq 58)', 'sort': '-startTime'})
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            NbuQuery('jobs').where(policy='gold')
+        with self.assertRaises(ValueError):
+            NbuQuery('disk-pools').order_by('jobId')
+        with self.assertRaises(TypeError):
+            (Field('jobId') > 1) and (Field('jobId') < 5)
+
+    def test_containers(self):
+        fields = [Field('state'), Field('status')]
+        self.assertIn(Field('status'), fields)
+        self.assertNotIn(Field('jobId'), fields)
+        self.assertEqual({Field('state'): 1}[Field('state')], 1)
+        self.assertEqual(len({Field('state'), Field('state'), Field('status')}), 2)
+        self.assertTrue(Field('state') != Field('status'))
+
+    def test_calls(self):
+        mock = NbuMockServer(jobs=100)
+        mock.start()
+        self.addCleanup(mock.stop)
+        with NbuApiConnector(url=mock.url, user='user', password='password', verify=False) as nbu:
+            query = NbuQuery('jobs').where(Field('jobId').between(10, 30), jobType='DBBACKUP').order_by('jobId')
+            self.assertEqual([job['id'] for job in nbu.get_jobs(filters=query)['data']], ['11', '21'])
+            with self.assertRaises(ValueError):
+                nbu.get_disk_pools(filters=query)
+            pools = nbu.get_disk_pools(filters=Field('usedCapacityBytes') > 2 ** 36)['data']
+            self.assertEqual([pool['attributes']['name'] for pool in pools], ['pool-2', 'pool-3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
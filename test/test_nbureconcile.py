@@ -0,0 +1,101 @@
+import copy
+import unittest
+
+from nbupy import NbuApiConnector, NbuReconciler
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuReconciler(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=0, policies=20, disk_pools=4, storage_units=6)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def current(self, collection):
+        return [{'data': copy.deepcopy(element)} for element in collection.elements.values()]
+
+    def test_unchanged(self):
+        reconciler = NbuReconciler(self.nbu, policies=self.current(self.mock.policies),
+                                   storage_units=self.current(self.mock.storage_units),
+                                   disk_pools=self.current(self.mock.disk_pools), prune=True)
+        plan = reconciler.plan()
+        self.assertEqual(list(plan), [])
+        self.assertEqual(str(plan), '0 to create, 0 to update, 0 to delete')
+
+    def test_apply(self):
+        policies = self.current(self.mock.policies)[:18]
+        policies[0]['data']['attributes']['policy']['policyAttributes']['active'] = False
+        policies.append({'data': {'type': 'policy', 'id': 'policy-new', 'attributes': {'policy': {
+            'policyName': 'policy-new', 'policyType': 'Standard', 'policyAttributes': {'storage': 'stu-6'}}}}})
+        storage_units = [{'data': {'type': 'storageUnit', 'attributes': {'name': 'stu-1', 'maxConcurrentJobs': 20}}},
+                         {'data': {'type': 'storageUnit', 'attributes': {'name': 'stu-6', 'storageType': 'DISK'}}}]
+        reconciler = NbuReconciler(self.nbu, policies=policies, storage_units=storage_units)
+        plan = reconciler.plan()
+        self.assertEqual([(change.action, change.kind, change.name) for change in plan], [
+            ('update', 'storage unit', 'stu-1'),
+            ('create', 'storage unit', 'stu-6'),
+            ('update', 'policy', 'policy-0'),
+            ('create', 'policy', 'policy-new'),
+        ])
+        self.assertIn('attributes.policy.policyAttributes.active: True -> False', str(plan))
+        self.mock.reset_counters()
+        results = reconciler.apply(plan)
+        self.assertEqual(results.failed, [])
+        self.assertEqual(self.mock.request_count, 4)
+        self.assertFalse(self.mock.policies.get('policy-0')['attributes']['policy']['policyAttributes']['active'])
+        self.assertEqual(self.mock.policies.get('policy-0')['attributes']['policy']['clients'],
+                         [{'hostName': 'client-0'}])
+        self.assertEqual(self.mock.storage_units.get('stu-1')['attributes']['maxConcurrentJobs'], 20)
+        self.assertEqual(list(reconciler.plan()), [])
+
+        pruning = NbuReconciler(self.nbu, policies=policies, prune=True)
+        self.assertEqual([change.name for change in pruning.plan().deletes], ['policy-18', 'policy-19'])
+
+    def test_conflict(self):
+        policies = self.current(self.mock.policies)[:2]
+        for policy in policies:
+            policy['data']['attributes']['policy']['policyType'] = 'Oracle'
+        storage_units = [{'data': {'attributes': {'name': 'stu-0'}}}]
+        reconciler = NbuReconciler(self.nbu, policies=policies, storage_units=storage_units, prune=True)
+        plan = reconciler.plan()
+        self.mock.policies.update('policy-1', {'data': {'attributes': {'policy': {'policyType': 'Changed'}}}})
+        results = reconciler.apply(plan)
+        self.assertEqual([result.status_code for result in results.failed], [412] + [None] * (18 + 5))
+        self.assertEqual(self.mock.policies.get('policy-0')['attributes']['policy']['policyType'], 'Oracle')
+        self.assertIn('stu-1', self.mock.storage_units.elements)
+
+    def test_typed(self):
+        policies = self.current(self.mock.policies)
+        policies[0]['data']['attributes']['policy']['policyAttributes']['active'] = False
+        disk_pools = self.current(self.mock.disk_pools)
+        with NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False, typed=True) as nbu:
+            reconciler = NbuReconciler(nbu, policies=policies, storage_units=self.current(self.mock.storage_units),
+                                       disk_pools=disk_pools, prune=True)
+            plan = reconciler.plan()
+            self.assertEqual([(change.action, change.name) for change in plan], [('update', 'policy-0')])
+            self.assertEqual(reconciler.apply(plan).failed, [])
+        del disk_pools[0]['data']['attributes']['name']
+        with self.assertRaisesRegex(ValueError, 'attributes.name'):
+            NbuReconciler(self.nbu, disk_pools=disk_pools)
+
+    def test_stage_order(self):
+        storage_units = [{'data': {'type': 'storageUnit', 'attributes': {'name': 'stu-new', 'storageType': 'DISK'}}}]
+        policies = [{'data': {'type': 'policy', 'id': 'policy-new', 'attributes': {'policy': {
+            'policyName': 'policy-new', 'policyType': 'Standard', 'policyAttributes': {'storage': 'stu-new'}}}}}]
+        reconciler = NbuReconciler(self.nbu, policies=policies, storage_units=storage_units)
+        plan = reconciler.plan()
+        plan.reverse()
+        self.mock.fail_next(1, status=500)
+        results = reconciler.apply(plan)
+        self.assertEqual([result.item.kind for result in results], ['storage unit', 'policy'])
+        self.assertEqual([result.status_code for result in results.failed], [500, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
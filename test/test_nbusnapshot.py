@@ -0,0 +1,80 @@
+import datetime
+import unittest
+
+from nbupy import NbuApiConnector, NbuAsyncApiConnector, NbuExporter, NbuJobSnapshot, nbuasync
+from nbupy.nbumock import NbuMockServer
+
+START = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class TestNbuJobSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        # a job per minute from START
+        self.mock = NbuMockServer(jobs=2000)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def job_ids(self, jobs):
+        return [job['attributes']['jobId'] for job in jobs]
+
+    def test_windows(self):
+        snapshot = self.nbu.iter_jobs_snapshot(START, START + datetime.timedelta(days=2), page_limit=50,
+                                               target_jobs=200)
+        self.assertEqual(self.job_ids(snapshot), list(range(1, 2001)))
+        self.assertEqual(sum(window.count for window in snapshot.windows), 2000)
+        self.assertEqual(snapshot.windows[0].end - snapshot.windows[0].start, datetime.timedelta(hours=1))
+        self.assertEqual(snapshot.windows[-1].end - snapshot.windows[-2].start, datetime.timedelta(minutes=400))
+        self.assertEqual(snapshot.duplicates, 0)
+
+    def test_split(self):
+        snapshot = NbuJobSnapshot(self.nbu, START, START + datetime.timedelta(hours=10), filters="jobType eq 'BACKUP'",
+                                  window=datetime.timedelta(days=1), target_jobs=100, page_limit=40, max_workers=3)
+        jobs = self.job_ids(snapshot)
+        self.assertEqual(jobs, [job_id for job_id in range(1, 601) if (job_id - 1) % 10])
+        self.assertEqual(snapshot.splits, 1)
+        self.assertEqual(len(snapshot.windows), 6)
+        # the jobs of the split window are counted once
+        self.assertEqual((snapshot._jobs, snapshot._seconds), (540, 36000))
+
+    def test_export(self):
+        exporter = NbuExporter(self.nbu, 'jobs', columns=['jobId'], start=START + datetime.timedelta(minutes=10),
+                               end='2026-01-01T00:20:30.000Z', max_workers=2)
+        self.assertEqual([row[0] for row in exporter.iter_rows()], list(range(11, 22)))
+
+
+@unittest.skipIf(nbuasync.aiohttp is None, 'aiohttp is not installed')
+class TestNbuJobSnapshotAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.mock = NbuMockServer(jobs=2000)
+        self.mock.start()
+        self.nbu = NbuAsyncApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        await self.nbu.login()
+
+    async def asyncTearDown(self):
+        await self.nbu.logout()
+        await self.nbu.close()
+        self.mock.stop()
+
+    async def test_windows(self):
+        snapshot = self.nbu.iter_jobs_snapshot(START, START + datetime.timedelta(days=2), page_limit=50,
+                                               target_jobs=200, max_workers=3)
+        self.assertEqual([job['attributes']['jobId'] async for job in snapshot], list(range(1, 2001)))
+        self.assertEqual(sum(window.count for window in snapshot.windows), 2000)
+        self.assertEqual(snapshot.duplicates, 0)
+
+    async def test_split(self):
+        snapshot = NbuJobSnapshot(self.nbu, START, START + datetime.timedelta(hours=10), filters="jobType eq 'BACKUP'",
+                                  window=datetime.timedelta(days=1), target_jobs=100, page_limit=40, max_workers=3)
+        jobs = [job['attributes']['jobId'] async for job in snapshot]
+        self.assertEqual(jobs, [job_id for job_id in range(1, 601) if (job_id - 1) % 10])
+        self.assertEqual((snapshot.splits, len(snapshot.windows)), (1, 6))
+
+if __name__ == '__main__':
+    unittest.main()
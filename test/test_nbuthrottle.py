@@ -0,0 +1,54 @@
+import concurrent.futures
+import time
+import unittest
+
+from nbupy import NbuApiConnector, NbuThrottle, RetryPolicy
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuThrottle(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=100, latency=0.02)
+        self.mock.start()
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def connector(self, throttle):
+        return NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False, throttle=throttle,
+                               retry=RetryPolicy(retries=3, backoff_factor=0.01))
+
+    def test_rate(self):
+        throttle = NbuThrottle(read_rate=20, burst=1)
+        with self.connector(throttle) as nbu:
+            start = time.monotonic()
+            for _ in range(6):
+                nbu.get_jobs(1)
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_in_flight(self):
+        throttle = NbuThrottle(max_reads_in_flight=2)
+        seen = []
+        with self.connector(throttle) as nbu, self.connector(throttle) as other:
+            nbu.observers.append(lambda event: seen.append(throttle.in_flight['read']))
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                list(executor.map(lambda n: (nbu if n % 2 else other).get_jobs(n + 1), range(16)))
+        self.assertLessEqual(max(seen), 2)
+        self.assertEqual(throttle.in_flight, {'read': 0, 'write': 0})
+
+    def test_backoff(self):
+        throttle = NbuThrottle(read_rate=100, cooldown=0)
+        with self.connector(throttle) as nbu:
+            self.mock.fail_next(2, status=503, retry_after=0.1)
+            start = time.monotonic()
+            nbu.get_jobs(1)
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+            self.assertLess(throttle.factor, 0.5)
+            for _ in range(5):
+                nbu.get_jobs(1)
+            self.assertGreater(throttle.factor, 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
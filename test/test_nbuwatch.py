@@ -0,0 +1,47 @@
+import threading
+import unittest
+
+from nbupy import NbuApiConnector, NbuJobWatcher
+from nbupy.nbumock import NbuMockServer
+
+
+class TestNbuJobWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = NbuMockServer(jobs=100)
+        self.mock.start()
+        self.nbu = NbuApiConnector(url=self.mock.url, user='user', password='password', verify=False)
+        self.nbu.login()
+        self.job_ids = self.mock.add_jobs(10, state='ACTIVE', status=None)
+
+    def tearDown(self):
+        self.nbu.logout()
+        self.mock.stop()
+
+    def finish_jobs(self, job_ids, delay=0.2):
+        timer = threading.Timer(delay, lambda: [self.mock.update_job(job_id, state='DONE', status=0)
+                                                for job_id in job_ids])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_filters(self):
+        watcher = NbuJobWatcher(self.nbu, self.job_ids)
+        self.assertEqual(watcher.filters(), ['jobId ge 101 and jobId le 110'])
+        watcher = NbuJobWatcher(self.nbu, [1, 1000], batch_size=1)
+        self.assertEqual(watcher.filters(), ['(jobId eq 1)', '(jobId eq 1000)'])
+
+    def test_wait_for_jobs(self):
+        self.finish_jobs(self.job_ids)
+        done = []
+        jobs = self.nbu.wait_for_jobs(self.job_ids, timeout=10, interval=0.05, on_done=done.append)
+        self.assertEqual(sorted(jobs), self.job_ids)
+        self.assertEqual(sorted(change.job_id for change in done), self.job_ids)
+        self.assertLess(self.mock.requests['GET admin/jobs'], 2 * len(self.job_ids))
+
+    def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            self.nbu.wait_for_jobs(self.job_ids, timeout=0.3, interval=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()